@@ -1,20 +1,46 @@
+import time
+
+_imports_started_at = time.perf_counter()
+
 import logging
 import os
 import asyncio
-from contextlib import asynccontextmanager
-from typing import Any
+import secrets
+from contextlib import asynccontextmanager, contextmanager
+from typing import Annotated, Any, Iterator, Literal
 
-import asyncpg
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request, HTTPException, status
+from fastapi import FastAPI, Header, Query, Request, HTTPException, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-from database.migrations import MIGRATIONS
+from constants import DEFAULT_INTERACTIONS_PAGE_SIZE, MAX_INTERACTIONS_PAGE_SIZE
+from database.migrations import run_migrations
+from database.pool import create_pool, get_pool_stats, register_pool_metrics
 from services.dtos.UpdateUserPayload import UpdateUserPayload
 from services.dtos.UpdateInteractionPayload import UpdateInteractionPayload
+from services.dtos.CreateInteractionsBatchPayload import CreateInteractionsBatchPayload
 from services.UserService import UserService
-from services.InteractionService import InteractionService
+from services.UserImportService import UserImportService
+from services.InteractionService import InteractionService, get_extraction_flights
+from services.InteractionHistoryService import InteractionHistoryService
+from services.RelationshipService import RelationshipService
 from services.HealthService import HealthService
+from services.ExtractionCache import get_extraction_cache
+from services.ExtractionScheduler import get_extraction_scheduler
+from services.IdempotencyKeyStore import IdempotentResponse, get_idempotency_key_store, make_request_hash
+from services.UserIdResolver import get_user_id_resolver
+from graphs.extract_interaction_with_a_person_card import get_extraction_batcher, warm_up
+from graphs.extraction_checkpoints import get_extraction_checkpoints
+from graphs.extraction_guard import get_extraction_guard
+from graphs.heuristic_extractor import get_heuristic_extractor
+from graphs.input_chunker import get_input_chunker
+from graphs.tracing import get_extraction_tracing
+from services.JobService import JobService
+from services.JobWorker import JobWorker
+from services.Metrics import REGISTRY, MetricsMiddleware
+
+IMPORTS_DURATION_MS = round((time.perf_counter() - _imports_started_at) * 1000, 1)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,33 +54,53 @@ class APIResponse(BaseModel):
     data: Any | None = None
 
 
+@contextmanager
+def timed(timings: dict[str, float], phase: str) -> Iterator[None]:
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = round((time.perf_counter() - started_at) * 1000, 1)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    startup_started_at = time.perf_counter()
+    timings = {"imports": IMPORTS_DURATION_MS}
+
+    # Optionally load the extraction stack (LangChain, Opik, the graph) while connecting to the database,
+    # so that the first extraction does not pay for it
+    warm_up_task = None
+    if os.getenv("EXTRACTION_WARMUP_ON_STARTUP", "false").lower() == "true":
+        def timed_warm_up():
+            with timed(timings, "warm_up"):
+                warm_up()
+
+        warm_up_task = asyncio.create_task(asyncio.to_thread(timed_warm_up))
+
     # Connect to database on startup with retries
     max_retries = 5
     base_delay = 2
 
     for attempt in range(max_retries):
         try:
-            pool = await asyncpg.create_pool(
-                user=os.getenv("POSTGRES_USER", "postgres"),
-                password=os.getenv("POSTGRES_PASSWORD", "postgres"),
-                database=os.getenv("POSTGRES_DB", "app"),
-                host=os.getenv("POSTGRES_HOST", "localhost"),
-                port=os.getenv("POSTGRES_PORT", "5432"),
-            )
-            app.state.pool = pool
+            with timed(timings, "database"):
+                pool = await create_pool()
+                app.state.pool = pool
 
-            # Run basic query to verify connection
-            health_service = HealthService(pool)
-            current_date = await health_service.check_db_connection()
+                # Run basic query to verify connection
+                health_service = HealthService(pool)
+                current_date = await health_service.check_db_connection()
             logger.info(
                 f"Successfully connected to database! Current date: {current_date}"
             )
 
             # Run migrations
-            for migration in MIGRATIONS:
-                await migration(pool)
+            with timed(timings, "migrations"):
+                await run_migrations(pool)
+
+            # Recycle connections opened before the schema existed, so they prepare the hot queries again
+            await pool.expire_connections()
 
             # If we get here, connection and migrations were successful
             break
@@ -73,14 +119,42 @@ async def lifespan(app: FastAPI):
                 # We don't block startup, but DB features won't work
                 app.state.pool = None
 
+    if app.state.pool:
+        register_pool_metrics(app.state.pool)
+    # Registers the scheduler's gauges, so that they are exposed before the first extraction
+    get_extraction_scheduler()
+
+    # Drain the jobs queue in-process unless a separate worker (worker.py) does it
+    app.state.job_worker = None
+    if app.state.pool and os.getenv("JOB_WORKERS_IN_PROCESS", "true").lower() == "true":
+        app.state.job_worker = JobWorker(app.state.pool)
+        app.state.job_worker.start()
+
+    if warm_up_task:
+        try:
+            await warm_up_task
+        except Exception as e:
+            # The first extraction will retry, and report the error to its caller
+            logger.warning(f"Extraction warm-up failed: {e}")
+
+    timings["lifespan"] = round((time.perf_counter() - startup_started_at) * 1000, 1)
+    app.state.startup_timings = timings
+    logger.info(
+        "Startup timings (ms): " + ", ".join(f"{phase}={duration}" for phase, duration in timings.items())
+    )
+
     yield
 
     # Cleanup on shutdown
+    if app.state.job_worker:
+        await app.state.job_worker.stop()
+
     if getattr(app.state, "pool", None):
         await app.state.pool.close()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/", response_model=APIResponse)
@@ -91,6 +165,37 @@ def root(request: Request) -> APIResponse:
     )
 
 
+@app.get("/stats", response_model=APIResponse)
+def stats(request: Request) -> APIResponse:
+    batcher = get_extraction_batcher()
+    heuristic_extractor = get_heuristic_extractor()
+    scheduler = get_extraction_scheduler()
+    checkpoints = get_extraction_checkpoints()
+    return APIResponse(
+        msg="Runtime statistics",
+        data={
+            "extraction_cache": get_extraction_cache().stats(),
+            "user_id_resolver": get_user_id_resolver().stats(),
+            "extraction_batcher": batcher.stats() if batcher else {"enabled": False},
+            "heuristic_extractor": heuristic_extractor.stats() if heuristic_extractor else {"enabled": False},
+            "input_chunker": get_input_chunker().stats(),
+            "extraction_scheduler": scheduler.stats() if scheduler else {"enabled": False},
+            "extraction_guard": get_extraction_guard().stats(),
+            "extraction_checkpoints": checkpoints.stats() if checkpoints else {"enabled": False},
+            "extraction_single_flight": get_extraction_flights().stats(),
+            "idempotency_keys": get_idempotency_key_store().stats(),
+            "tracing": get_extraction_tracing().stats(),
+            "database_pool": get_pool_stats().stats(getattr(request.app.state, "pool", None)),
+            "startup_ms": getattr(request.app.state, "startup_timings", None),
+        },
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/users", response_model=APIResponse)
 async def create_or_update_user(
     payload: UpdateUserPayload, request: Request
@@ -108,9 +213,168 @@ async def create_or_update_user(
     return APIResponse(msg=msg)
 
 
+@app.post("/users/import", response_model=APIResponse)
+async def import_users(
+    request: Request,
+    format: Literal["csv", "jsonl"] = "csv",
+    x_import_token: str | None = Header(default=None),
+) -> APIResponse:
+    # Bulk imports bypass per-user authorization, so they require a shared secret
+    import_token = os.getenv("USER_IMPORT_TOKEN")
+    if not import_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User import is disabled",
+        )
+    if not x_import_token or not secrets.compare_digest(x_import_token, import_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid import token",
+        )
+
+    pool = getattr(request.app.state, "pool", None)
+    if not pool:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database not available",
+        )
+
+    user_import_service = UserImportService(pool)
+    report = await user_import_service.import_users(request.stream(), format)
+
+    return APIResponse(msg="Users imported", data=report)
+
+
+@app.get("/users/{unique_id}/interactions", response_model=APIResponse)
+async def list_user_interactions(
+    unique_id: str,
+    sub: str,
+    request: Request,
+    target_user_id: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_INTERACTIONS_PAGE_SIZE)] = DEFAULT_INTERACTIONS_PAGE_SIZE,
+    cursor: str | None = None,
+) -> APIResponse:
+    pool = getattr(request.app.state, "pool", None)
+    if not pool:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database not available",
+        )
+
+    interaction_history_service = InteractionHistoryService(pool)
+    page = await interaction_history_service.list_interactions(
+        unique_id, sub, target_user_id, limit, cursor
+    )
+
+    return APIResponse(msg="Interactions retrieved", data=page)
+
+
+@app.get("/users/{unique_id}/interactions/export")
+async def export_user_interactions(
+    unique_id: str, sub: str, request: Request
+) -> StreamingResponse:
+    pool = getattr(request.app.state, "pool", None)
+    if not pool:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database not available",
+        )
+
+    interaction_history_service = InteractionHistoryService(pool)
+    chunks = await interaction_history_service.export_interactions(unique_id, sub)
+
+    return StreamingResponse(
+        chunks,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="interactions-{unique_id}.ndjson"'},
+    )
+
+
+@app.get("/users/{unique_id}/interactions/search", response_model=APIResponse)
+async def search_user_interactions(
+    unique_id: str,
+    sub: str,
+    q: Annotated[str, Query(min_length=1, max_length=256)],
+    request: Request,
+    limit: Annotated[int, Query(ge=1, le=MAX_INTERACTIONS_PAGE_SIZE)] = DEFAULT_INTERACTIONS_PAGE_SIZE,
+    cursor: str | None = None,
+) -> APIResponse:
+    pool = getattr(request.app.state, "pool", None)
+    if not pool:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database not available",
+        )
+
+    interaction_history_service = InteractionHistoryService(pool)
+    page = await interaction_history_service.search_interactions(unique_id, sub, q, limit, cursor)
+
+    return APIResponse(msg="Interactions found", data=page)
+
+
+@app.get("/users/{unique_id}/relationships", response_model=APIResponse)
+async def list_user_relationships(
+    unique_id: str,
+    sub: str,
+    request: Request,
+    limit: Annotated[int, Query(ge=1, le=MAX_INTERACTIONS_PAGE_SIZE)] = DEFAULT_INTERACTIONS_PAGE_SIZE,
+    cursor: str | None = None,
+) -> APIResponse:
+    pool = getattr(request.app.state, "pool", None)
+    if not pool:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database not available",
+        )
+
+    relationship_service = RelationshipService(pool)
+    page = await relationship_service.list_relationships(unique_id, sub, limit, cursor)
+
+    return APIResponse(msg="Relationships retrieved", data=page)
+
+
 @app.post("/interactions", response_model=APIResponse)
 async def create_interaction(
-    payload: UpdateInteractionPayload, request: Request
+    payload: UpdateInteractionPayload,
+    request: Request,
+    mode: Literal["sync", "async"] = "sync",
+    idempotency_key: Annotated[str | None, Header(min_length=1, max_length=255)] = None,
+) -> JSONResponse:
+    pool = getattr(request.app.state, "pool", None)
+    if not pool:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database not available",
+        )
+
+    async def handle() -> IdempotentResponse:
+        if mode == "async":
+            job_service = JobService(pool)
+            job_id = await job_service.enqueue_interaction(payload)
+            return IdempotentResponse(
+                status.HTTP_202_ACCEPTED,
+                APIResponse(msg="Interaction queued", data={"job_id": job_id}).model_dump(),
+                {"Location": f"/jobs/{job_id}"},
+            )
+
+        interaction_service = InteractionService(pool)
+        msg = await interaction_service.create_interaction(payload)
+        return IdempotentResponse(status.HTTP_200_OK, APIResponse(msg=msg).model_dump())
+
+    # Retries carrying the same key get the first response back instead of recording the interaction again
+    if idempotency_key is None:
+        result = await handle()
+    else:
+        result = await get_idempotency_key_store().run(
+            pool, payload.sub, idempotency_key, make_request_hash(mode, payload.model_dump()), handle
+        )
+
+    return JSONResponse(result.body, status_code=result.status_code, headers=result.headers)
+
+
+@app.post("/interactions/batch", response_model=APIResponse)
+async def create_interactions_batch(
+    payload: CreateInteractionsBatchPayload, request: Request
 ) -> APIResponse:
     pool = getattr(request.app.state, "pool", None)
     if not pool:
@@ -120,6 +384,21 @@ async def create_interaction(
         )
 
     interaction_service = InteractionService(pool)
-    msg = await interaction_service.create_interaction(payload)
+    results = await interaction_service.create_interactions_batch(payload)
 
-    return APIResponse(msg=msg)
+    return APIResponse(msg="Batch processed", data={"results": results})
+
+
+@app.get("/jobs/{job_id}", response_model=APIResponse)
+async def get_job(job_id: str, request: Request) -> APIResponse:
+    pool = getattr(request.app.state, "pool", None)
+    if not pool:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database not available",
+        )
+
+    job_service = JobService(pool)
+    job = await job_service.get_job(job_id)
+
+    return APIResponse(msg=f"Job {job['status']}", data=job)
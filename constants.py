@@ -1 +1,11 @@
-BASE_MODEL = "gemini-3-flash-preview"
\ No newline at end of file
+BASE_MODEL = "gemini-3-flash-preview"
+
+# Bump whenever the extraction prompt changes, so cached extractions are not reused
+EXTRACTION_PROMPT_VERSION = "1"
+
+# Maximum number of interactions accepted by POST /interactions/batch
+MAX_INTERACTIONS_BATCH_SIZE = 100
+
+# Page sizes of GET /users/{unique_id}/interactions and /relationships
+DEFAULT_INTERACTIONS_PAGE_SIZE = 20
+MAX_INTERACTIONS_PAGE_SIZE = 100
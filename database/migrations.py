@@ -1,9 +1,11 @@
 import asyncpg
 import logging
 
+from database import queries
+
 logger = logging.getLogger(__name__)
 
-async def migrate_users_table(pool: asyncpg.Pool):
+async def migrate_users_table(conn: asyncpg.Connection):
     """
     Migrates the users table in the database.
     
@@ -23,42 +25,24 @@ async def migrate_users_table(pool: asyncpg.Pool):
     );
     """
     
-    check_table_query = """
-    SELECT EXISTS (
-        SELECT FROM information_schema.tables 
-        WHERE table_schema = 'public' 
-        AND table_name = 'users'
-    );
-    """
-    
     try:
-        async with pool.acquire() as conn:
-            # Check if table exists before attempting creation
-            table_exists = await conn.fetchval(check_table_query)
+        # Check if table exists before attempting creation
+        table_exists = await queries.fetchval(conn, "table_exists", "users")
+        
+        if not table_exists:
+            await conn.execute(create_table_query)
+            logger.info("Created users table.")
+        else:
+            logger.info("Users table already exists, skipping creation.")
             
-            if not table_exists:
-                await conn.execute(create_table_query)
-                logger.info("Created users table.")
-            else:
-                logger.info("Users table already exists, skipping creation.")
-                
     except Exception as e:
         logger.error(f"Error migrating users table: {e}")
         raise e
 
-async def add_unique_id_column(pool: asyncpg.Pool):
+async def add_unique_id_column(conn: asyncpg.Connection):
     """
     Adds unique_id column to users table if it doesn't exist and ensures it is unique.
     """
-    check_column_query = """
-    SELECT EXISTS (
-        SELECT FROM information_schema.columns 
-        WHERE table_schema = 'public' 
-        AND table_name = 'users' 
-        AND column_name = 'unique_id'
-    );
-    """
-    
     alter_table_query = """
     ALTER TABLE users ADD COLUMN IF NOT EXISTS unique_id TEXT;
     """
@@ -68,24 +52,23 @@ async def add_unique_id_column(pool: asyncpg.Pool):
     """
     
     try:
-        async with pool.acquire() as conn:
-            column_exists = await conn.fetchval(check_column_query)
+        column_exists = await queries.fetchval(conn, "column_exists", "users", "unique_id")
+        
+        if not column_exists:
+            await conn.execute(alter_table_query)
+            logger.info("Added unique_id column to users table.")
+        else:
+            logger.info("unique_id column already exists in users table, skipping add column.")
+        
+        # Always try to ensure uniqueness
+        await conn.execute(add_unique_index_query)
+        logger.info("Ensured unique index on unique_id column.")
             
-            if not column_exists:
-                await conn.execute(alter_table_query)
-                logger.info("Added unique_id column to users table.")
-            else:
-                logger.info("unique_id column already exists in users table, skipping add column.")
-            
-            # Always try to ensure uniqueness
-            await conn.execute(add_unique_index_query)
-            logger.info("Ensured unique index on unique_id column.")
-                
     except Exception as e:
         logger.error(f"Error adding unique_id column: {e}")
         raise e
 
-async def make_email_unique(pool: asyncpg.Pool):
+async def make_email_unique(conn: asyncpg.Connection):
     """
     Ensures that the email column in the users table is unique.
     """
@@ -94,14 +77,13 @@ async def make_email_unique(pool: asyncpg.Pool):
     """
     
     try:
-        async with pool.acquire() as conn:
-            await conn.execute(query)
-            logger.info("Ensured unique index on email column.")
+        await conn.execute(query)
+        logger.info("Ensured unique index on email column.")
     except Exception as e:
         logger.error(f"Error making email unique: {e}")
         raise e
 
-async def migrate_interactions_table(pool: asyncpg.Pool):
+async def migrate_interactions_table(conn: asyncpg.Connection):
     """
     Migrates the interactions table to store InteractionWithAPersonCard data.
     
@@ -124,26 +106,372 @@ async def migrate_interactions_table(pool: asyncpg.Pool):
     );
     """
     
-    check_table_query = """
-    SELECT EXISTS (
-        SELECT FROM information_schema.tables 
-        WHERE table_schema = 'public' 
-        AND table_name = 'interactions'
+    try:
+        table_exists = await queries.fetchval(conn, "table_exists", "interactions")
+        
+        if not table_exists:
+            await conn.execute(create_table_query)
+            logger.info("Created interactions table.")
+        else:
+            logger.info("Interactions table already exists, skipping creation.")
+            
+    except Exception as e:
+        logger.error(f"Error migrating interactions table: {e}")
+        raise e
+
+async def migrate_extraction_cache_table(conn: asyncpg.Connection):
+    """
+    Migrates the extraction_cache table, the persistent tier of the extraction cache.
+    
+    Schema:
+    - cache_key: hash of the normalized input, the model and the prompt version
+    - interaction_card: the extracted InteractionWithAPersonCard as JSON
+    """
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS extraction_cache (
+        cache_key TEXT PRIMARY KEY,
+        interaction_card JSONB NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+    
+    try:
+        table_exists = await queries.fetchval(conn, "table_exists", "extraction_cache")
+        
+        if not table_exists:
+            await conn.execute(create_table_query)
+            logger.info("Created extraction_cache table.")
+        else:
+            logger.info("Extraction cache table already exists, skipping creation.")
+            
+    except Exception as e:
+        logger.error(f"Error migrating extraction_cache table: {e}")
+        raise e
+
+async def migrate_jobs_table(conn: asyncpg.Connection):
+    """
+    Migrates the jobs table, the work queue behind asynchronous requests.
+    
+    Schema:
+    - kind: what the job does (e.g. create_interaction), payload: its input as JSON
+    - status: queued, running, succeeded or failed
+    - result, error: the outcome, once the job is done
+    """
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        payload JSONB NOT NULL,
+        result JSONB,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        started_at TIMESTAMP WITH TIME ZONE,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
     );
     """
+
+    # Workers only ever scan for claimable jobs, which stay a small fraction of the table
+    add_claim_index_query = """
+    CREATE INDEX IF NOT EXISTS jobs_claimable_idx ON jobs (created_at)
+    WHERE status IN ('queued', 'running');
+    """
     
     try:
-        async with pool.acquire() as conn:
-            table_exists = await conn.fetchval(check_table_query)
+        table_exists = await queries.fetchval(conn, "table_exists", "jobs")
+        
+        if not table_exists:
+            await conn.execute(create_table_query)
+            logger.info("Created jobs table.")
+        else:
+            logger.info("Jobs table already exists, skipping creation.")
+
+        await conn.execute(add_claim_index_query)
+        logger.info("Ensured claim index on jobs table.")
             
+    except Exception as e:
+        logger.error(f"Error migrating jobs table: {e}")
+        raise e
+
+async def add_interactions_history_indexes(conn: asyncpg.Connection):
+    """
+    Adds the indexes behind GET /users/{unique_id}/interactions, matching its keyset ordering
+    so that any page is read straight off the index.
+    """
+    add_user_index_query = """
+    CREATE INDEX IF NOT EXISTS interactions_user_id_created_at_idx
+    ON interactions (user_id, created_at DESC, id DESC);
+    """
+
+    add_user_target_index_query = """
+    CREATE INDEX IF NOT EXISTS interactions_user_id_target_user_id_created_at_idx
+    ON interactions (user_id, target_user_id, created_at DESC, id DESC);
+    """
+    
+    try:
+        await conn.execute(add_user_index_query)
+        await conn.execute(add_user_target_index_query)
+        logger.info("Ensured history indexes on interactions table.")
+    
+    except Exception as e:
+        logger.error(f"Error adding interactions history indexes: {e}")
+        raise e
+
+async def migrate_relationships_table(conn: asyncpg.Connection):
+    """
+    Migrates the relationships table, a per-pair summary of the interactions table.
+    
+    Schema:
+    - (user_id, target_user_id): the pair, as in interactions
+    - interaction_count, first_interaction_at, last_interaction_at: aggregated over the pair's interactions
+    - last_where, last_why: the latest known where and why of the pair's interactions
+    """
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS relationships (
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        target_user_id INTEGER NOT NULL REFERENCES users(id),
+        interaction_count INTEGER NOT NULL,
+        first_interaction_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        last_interaction_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        last_where TEXT,
+        last_why TEXT,
+        PRIMARY KEY (user_id, target_user_id)
+    );
+    """
+
+    # Matches the ordering of GET /users/{unique_id}/relationships
+    add_recent_index_query = """
+    CREATE INDEX IF NOT EXISTS relationships_user_id_last_interaction_at_idx
+    ON relationships (user_id, last_interaction_at DESC, target_user_id DESC);
+    """
+    
+    try:
+        table_exists = await queries.fetchval(conn, "table_exists", "relationships")
+        
+        if not table_exists:
+            await conn.execute(create_table_query)
+            logger.info("Created relationships table.")
+        else:
+            logger.info("Relationships table already exists, skipping creation.")
+
+        await conn.execute(add_recent_index_query)
+        logger.info("Ensured recency index on relationships table.")
+    
+    except Exception as e:
+        logger.error(f"Error migrating relationships table: {e}")
+        raise e
+
+async def add_interactions_search_column(conn: asyncpg.Connection):
+    """
+    Adds a generated, weighted full-text search column to the interactions table, and its GIN index.
+    
+    Weights: who (A), why (B), where (C), how and when (D).
+    """
+    alter_table_query = """
+    ALTER TABLE interactions ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(who, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(why, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce("where", '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(how, '')), 'D') ||
+        setweight(to_tsvector('english', coalesce("when", '')), 'D')
+    ) STORED;
+    """
+
+    add_search_index_query = """
+    CREATE INDEX IF NOT EXISTS interactions_search_vector_idx ON interactions USING GIN (search_vector);
+    """
+    
+    try:
+        column_exists = await queries.fetchval(conn, "column_exists", "interactions", "search_vector")
+        
+        if not column_exists:
+            # Rewrites the table to compute the column for existing rows
+            await conn.execute(alter_table_query)
+            logger.info("Added search_vector column to interactions table.")
+        else:
+            logger.info("search_vector column already exists in interactions table, skipping add column.")
+
+        await conn.execute(add_search_index_query)
+        logger.info("Ensured search index on interactions table.")
+    
+    except Exception as e:
+        logger.error(f"Error adding interactions search column: {e}")
+        raise e
+
+async def add_extraction_cache_input_column(conn: asyncpg.Connection):
+    """
+    Adds the input text to the extraction_cache table, so that the heuristic extractor can be
+    checked offline against the LLM results (see scripts/heuristic_agreement.py).
+    Entries cached before this migration have no input.
+    """
+    alter_table_query = """
+    ALTER TABLE extraction_cache ADD COLUMN IF NOT EXISTS input TEXT;
+    """
+    
+    try:
+        column_exists = await queries.fetchval(conn, "column_exists", "extraction_cache", "input")
+        
+        if not column_exists:
+            await conn.execute(alter_table_query)
+            logger.info("Added input column to extraction_cache table.")
+        else:
+            logger.info("input column already exists in extraction_cache table, skipping add column.")
+    
+    except Exception as e:
+        logger.error(f"Error adding extraction cache input column: {e}")
+        raise e
+
+async def migrate_idempotency_keys_table(conn: asyncpg.Connection):
+    """
+    Migrates the idempotency_keys table, which stores the response of requests sent with an Idempotency-Key header.
+    
+    Schema:
+    - (sub, key): the requester and their key, so that two users' keys never collide
+    - request_hash: hash of the request, to refuse reusing a key for a different request
+    - status: in_progress or completed
+    - response_status, response_body, response_headers: the stored response, once completed
+    """
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        sub TEXT NOT NULL,
+        key TEXT NOT NULL,
+        request_hash TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'in_progress',
+        response_status INTEGER,
+        response_body JSONB,
+        response_headers JSONB,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (sub, key)
+    );
+    """
+
+    # Expired keys are purged by age
+    add_created_at_index_query = """
+    CREATE INDEX IF NOT EXISTS idempotency_keys_created_at_idx ON idempotency_keys (created_at);
+    """
+    
+    try:
+        table_exists = await queries.fetchval(conn, "table_exists", "idempotency_keys")
+        
+        if not table_exists:
+            await conn.execute(create_table_query)
+            logger.info("Created idempotency_keys table.")
+        else:
+            logger.info("Idempotency keys table already exists, skipping creation.")
+
+        await conn.execute(add_created_at_index_query)
+        logger.info("Ensured created_at index on idempotency_keys table.")
+    
+    except Exception as e:
+        logger.error(f"Error migrating idempotency_keys table: {e}")
+        raise e
+
+async def migrate_graph_checkpoints_tables(conn: asyncpg.Connection):
+    """
+    Migrates the graph_checkpoints and graph_checkpoint_writes tables, where the extraction graph's
+    checkpointer (graphs/postgres_checkpointer.py) stores its runs so that they can be resumed.
+    
+    Schema:
+    - graph_checkpoints: one row per checkpoint of a thread, with its serialized state and metadata
+    - graph_checkpoint_writes: the writes of the tasks of a checkpoint's next step, kept when the step
+      is interrupted so that finished tasks are not run again
+    """
+    create_checkpoints_table_query = """
+    CREATE TABLE IF NOT EXISTS graph_checkpoints (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        checkpoint_id TEXT NOT NULL,
+        parent_checkpoint_id TEXT,
+        checkpoint_type TEXT NOT NULL,
+        checkpoint BYTEA NOT NULL,
+        metadata_type TEXT NOT NULL,
+        metadata BYTEA NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+    );
+    """
+
+    create_writes_table_query = """
+    CREATE TABLE IF NOT EXISTS graph_checkpoint_writes (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        checkpoint_id TEXT NOT NULL,
+        task_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        channel TEXT NOT NULL,
+        value_type TEXT NOT NULL,
+        value BYTEA NOT NULL,
+        task_path TEXT NOT NULL DEFAULT '',
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+    );
+    """
+
+    # Abandoned threads are purged by age
+    add_created_at_indexes_query = """
+    CREATE INDEX IF NOT EXISTS graph_checkpoints_created_at_idx ON graph_checkpoints (created_at);
+    CREATE INDEX IF NOT EXISTS graph_checkpoint_writes_created_at_idx ON graph_checkpoint_writes (created_at);
+    """
+    
+    try:
+        for table_name, create_table_query in (
+            ("graph_checkpoints", create_checkpoints_table_query),
+            ("graph_checkpoint_writes", create_writes_table_query),
+        ):
+            table_exists = await queries.fetchval(conn, "table_exists", table_name)
             if not table_exists:
                 await conn.execute(create_table_query)
-                logger.info("Created interactions table.")
+                logger.info(f"Created {table_name} table.")
             else:
-                logger.info("Interactions table already exists, skipping creation.")
-                
+                logger.info(f"Table {table_name} already exists, skipping creation.")
+
+        await conn.execute(add_created_at_indexes_query)
+        logger.info("Ensured created_at indexes on graph checkpoint tables.")
+    
     except Exception as e:
-        logger.error(f"Error migrating interactions table: {e}")
+        logger.error(f"Error migrating graph checkpoint tables: {e}")
+        raise e
+
+async def add_extraction_cache_created_at_index(conn: asyncpg.Connection):
+    """
+    Adds an index on the creation time of extraction_cache entries, so that expired entries are purged
+    without scanning the table.
+    """
+    add_index_query = """
+    CREATE INDEX IF NOT EXISTS extraction_cache_created_at_idx ON extraction_cache (created_at);
+    """
+    
+    try:
+        await conn.execute(add_index_query)
+        logger.info("Ensured created_at index on extraction_cache table.")
+    
+    except Exception as e:
+        logger.error(f"Error adding extraction cache created_at index: {e}")
+        raise e
+
+async def add_jobs_run_after_column(conn: asyncpg.Connection):
+    """
+    Adds the time before which a job put back in the queue must not be claimed again, so that
+    retries of rate-limited or failing jobs back off instead of using up their attempts at once.
+    """
+    alter_table_query = """
+    ALTER TABLE jobs ADD COLUMN IF NOT EXISTS run_after TIMESTAMP WITH TIME ZONE;
+    """
+    
+    try:
+        column_exists = await queries.fetchval(conn, "column_exists", "jobs", "run_after")
+        
+        if not column_exists:
+            await conn.execute(alter_table_query)
+            logger.info("Added run_after column to jobs table.")
+        else:
+            logger.info("run_after column already exists in jobs table, skipping add column.")
+    
+    except Exception as e:
+        logger.error(f"Error adding jobs run_after column: {e}")
         raise e
 
 MIGRATIONS = [
@@ -151,4 +479,61 @@ MIGRATIONS = [
     add_unique_id_column,
     make_email_unique,
     migrate_interactions_table,
+    migrate_extraction_cache_table,
+    migrate_jobs_table,
+    add_interactions_history_indexes,
+    migrate_relationships_table,
+    add_interactions_search_column,
+    add_extraction_cache_input_column,
+    migrate_idempotency_keys_table,
+    migrate_graph_checkpoints_tables,
+    add_extraction_cache_created_at_index,
+    add_jobs_run_after_column,
 ]
+
+# Arbitrary application-wide key, so that only one process migrates at a time
+MIGRATIONS_LOCK_KEY = 7_231_004_152
+
+async def get_schema_version(conn: asyncpg.Connection) -> int:
+    """
+    Returns the number of MIGRATIONS already applied, 0 if migrations were never tracked.
+    """
+    try:
+        return await queries.fetchval(conn, "get_schema_version")
+    except asyncpg.UndefinedTableError:
+        return 0
+
+async def run_migrations(pool: asyncpg.Pool):
+    """
+    Applies the MIGRATIONS that were not applied yet, in order, recording each one in schema_migrations.
+    
+    A migration's version is its 1-based position in MIGRATIONS, so new migrations must be appended.
+    When the schema is up to date this costs a single query; otherwise replicas starting together
+    take turns on an advisory lock, and the ones that get it last find nothing left to do.
+    """
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+
+    async with pool.acquire() as conn:
+        if await get_schema_version(conn) == len(MIGRATIONS):
+            logger.info("Database schema is up to date, skipping migrations.")
+            return
+
+        await queries.execute(conn, "acquire_migrations_lock", MIGRATIONS_LOCK_KEY)
+        try:
+            await conn.execute(create_table_query)
+            version = await get_schema_version(conn)
+
+            for migration_version, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                logger.info(f"Applying migration {migration_version}: {migration.__name__}")
+                await migration(conn)
+                await queries.execute(conn, "record_schema_version", migration_version, migration.__name__)
+
+            logger.info(f"Database schema is at version {len(MIGRATIONS)}.")
+        finally:
+            await queries.execute(conn, "release_migrations_lock", MIGRATIONS_LOCK_KEY)
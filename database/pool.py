@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator
+
+import asyncpg
+from fastapi import HTTPException, status
+
+from database.queries import RegistryConnection, prepare_hot_queries
+from services.Metrics import POOL_ACQUIRE_SECONDS, REGISTRY
+from services.RunningStat import RunningStat
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_ACQUIRE_TIMEOUT = 5.0
+
+
+def is_pgbouncer_mode() -> bool:
+    """
+    Whether the database is reached through pgbouncer in transaction mode, which cannot keep
+    server-side prepared statements across transactions.
+    """
+    return os.getenv("POSTGRES_PGBOUNCER_MODE", "false").lower() == "true"
+
+
+async def create_pool() -> asyncpg.Pool:
+    """
+    Creates the connection pool from the POSTGRES_* environment variables.
+    Outside of pgbouncer mode, every new connection prepares the hot statements of the query registry.
+    """
+    pgbouncer_mode = is_pgbouncer_mode()
+
+    return await asyncpg.create_pool(
+        user=os.getenv("POSTGRES_USER", "postgres"),
+        password=os.getenv("POSTGRES_PASSWORD", "postgres"),
+        database=os.getenv("POSTGRES_DB", "app"),
+        host=os.getenv("POSTGRES_HOST", "localhost"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        min_size=int(os.getenv("POSTGRES_POOL_MIN_SIZE", "10")),
+        max_size=int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10")),
+        max_inactive_connection_lifetime=float(os.getenv("POSTGRES_POOL_MAX_INACTIVE_CONNECTION_LIFETIME", "300")),
+        statement_cache_size=0 if pgbouncer_mode else int(os.getenv("POSTGRES_STATEMENT_CACHE_SIZE", "100")),
+        connection_class=asyncpg.Connection if pgbouncer_mode else RegistryConnection,
+        init=None if pgbouncer_mode else prepare_hot_queries,
+    )
+
+
+def get_pool_acquire_timeout() -> float:
+    """
+    Returns how long (in seconds) a request may wait for a pool connection.
+    Read at call time so values loaded from `.env` after import are honoured.
+    """
+    return float(os.getenv("POSTGRES_POOL_ACQUIRE_TIMEOUT", DEFAULT_POOL_ACQUIRE_TIMEOUT))
+
+
+class PoolStats:
+    """
+    How long requests wait for a pool connection, and how often they give up.
+    """
+
+    def __init__(self):
+        self.acquire_wait_ms = RunningStat()
+        self.acquire_timeouts = 0
+
+    def stats(self, pool: asyncpg.Pool | None) -> dict:
+        return {
+            "size": pool.get_size() if pool else 0,
+            "idle": pool.get_idle_size() if pool else 0,
+            "max_size": pool.get_max_size() if pool else 0,
+            "acquire_wait_ms": self.acquire_wait_ms.to_dict(),
+            "acquire_timeouts": self.acquire_timeouts,
+        }
+
+
+def register_pool_metrics(pool: asyncpg.Pool) -> None:
+    """
+    Exposes the pool's size, idle, in-use and max size gauges in GET /metrics.
+    """
+    REGISTRY.gauge("db_pool_size", "Open connections of the database pool", lambda: [((), pool.get_size())])
+    REGISTRY.gauge("db_pool_idle", "Idle connections of the database pool", lambda: [((), pool.get_idle_size())])
+    REGISTRY.gauge(
+        "db_pool_in_use", "Connections of the database pool held by a request",
+        lambda: [((), pool.get_size() - pool.get_idle_size())],
+    )
+    REGISTRY.gauge("db_pool_max_size", "Maximum connections of the database pool", lambda: [((), pool.get_max_size())])
+
+
+@lru_cache(maxsize=1)
+def get_pool_stats() -> PoolStats:
+    return PoolStats()
+
+
+@asynccontextmanager
+async def acquire(pool: asyncpg.Pool, timeout: float | None = None) -> AsyncIterator[asyncpg.Connection]:
+    """
+    Acquires a connection from the pool, failing fast with a 503 when none frees up in time.
+    Keep the block short: the connection is unavailable to other requests until it exits.
+    """
+    timeout = get_pool_acquire_timeout() if timeout is None else timeout
+    pool_stats = get_pool_stats()
+
+    started_at = time.perf_counter()
+    try:
+        conn = await pool.acquire(timeout=timeout)
+    except asyncio.TimeoutError:
+        pool_stats.acquire_timeouts += 1
+        logger.warning(f"Timed out after {timeout}s waiting for a database connection")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is busy, please retry later",
+            headers={"Retry-After": "1"},
+        )
+
+    wait_seconds = time.perf_counter() - started_at
+    pool_stats.acquire_wait_ms.observe(wait_seconds * 1000)
+    POOL_ACQUIRE_SECONDS.observe(wait_seconds)
+
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
@@ -0,0 +1,507 @@
+import logging
+from typing import Any, Iterable
+
+import asyncpg
+
+from services.Metrics import QUERY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Every statement the application runs, by name. DDL lives with the migrations that own it.
+QUERIES: dict[str, str] = {
+    # Health
+    "check_db_connection": "SELECT CURRENT_DATE",
+
+    # Schema probes (migrations)
+    "table_exists": """
+        SELECT EXISTS (
+            SELECT FROM information_schema.tables
+            WHERE table_schema = 'public'
+            AND table_name = $1
+        )
+    """,
+    "column_exists": """
+        SELECT EXISTS (
+            SELECT FROM information_schema.columns
+            WHERE table_schema = 'public'
+            AND table_name = $1
+            AND column_name = $2
+        )
+    """,
+
+    # Migrations bookkeeping (see run_migrations)
+    "get_schema_version": "SELECT COALESCE(MAX(version), 0) FROM schema_migrations",
+    "record_schema_version": """
+        INSERT INTO schema_migrations (version, name) VALUES ($1, $2)
+        ON CONFLICT (version) DO NOTHING
+    """,
+    "acquire_migrations_lock": "SELECT pg_advisory_lock($1)",
+    "release_migrations_lock": "SELECT pg_advisory_unlock($1)",
+
+    # Users
+    "resolve_user_ids": """
+        SELECT unique_id, id FROM users WHERE unique_id = ANY($1::text[])
+    """,
+    # One statement creates the user, updates it, or does nothing (see UserService.process_user_payload)
+    "upsert_user": """
+        WITH existing AS (
+            SELECT unique_id FROM users WHERE email = $1
+        ),
+        upserted AS (
+            INSERT INTO users (email, full_name, city, unique_id)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (email) DO UPDATE
+            SET full_name = EXCLUDED.full_name, city = EXCLUDED.city
+            WHERE users.unique_id = EXCLUDED.unique_id
+            AND (users.full_name, users.city) IS DISTINCT FROM (EXCLUDED.full_name, EXCLUDED.city)
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT
+            (SELECT inserted FROM upserted) AS inserted,
+            (SELECT unique_id FROM existing) AS existing_unique_id
+    """,
+    "insert_user": """
+        INSERT INTO users (unique_id, email, full_name, city)
+        VALUES ($1, $2, $3, $4)
+    """,
+
+    # Bulk user import (see UserImportService)
+    "create_users_import_table": """
+        CREATE TEMP TABLE users_import (
+            line INTEGER NOT NULL,
+            email TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            city TEXT NOT NULL,
+            unique_id TEXT NOT NULL,
+            conflict TEXT
+        ) ON COMMIT DROP
+    """,
+    "analyze_users_import": "ANALYZE users_import",
+    # Duplicates within the file: the first occurrence wins
+    "flag_users_import_duplicates": """
+        UPDATE users_import s
+        SET conflict = d.conflict
+        FROM (
+            SELECT line,
+                CASE
+                    WHEN row_number() OVER (PARTITION BY email ORDER BY line) > 1 THEN 'duplicate email in file'
+                    WHEN row_number() OVER (PARTITION BY unique_id ORDER BY line) > 1 THEN 'duplicate unique_id in file'
+                END AS conflict
+            FROM users_import
+        ) d
+        WHERE s.line = d.line AND d.conflict IS NOT NULL
+    """,
+    "flag_users_import_email_conflicts": """
+        UPDATE users_import s
+        SET conflict = 'email belongs to another user'
+        FROM users u
+        WHERE s.conflict IS NULL
+        AND u.email = s.email
+        AND u.unique_id IS DISTINCT FROM s.unique_id
+    """,
+    "flag_users_import_unique_id_conflicts": """
+        UPDATE users_import s
+        SET conflict = 'unique_id belongs to another user'
+        FROM users u
+        WHERE s.conflict IS NULL
+        AND u.unique_id = s.unique_id
+        AND u.email <> s.email
+    """,
+    "merge_users_import": """
+        WITH upserted AS (
+            INSERT INTO users (email, full_name, city, unique_id)
+            SELECT email, full_name, city, unique_id
+            FROM users_import
+            WHERE conflict IS NULL
+            ON CONFLICT (email) DO UPDATE
+            SET full_name = EXCLUDED.full_name, city = EXCLUDED.city
+            WHERE users.unique_id = EXCLUDED.unique_id
+            AND (users.full_name, users.city) IS DISTINCT FROM (EXCLUDED.full_name, EXCLUDED.city)
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT
+            COUNT(*) FILTER (WHERE inserted) AS created,
+            COUNT(*) FILTER (WHERE NOT inserted) AS updated,
+            (SELECT COUNT(*) FROM users_import WHERE conflict IS NULL) AS merged,
+            (SELECT COUNT(*) FROM users_import WHERE conflict IS NOT NULL) AS conflicts
+        FROM upserted
+    """,
+    "get_users_import_conflicts": """
+        SELECT line, email, conflict FROM users_import
+        WHERE conflict IS NOT NULL
+        ORDER BY line
+        LIMIT $1
+    """,
+
+    # Interactions
+    "insert_interaction": """
+        INSERT INTO interactions (who, "where", "when", why, how, user_id, target_user_id)
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+    """,
+
+    # Interaction history, newest first. Keyset pagination on (created_at, id): the first page starts
+    # from (datetime.max, max int), so every page is an index range scan of the same cost.
+    "list_user_interactions": """
+        SELECT i.id, i.who, i."where", i."when", i.why, i.how, t.unique_id AS target_user_id, i.created_at
+        FROM interactions i
+        JOIN users t ON t.id = i.target_user_id
+        WHERE i.user_id = $1
+        AND (i.created_at, i.id) < ($2, $3)
+        ORDER BY i.created_at DESC, i.id DESC
+        LIMIT $4
+    """,
+    "list_user_interactions_with_target": """
+        SELECT i.id, i.who, i."where", i."when", i.why, i.how, t.unique_id AS target_user_id, i.created_at
+        FROM interactions i
+        JOIN users t ON t.id = i.target_user_id
+        WHERE i.user_id = $1
+        AND i.target_user_id = $2
+        AND (i.created_at, i.id) < ($3, $4)
+        ORDER BY i.created_at DESC, i.id DESC
+        LIMIT $5
+    """,
+
+    # A page of the full export of a user's interactions, oldest first, serialized to JSON lines by Postgres.
+    # Keyset pagination on (created_at, id), like the history
+    "export_user_interactions": """
+        SELECT i.created_at, i.id, json_build_object(
+            'id', i.id,
+            'who', i.who,
+            'where', i."where",
+            'when', i."when",
+            'why', i.why,
+            'how', i.how,
+            'target_user_id', t.unique_id,
+            'created_at', i.created_at
+        )::text AS line
+        FROM interactions i
+        JOIN users t ON t.id = i.target_user_id
+        WHERE i.user_id = $1
+        AND (i.created_at, i.id) > ($2, $3)
+        ORDER BY i.created_at, i.id
+        LIMIT $4
+    """,
+
+    # Full-text search over a user's interactions, best match first. Keyset pagination on (rank, id),
+    # rank being a real: the cursor round-trips it exactly as long as it is compared as a real too.
+    "search_user_interactions": """
+        SELECT m.id, m.who, m."where", m."when", m.why, m.how, t.unique_id AS target_user_id, m.created_at, m.rank
+        FROM (
+            SELECT i.*, ts_rank_cd(i.search_vector, query) AS rank
+            FROM interactions i, websearch_to_tsquery('english', $2) query
+            WHERE i.user_id = $1
+            AND i.search_vector @@ query
+        ) m
+        JOIN users t ON t.id = m.target_user_id
+        WHERE (m.rank, m.id) < ($3::real, $4)
+        ORDER BY m.rank DESC, m.id DESC
+        LIMIT $5
+    """,
+
+    # Relationships: one summary row per (user, target user) pair, kept up to date by the interactions
+    # persist step. The latest where/why are the latest known ones, so NULLs do not overwrite them.
+    "upsert_relationship": """
+        INSERT INTO relationships (
+            user_id, target_user_id, interaction_count,
+            first_interaction_at, last_interaction_at, last_where, last_why
+        )
+        VALUES ($1, $2, 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, $3, $4)
+        ON CONFLICT (user_id, target_user_id) DO UPDATE
+        SET interaction_count = relationships.interaction_count + 1,
+            last_interaction_at = EXCLUDED.last_interaction_at,
+            last_where = COALESCE(EXCLUDED.last_where, relationships.last_where),
+            last_why = COALESCE(EXCLUDED.last_why, relationships.last_why)
+    """,
+    "list_user_relationships": """
+        SELECT r.target_user_id AS target_db_id, t.unique_id AS target_user_id, t.full_name AS target_full_name,
+            r.interaction_count,
+            r.first_interaction_at, r.last_interaction_at, r.last_where, r.last_why
+        FROM relationships r
+        JOIN users t ON t.id = r.target_user_id
+        WHERE r.user_id = $1
+        AND (r.last_interaction_at, r.target_user_id) < ($2, $3)
+        ORDER BY r.last_interaction_at DESC, r.target_user_id DESC
+        LIMIT $4
+    """,
+    # Recomputes every summary from the interactions (see RelationshipService.backfill)
+    "backfill_relationships": """
+        INSERT INTO relationships (
+            user_id, target_user_id, interaction_count,
+            first_interaction_at, last_interaction_at, last_where, last_why
+        )
+        SELECT user_id, target_user_id, COUNT(*), MIN(created_at), MAX(created_at),
+            (ARRAY_AGG("where" ORDER BY created_at DESC, id DESC) FILTER (WHERE "where" IS NOT NULL))[1],
+            (ARRAY_AGG(why ORDER BY created_at DESC, id DESC) FILTER (WHERE why IS NOT NULL))[1]
+        FROM interactions
+        GROUP BY user_id, target_user_id
+        ON CONFLICT (user_id, target_user_id) DO UPDATE
+        SET interaction_count = EXCLUDED.interaction_count,
+            first_interaction_at = EXCLUDED.first_interaction_at,
+            last_interaction_at = EXCLUDED.last_interaction_at,
+            last_where = EXCLUDED.last_where,
+            last_why = EXCLUDED.last_why
+    """,
+    "lock_interactions_for_backfill": "LOCK TABLE interactions IN SHARE MODE",
+
+    # Extraction cache
+    "get_cached_extraction": """
+        SELECT interaction_card FROM extraction_cache
+        WHERE cache_key = $1
+        AND created_at > CURRENT_TIMESTAMP - make_interval(secs => $2)
+    """,
+    "get_cached_extractions": """
+        SELECT cache_key, interaction_card FROM extraction_cache
+        WHERE cache_key = ANY($1::text[])
+        AND created_at > CURRENT_TIMESTAMP - make_interval(secs => $2)
+    """,
+    "store_cached_extraction": """
+        INSERT INTO extraction_cache (cache_key, interaction_card, input)
+        VALUES ($1, $2::jsonb, $3)
+        ON CONFLICT (cache_key) DO UPDATE
+        SET interaction_card = EXCLUDED.interaction_card, input = EXCLUDED.input, created_at = CURRENT_TIMESTAMP
+    """,
+    "purge_cached_extractions": """
+        DELETE FROM extraction_cache
+        WHERE created_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+    """,
+    "clear_cached_extraction_inputs": """
+        UPDATE extraction_cache SET input = NULL
+        WHERE input IS NOT NULL
+        AND created_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+    """,
+    "list_cached_extractions_with_input": """
+        SELECT input, interaction_card FROM extraction_cache
+        WHERE input IS NOT NULL
+        ORDER BY created_at DESC
+        LIMIT $1
+    """,
+
+    # Idempotency keys: a key is claimed if it is new, expired ($4 seconds), or abandoned in progress ($5 seconds)
+    "claim_idempotency_key": """
+        INSERT INTO idempotency_keys (sub, key, request_hash)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (sub, key) DO UPDATE
+        SET request_hash = EXCLUDED.request_hash, status = 'in_progress',
+            response_status = NULL, response_body = NULL, response_headers = NULL,
+            created_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+        WHERE idempotency_keys.created_at < CURRENT_TIMESTAMP - make_interval(secs => $4)
+        OR (
+            idempotency_keys.status = 'in_progress'
+            AND idempotency_keys.updated_at < CURRENT_TIMESTAMP - make_interval(secs => $5)
+        )
+        RETURNING TRUE
+    """,
+    "get_idempotency_key": """
+        SELECT request_hash, status, response_status, response_body, response_headers
+        FROM idempotency_keys
+        WHERE sub = $1 AND key = $2
+    """,
+    "complete_idempotency_key": """
+        UPDATE idempotency_keys
+        SET status = 'completed', response_status = $3, response_body = $4::jsonb, response_headers = $5::jsonb,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE sub = $1 AND key = $2
+    """,
+    "release_idempotency_key": """
+        DELETE FROM idempotency_keys
+        WHERE sub = $1 AND key = $2 AND status = 'in_progress'
+    """,
+    "purge_idempotency_keys": """
+        DELETE FROM idempotency_keys
+        WHERE created_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+    """,
+
+    # Graph checkpoints (graphs/postgres_checkpointer.py); checkpoint IDs sort in creation order,
+    # byte-wise like LangGraph's own savers
+    "put_graph_checkpoint": """
+        INSERT INTO graph_checkpoints (
+            thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+            checkpoint_type, checkpoint, metadata_type, metadata
+        )
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+        ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id) DO UPDATE
+        SET checkpoint_type = EXCLUDED.checkpoint_type, checkpoint = EXCLUDED.checkpoint,
+            metadata_type = EXCLUDED.metadata_type, metadata = EXCLUDED.metadata
+    """,
+    # Regular writes are kept as first written; special writes (errors, interrupts) are replaced
+    "put_graph_checkpoint_write": """
+        INSERT INTO graph_checkpoint_writes (
+            thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, value_type, value, task_path
+        )
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id, task_id, idx) DO NOTHING
+    """,
+    "upsert_graph_checkpoint_write": """
+        INSERT INTO graph_checkpoint_writes (
+            thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, value_type, value, task_path
+        )
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id, task_id, idx) DO UPDATE
+        SET channel = EXCLUDED.channel, value_type = EXCLUDED.value_type, value = EXCLUDED.value,
+            task_path = EXCLUDED.task_path
+    """,
+    # $1 thread, $2 namespace, $3 checkpoint (NULL for the latest), $4 before checkpoint, $5 limit
+    # (NULL for no limit); thread and namespace may be NULL to list every thread
+    "list_graph_checkpoints": """
+        SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+            checkpoint_type, checkpoint, metadata_type, metadata
+        FROM graph_checkpoints
+        WHERE ($1::text IS NULL OR thread_id = $1)
+        AND ($2::text IS NULL OR checkpoint_ns = $2)
+        AND ($3::text IS NULL OR checkpoint_id = $3)
+        AND ($4::text IS NULL OR checkpoint_id COLLATE "C" < $4)
+        ORDER BY checkpoint_id COLLATE "C" DESC
+        LIMIT $5
+    """,
+    "get_graph_checkpoint_writes": """
+        SELECT task_id, channel, value_type, value
+        FROM graph_checkpoint_writes
+        WHERE thread_id = $1 AND checkpoint_ns = $2 AND checkpoint_id = $3
+        ORDER BY task_path COLLATE "C", task_id COLLATE "C", idx
+    """,
+    "delete_graph_checkpoint_thread": """
+        WITH deleted_writes AS (
+            DELETE FROM graph_checkpoint_writes WHERE thread_id = $1
+        )
+        DELETE FROM graph_checkpoints WHERE thread_id = $1
+    """,
+    "purge_graph_checkpoints": """
+        WITH deleted_writes AS (
+            DELETE FROM graph_checkpoint_writes
+            WHERE created_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+        )
+        DELETE FROM graph_checkpoints
+        WHERE created_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+    """,
+
+    # Jobs (status literals match the partial index created by migrate_jobs_table)
+    "enqueue_job": """
+        INSERT INTO jobs (kind, payload)
+        VALUES ($1, $2::jsonb)
+        RETURNING id
+    """,
+    "get_job": """
+        SELECT id, kind, status, result, error, attempts, run_after, created_at, updated_at
+        FROM jobs WHERE id = $1
+    """,
+    "claim_job": """
+        UPDATE jobs
+        SET status = 'running', attempts = attempts + 1,
+            started_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+        WHERE id = (
+            SELECT id FROM jobs
+            WHERE status IN ('queued', 'running')
+            AND (
+                (status = 'queued' AND (run_after IS NULL OR run_after <= CURRENT_TIMESTAMP))
+                OR (status = 'running' AND started_at < CURRENT_TIMESTAMP - make_interval(secs => $1))
+            )
+            ORDER BY created_at
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING id, kind, payload, attempts
+    """,
+    # Succeeded jobs are final: a worker that reclaimed one after its visibility timeout cannot change it
+    "complete_job": """
+        UPDATE jobs
+        SET status = $2, result = $3::jsonb, error = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = $1 AND status <> 'succeeded'
+    """,
+    # A job put back in the queue is not claimed again before $5 seconds
+    "fail_job": """
+        UPDATE jobs
+        SET status = $2, result = $3::jsonb, error = $4,
+            run_after = CURRENT_TIMESTAMP + make_interval(secs => $5), updated_at = CURRENT_TIMESTAMP
+        WHERE id = $1 AND status <> 'succeeded'
+    """,
+}
+
+# Statements on the request path, prepared on every new pool connection
+HOT_QUERIES = [
+    "resolve_user_ids",
+    "upsert_user",
+    "insert_interaction",
+    "list_user_interactions",
+    "list_user_interactions_with_target",
+    "search_user_interactions",
+    "upsert_relationship",
+    "list_user_relationships",
+    "get_cached_extraction",
+    "get_cached_extractions",
+    "store_cached_extraction",
+    "claim_job",
+    "claim_idempotency_key",
+    "complete_idempotency_key",
+    "put_graph_checkpoint",
+    "list_graph_checkpoints",
+    "get_graph_checkpoint_writes",
+    "delete_graph_checkpoint_thread",
+]
+
+
+class RegistryConnection(asyncpg.Connection):
+    """
+    Pool connection class that prepares the hot statements as soon as it opens (see `prepare_hot_queries`).
+    Statements are kept in asyncpg's per-connection statement cache, keyed by their text, so the helpers
+    below reuse them across acquisitions without reparsing or replanning.
+    """
+
+    # Cleared if the installed asyncpg no longer matches `prepare_cached`
+    statement_cache_warm_up = True
+
+    async def prepare_cached(self, query: str) -> None:
+        """
+        Prepares the query into asyncpg's statement cache, as its first `fetch` would. asyncpg has no public
+        API for this (statements from `prepare` bypass the cache and are invalid once the connection is
+        released to the pool), so this uses `Connection._get_statement`, as of the asyncpg versions allowed
+        by pyproject.toml.
+        """
+        await self._get_statement(query, None)
+
+
+async def prepare_hot_queries(conn: RegistryConnection) -> None:
+    """
+    Pool `init` hook: prepares the hot statements once per connection, so requests only bind and execute.
+    Statements whose tables do not exist yet (before the first migration) are prepared on first use instead.
+    """
+    for name in HOT_QUERIES:
+        if not RegistryConnection.statement_cache_warm_up:
+            break
+        try:
+            await conn.prepare_cached(QUERIES[name])
+        except asyncpg.PostgresError as e:
+            logger.debug(f"Could not prepare {name}, deferring to first use: {e}")
+        except (AttributeError, TypeError) as e:
+            # An asyncpg upgrade changed its private API: statements are prepared on first use instead
+            RegistryConnection.statement_cache_warm_up = False
+            logger.warning(f"Could not warm up the statement cache with this asyncpg version, skipping it: {e}")
+            break
+
+    # asyncpg does not end the protocol exchange after preparing, which would keep the prepared tables
+    # locked until the connection's next query and block migrations' DDL
+    await conn.execute("SELECT 1")
+
+
+async def fetch(conn: asyncpg.Connection, name: str, *args: Any) -> list[asyncpg.Record]:
+    with QUERY_SECONDS.time(name):
+        return await conn.fetch(QUERIES[name], *args)
+
+
+async def fetchrow(conn: asyncpg.Connection, name: str, *args: Any) -> asyncpg.Record | None:
+    with QUERY_SECONDS.time(name):
+        return await conn.fetchrow(QUERIES[name], *args)
+
+
+async def fetchval(conn: asyncpg.Connection, name: str, *args: Any) -> Any:
+    with QUERY_SECONDS.time(name):
+        return await conn.fetchval(QUERIES[name], *args)
+
+
+async def execute(conn: asyncpg.Connection, name: str, *args: Any) -> str:
+    with QUERY_SECONDS.time(name):
+        return await conn.execute(QUERIES[name], *args)
+
+
+async def executemany(conn: asyncpg.Connection, name: str, args: Iterable[tuple]) -> None:
+    with QUERY_SECONDS.time(name):
+        await conn.executemany(QUERIES[name], args)
@@ -1,10 +1,6 @@
+from functools import lru_cache
 from typing import Optional, TypedDict
 
-from langgraph.graph import END, StateGraph
-from opik import configure
-
-configure()
-
 
 def classify(question: str) -> str:
     return "greeting" if question.startswith("Hello") else "search"
@@ -26,39 +22,50 @@ def handle_search_node(state):
     return {"response": search_result}
 
 
+def decide_next_node(state):
+    return (
+        "handle_greeting"
+        if state.get("classification") == "greeting"
+        else "handle_search"
+    )
+
+
 class GraphState(TypedDict):
     question: Optional[str] = None
     classification: Optional[str] = None
     response: Optional[str] = None
 
 
-workflow = StateGraph(GraphState)
-workflow.add_node("classify_input", classify_input_node)
-workflow.add_node("handle_greeting", handle_greeting_node)
-workflow.add_node("handle_search", handle_search_node)
+@lru_cache(maxsize=1)
+def get_example_graph():
+    """
+    Compiles the example graph on first use, so that importing this module stays cheap.
+    """
+    from langgraph.graph import END, StateGraph
+    from opik import configure
 
+    configure()
 
-def decide_next_node(state):
-    return (
-        "handle_greeting"
-        if state.get("classification") == "greeting"
-        else "handle_search"
-    )
+    workflow = StateGraph(GraphState)
+    workflow.add_node("classify_input", classify_input_node)
+    workflow.add_node("handle_greeting", handle_greeting_node)
+    workflow.add_node("handle_search", handle_search_node)
 
+    workflow.add_conditional_edges(
+        "classify_input",
+        decide_next_node,
+        {"handle_greeting": "handle_greeting", "handle_search": "handle_search"},
+    )
+    workflow.set_entry_point("classify_input")
+    workflow.add_edge("handle_greeting", END)
+    workflow.add_edge("handle_search", END)
+    return workflow.compile()
 
-workflow.add_conditional_edges(
-    "classify_input",
-    decide_next_node,
-    {"handle_greeting": "handle_greeting", "handle_search": "handle_search"},
-)
-workflow.set_entry_point("classify_input")
-workflow.add_edge("handle_greeting", END)
-workflow.add_edge("handle_search", END)
-example_graph = workflow.compile()
 
 # example usage
 # from opik.integrations.langchain import OpikTracer
 
+# example_graph = get_example_graph()
 # tracer = OpikTracer(graph=example_graph.get_graph(xray=True))
 # inputs = {"question": "Hello, how are you?"}
 # result = example_graph.invoke(
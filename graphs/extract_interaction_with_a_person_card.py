@@ -1,70 +1,370 @@
+import operator
 import os
-from typing import Optional, TypedDict
-
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.graph import END, StateGraph
-from opik import configure
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import TYPE_CHECKING, Annotated, Optional, TypedDict
 
 from constants import BASE_MODEL
+from graphs.extraction_batcher import ExtractionMicroBatcher
+from graphs.extraction_checkpoints import get_extraction_checkpoints
+from graphs.extraction_guard import CircuitOpenError, get_extraction_guard
+from graphs.heuristic_extractor import get_heuristic_extractor
+from graphs.input_chunker import get_input_chunker
 from models.InteractionWithAPersonCard import InteractionWithAPersonCard
+from models.InteractionWithAPersonCardBatch import InteractionWithAPersonCardBatch
+from services.Metrics import GRAPH_NODE_SECONDS, LLM_CALL_SECONDS
+
+# LangChain, LangGraph and Opik take seconds to import, and most routes never extract anything:
+# they are imported on first use (or at startup with EXTRACTION_WARMUP_ON_STARTUP, see app.lifespan)
+if TYPE_CHECKING:
+    import asyncpg
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain_core.runnables.graph import Graph
+    from langgraph.graph import StateGraph
+    from langgraph.graph.state import CompiledStateGraph
 
-configure()
+    from graphs.stub_chat_model import StubChatModel
 
 
 class GraphState(TypedDict):
     input: Optional[str] = None
     interaction_card: Optional[InteractionWithAPersonCard] = None
+    # "heuristic" or "llm"; only LLM cards are stored in the extraction cache
+    extracted_by: Optional[str] = None
+    heuristic_confidence: Optional[float] = None
+    # (chunk index, card) pairs and errors of the chunks of a long input, appended to by parallel extract_chunk nodes
+    chunk_cards: Annotated[list[tuple[int, InteractionWithAPersonCard]], operator.add]
+    chunk_errors: Annotated[list[str], operator.add]
     error: Optional[str] = None
 
 
-def extract_interaction_node(state):
+class ChunkState(TypedDict):
+    chunk: str
+    index: int
+    count: int
+
+
+@lru_cache(maxsize=1)
+def configure_opik() -> None:
     """
-    Uses Google Gemini to extract structured interaction data from input text.
+    Configures Opik once per process, before the first trace.
     """
-    input = state.get("input", "").strip()
-    
-    if not input:
-        return {"error": "No input text provided"}
-    
-    llm = ChatGoogleGenerativeAI(
+    from opik import configure
+
+    configure()
+
+
+@lru_cache(maxsize=1)
+def get_llm() -> "ChatGoogleGenerativeAI | StubChatModel":
+    """
+    Builds the Gemini client once per process.
+    Reusing the same client keeps its HTTP connections alive across requests.
+    With EXTRACTION_MODEL_PROVIDER=stub, returns a deterministic offline model instead (for benchmarks).
+    """
+    if os.getenv("EXTRACTION_MODEL_PROVIDER", "gemini").lower() == "stub":
+        from graphs.stub_chat_model import create_stub_chat_model
+
+        return create_stub_chat_model()
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
         model=BASE_MODEL,
         google_api_key=os.environ.get("GOOGLE_API_KEY"),
     )
-    
-    structured_llm = llm.with_structured_output(InteractionWithAPersonCard)
-    
-    prompt = f"""Extract information about an interaction with a person from the following text, following the 5 Whys framework (Who, Where, When, Why, How).
+
+
+@lru_cache(maxsize=1)
+def get_structured_llm():
+    return get_llm().with_structured_output(InteractionWithAPersonCard)
+
+
+@lru_cache(maxsize=1)
+def get_structured_batch_llm():
+    return get_llm().with_structured_output(InteractionWithAPersonCardBatch)
+
+
+# Bump EXTRACTION_PROMPT_VERSION in constants.py when changing these prompts
+def build_prompt(input: str) -> str:
+    return f"""Extract information about an interaction with a person from the following text, following the 5 Whys framework (Who, Where, When, Why, How).
 
 Text:
 {input}
 """
-    
+
+
+def build_chunk_prompt(chunk: str, index: int, count: int) -> str:
+    return f"""Extract information about an interaction with a person from the following text, following the 5 Whys framework (Who, Where, When, Why, How).
+The text is part {index + 1} of {count} of a longer transcript: only report what this part says.
+
+Text:
+{chunk}
+"""
+
+
+def build_batch_prompt(inputs: list[str]) -> str:
+    texts = "\n\n".join(f"Text {i}:\n{input}" for i, input in enumerate(inputs, start=1))
+    return f"""Extract information about an interaction with a person from each of the following {len(inputs)} texts, following the 5 Whys framework (Who, Where, When, Why, How).
+Each text is independent. Return exactly {len(inputs)} cards, in the same order as the texts.
+
+{texts}
+"""
+
+
+async def call_llm(kind: str, make_call, hedge: bool = True):
+    """
+    Calls the model through the extraction guard, observing the latency by kind ("single" or "batch")
+    and outcome ("success", "error", or "rejected" by the circuit breaker).
+    """
+    started_at = time.perf_counter()
+    outcome = "error"
     try:
-        result = structured_llm.invoke(prompt)
-        return {"interaction_card": result}
-    except Exception as e:
-        return {"error": str(e)}
+        result = await get_extraction_guard().call(make_call, hedge=hedge)
+        outcome = "success"
+        return result
+    except CircuitOpenError:
+        outcome = "rejected"
+        raise
+    finally:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - started_at, kind, outcome)
+
+
+async def extract_card(input: str) -> InteractionWithAPersonCard:
+    prompt = build_prompt(input)
+    return await call_llm("single", lambda: get_structured_llm().ainvoke(prompt))
+
+
+async def extract_chunk_card(chunk: str, index: int, count: int) -> InteractionWithAPersonCard:
+    prompt = build_chunk_prompt(chunk, index, count)
+    return await call_llm("chunk", lambda: get_structured_llm().ainvoke(prompt))
+
+
+async def extract_cards(inputs: list[str]) -> list[InteractionWithAPersonCard]:
+    # Batched calls are not hedged: their latency grows with the batch size, so no percentile applies
+    prompt = build_batch_prompt(inputs)
+    result = await call_llm("batch", lambda: get_structured_batch_llm().ainvoke(prompt), hedge=False)
+    return result.cards
+
+
+@lru_cache(maxsize=1)
+def get_extraction_batcher() -> ExtractionMicroBatcher | None:
+    """
+    Returns the process-wide micro-batcher, or None unless EXTRACTION_MICROBATCH_ENABLED is set.
+    """
+    if os.getenv("EXTRACTION_MICROBATCH_ENABLED", "false").lower() != "true":
+        return None
+
+    return ExtractionMicroBatcher(
+        extract_one=extract_card,
+        extract_many=extract_cards,
+        window_seconds=float(os.getenv("EXTRACTION_MICROBATCH_WINDOW_MS", "20")) / 1000,
+        max_batch_size=int(os.getenv("EXTRACTION_MICROBATCH_MAX_SIZE", "8")),
+    )
+
+
+def heuristic_extract_node(state):
+    """
+    Fills the card without the LLM when the input is formulaic enough (see graphs/heuristic_extractor.py).
+    Does nothing unless EXTRACTION_HEURISTIC_ENABLED is set.
+    """
+    extractor = get_heuristic_extractor()
+    input = state.get("input", "").strip()
+
+    if not extractor or not input:
+        return {}
 
+    with GRAPH_NODE_SECONDS.time("heuristic_extract"):
+        extraction = extractor.extract(input)
+    if extraction is None:
+        return {}
 
-workflow = StateGraph(GraphState)
-workflow.add_node("extract_interaction", extract_interaction_node)
+    return {
+        "interaction_card": extraction.card,
+        "extracted_by": "heuristic",
+        "heuristic_confidence": extraction.confidence,
+    }
 
-workflow.set_entry_point("extract_interaction")
-workflow.add_edge("extract_interaction", END)
 
-extract_interaction_with_a_person_card_graph = workflow.compile()
+def route_after_heuristic(state) -> str | list:
+    """
+    Ends the graph if the heuristic filled the card. Otherwise, sends an input over the chunk budget
+    to one extract_chunk node per chunk, run concurrently, and any other input to extract_interaction.
+    """
+    if state.get("interaction_card"):
+        return "done"
+
+    chunks = get_input_chunker().split(state.get("input", "").strip())
+    if not chunks:
+        return "extract_interaction"
+
+    from langgraph.types import Send
+
+    return [
+        Send("extract_chunk", {"chunk": chunk, "index": index, "count": len(chunks)})
+        for index, chunk in enumerate(chunks)
+    ]
+
+
+async def extract_interaction_node(state):
+    """
+    Uses Google Gemini to extract structured interaction data from input text.
+    """
+    input = state.get("input", "").strip()
+    
+    if not input:
+        return {"error": "No input text provided"}
+    
+    batcher = get_extraction_batcher()
+    
+    with GRAPH_NODE_SECONDS.time("extract_interaction"):
+        try:
+            if batcher:
+                result = await batcher.submit(input)
+            else:
+                result = await extract_card(input)
+            return {"interaction_card": result, "extracted_by": "llm"}
+        except CircuitOpenError:
+            # Not a problem with the input: let the caller answer 503
+            raise
+        except Exception as e:
+            return {"error": str(e)}
+
+
+async def extract_chunk_node(state: ChunkState):
+    """
+    Extracts a partial card from one chunk of a long input.
+    """
+    with GRAPH_NODE_SECONDS.time("extract_chunk"):
+        try:
+            card = await extract_chunk_card(state["chunk"], state["index"], state["count"])
+            return {"chunk_cards": [(state["index"], card)]}
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            return {"chunk_errors": [f"Chunk {state['index'] + 1}/{state['count']}: {e}"]}
+
+
+def merge_values(values: list[str | None]) -> str | None:
+    """
+    Joins the distinct non-empty values of the chunks, in order (chunks overlap, so values repeat).
+    """
+    distinct = {}
+    for value in values:
+        if value and value.strip():
+            distinct.setdefault(value.strip().casefold(), value.strip())
+    return "; ".join(distinct.values()) or None
+
+
+def merge_chunks_node(state):
+    """
+    Reduces the partial cards of the chunks into one card:
+    - who: the person named by most chunks (the earliest one on a tie)
+    - where, when: the first chunk that says, as the setting of a conversation is usually given first
+    - why, how: every distinct value, in order
+    A single failed chunk fails the extraction, as a partial card would otherwise be cached.
+    """
+    with GRAPH_NODE_SECONDS.time("merge_chunks"):
+        if state.get("chunk_errors"):
+            return {"error": state["chunk_errors"][0]}
+
+        cards = [card for _, card in sorted(state.get("chunk_cards", []), key=lambda pair: pair[0])]
+        if not cards:
+            return {"error": "No chunk could be extracted"}
+
+        names = [card.who.strip() for card in cards if card.who and card.who.strip()]
+        votes = Counter(name.casefold() for name in names)
+        who = next((name for name in names if votes[name.casefold()] == max(votes.values())), cards[0].who)
+
+        card = InteractionWithAPersonCard(
+            who=who,
+            where=next((card.where for card in cards if card.where), None),
+            when=next((card.when for card in cards if card.when), None),
+            why=merge_values([card.why for card in cards]),
+            how=merge_values([card.how for card in cards]),
+        )
+        return {"interaction_card": card, "extracted_by": "llm"}
+
+
+def build_extraction_workflow() -> "StateGraph":
+    from langgraph.graph import END, StateGraph
+
+    workflow = StateGraph(GraphState)
+    workflow.add_node("heuristic_extract", heuristic_extract_node)
+    workflow.add_node("extract_interaction", extract_interaction_node)
+    workflow.add_node("extract_chunk", extract_chunk_node)
+    workflow.add_node("merge_chunks", merge_chunks_node)
+
+    workflow.set_entry_point("heuristic_extract")
+    workflow.add_conditional_edges(
+        "heuristic_extract",
+        route_after_heuristic,
+        {"done": END, "extract_interaction": "extract_interaction", "extract_chunk": "extract_chunk"},
+    )
+    workflow.add_edge("extract_interaction", END)
+    # Runs once, after every chunk of the fan-out
+    workflow.add_edge("extract_chunk", "merge_chunks")
+    workflow.add_edge("merge_chunks", END)
+
+    return workflow
+
+
+@lru_cache(maxsize=1)
+def get_extraction_graph() -> "CompiledStateGraph":
+    """
+    Compiles the extraction graph once per process, configuring Opik first.
+    """
+    configure_opik()
+
+    return build_extraction_workflow().compile()
+
+
+@lru_cache(maxsize=1)
+def get_checkpointed_extraction_graph(pool: "asyncpg.Pool") -> "CompiledStateGraph":
+    """
+    Compiles the extraction graph with a checkpointer storing its runs in Postgres through `pool`
+    (see graphs/extraction_checkpoints.py), once per process.
+    """
+    from graphs.postgres_checkpointer import AsyncpgCheckpointSaver
+
+    configure_opik()
+
+    return build_extraction_workflow().compile(checkpointer=AsyncpgCheckpointSaver(pool))
+
+
+@lru_cache(maxsize=1)
+def get_graph_description() -> "Graph":
+    """
+    Describes the graph for the Opik tracer once per process: the graph never changes after compilation.
+    """
+    return get_extraction_graph().get_graph(xray=True)
+
+
+def warm_up() -> None:
+    """
+    Pays for the imports, the Opik configuration, the graph compilation and the Gemini client up front.
+    """
+    import opik.integrations.langchain  # noqa: F401 (the tracer of every extraction)
+
+    get_graph_description()
+    if get_extraction_checkpoints():
+        import graphs.postgres_checkpointer  # noqa: F401 (the checkpointer of every extraction)
+    get_structured_llm()
+    get_structured_batch_llm()
 
 if __name__ == "__main__":
+    import asyncio
     from opik.integrations.langchain import OpikTracer
     from dotenv import load_dotenv
     load_dotenv()
 
-    tracer = OpikTracer(graph=extract_interaction_with_a_person_card_graph.get_graph(xray=True))
+    graph = get_extraction_graph()
+    tracer = OpikTracer(graph=get_graph_description())
     inputs = {"input": "I met John at the coffee shop yesterday. We talked about AI and machine learning for hours. It was a really stimulating conversation!"}
-    result = extract_interaction_with_a_person_card_graph.invoke(
+    result = asyncio.run(graph.ainvoke(
         inputs,
         config={
             "callbacks": [tracer],
         },
-    )
+    ))
     print(result)
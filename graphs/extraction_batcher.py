@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from services.RunningStat import RunningStat
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ExtractionMicroBatcher(Generic[T]):
+    """
+    Coalesces extractions submitted within `window_seconds` (up to `max_batch_size`) into one multi-item call.
+    Each caller gets its own result back. If the batched call fails, or returns the wrong number of results,
+    every item of the batch falls back to its own single-item call.
+    """
+
+    def __init__(
+        self,
+        extract_one: Callable[[str], Awaitable[T]],
+        extract_many: Callable[[list[str]], Awaitable[list[T]]],
+        window_seconds: float,
+        max_batch_size: int,
+    ):
+        self.extract_one = extract_one
+        self.extract_many = extract_many
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: list[tuple[str, asyncio.Future, float]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.fallbacks = 0
+        self.batch_size = RunningStat()
+        self.queue_wait_ms = RunningStat()
+        self.call_latency_ms = RunningStat()
+
+    async def submit(self, input: str) -> T:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((input, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        # Keep a reference so the task is not garbage collected mid-flight
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: list[tuple[str, asyncio.Future, float]]) -> None:
+        dispatched_at = time.perf_counter()
+        for _, _, submitted_at in batch:
+            self.queue_wait_ms.observe((dispatched_at - submitted_at) * 1000)
+        self.batches += 1
+        self.batch_size.observe(len(batch))
+
+        inputs = [input for input, _, _ in batch]
+        futures = [future for _, future, _ in batch]
+
+        if len(batch) == 1:
+            await self._run_single(inputs[0], futures[0])
+            self.call_latency_ms.observe((time.perf_counter() - dispatched_at) * 1000)
+            return
+
+        try:
+            results = await self.extract_many(inputs)
+            if len(results) != len(inputs):
+                raise ValueError(f"Expected {len(inputs)} results, got {len(results)}")
+        except Exception as e:
+            logger.warning(f"Batched extraction of {len(batch)} items failed, falling back to single calls: {e}")
+            self.fallbacks += 1
+            await asyncio.gather(*(
+                self._run_single(input, future) for input, future in zip(inputs, futures)
+            ))
+            return
+        finally:
+            self.call_latency_ms.observe((time.perf_counter() - dispatched_at) * 1000)
+
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_single(self, input: str, future: asyncio.Future) -> None:
+        try:
+            result = await self.extract_one(input)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        if not future.done():
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "window_ms": self.window_seconds * 1000,
+            "max_batch_size": self.max_batch_size,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "fallbacks": self.fallbacks,
+            "batch_size": self.batch_size.to_dict(),
+            "queue_wait_ms": self.queue_wait_ms.to_dict(),
+            "call_latency_ms": self.call_latency_ms.to_dict(),
+        }
@@ -0,0 +1,100 @@
+import hashlib
+import logging
+import os
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from services.Metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from langgraph.graph.state import CompiledStateGraph
+
+logger = logging.getLogger(__name__)
+
+# Checkpoints older than the TTL are deleted every this many runs
+PURGE_EVERY_RUNS = 1000
+
+
+def make_thread_id(sub: str, cache_key: str) -> str:
+    """
+    Names the checkpointed thread of an extraction after the requester and the extraction cache key,
+    so that a retry of the same interaction finds the run of the first attempt.
+    """
+    return hashlib.sha256(f"{sub}\x00{cache_key}".encode("utf-8")).hexdigest()
+
+
+class ExtractionCheckpoints:
+    """
+    Runs the extraction graph on checkpointed threads, so that an extraction is not paid twice when the
+    request fails after it (e.g. the INSERT times out on the pool, or the process is restarted):
+    - a thread whose run finished with a card is answered from its stored state, without running any node
+    - a thread whose run was interrupted resumes from its last checkpoint (finished chunks are not run again)
+    - anything else (no thread, or a run that failed) starts a new run
+    Threads are deleted once their interaction is stored (see InteractionService._persist_interactions),
+    and purged after `ttl_seconds` otherwise.
+    `durability` is LangGraph's: "exit" writes a single checkpoint when the run ends, "async" and "sync"
+    write one per step, so that interrupted runs can resume mid-way, at the cost of more writes.
+    """
+
+    def __init__(self, durability: str, ttl_seconds: float):
+        self.durability = durability
+        self.ttl_seconds = ttl_seconds
+        self.runs = {"started": 0, "resumed": 0, "continued": 0, "restarted": 0}
+
+    async def run(self, graph: "CompiledStateGraph", input: str, thread_id: str, config: dict) -> dict[str, Any]:
+        config = {**config, "configurable": {"thread_id": thread_id}}
+        snapshot = await graph.aget_state(config)
+
+        if snapshot.values.get("input") == input:
+            if not snapshot.next and snapshot.values.get("interaction_card"):
+                self.runs["resumed"] += 1
+                return snapshot.values
+            if snapshot.next:
+                self.runs["continued"] += 1
+                return await graph.ainvoke(None, config, durability=self.durability)
+
+        if snapshot.values:
+            # A failed run: start over on a clean thread, as the state channels would otherwise accumulate
+            self.runs["restarted"] += 1
+            await graph.checkpointer.adelete_thread(thread_id)
+        else:
+            self.runs["started"] += 1
+            if self.runs["started"] % PURGE_EVERY_RUNS == 0:
+                await self._purge(graph)
+
+        return await graph.ainvoke({"input": input}, config, durability=self.durability)
+
+    async def _purge(self, graph: "CompiledStateGraph") -> None:
+        try:
+            await graph.checkpointer.apurge(self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Error purging extraction checkpoints: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "durability": self.durability,
+            "ttl_seconds": self.ttl_seconds,
+            "runs": dict(self.runs),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_extraction_checkpoints() -> ExtractionCheckpoints | None:
+    """
+    Returns the process-wide extraction checkpoints, or None unless EXTRACTION_CHECKPOINTS_ENABLED is set.
+    """
+    if os.getenv("EXTRACTION_CHECKPOINTS_ENABLED", "false").lower() != "true":
+        return None
+
+    checkpoints = ExtractionCheckpoints(
+        durability=os.getenv("EXTRACTION_CHECKPOINT_DURABILITY", "exit"),
+        ttl_seconds=float(os.getenv("EXTRACTION_CHECKPOINT_TTL_SECONDS", "86400")),
+    )
+
+    REGISTRY.counter(
+        "extraction_checkpoint_runs_total", "Checkpointed extraction graph runs, per outcome",
+        lambda: [((outcome,), count) for outcome, count in checkpoints.runs.items()],
+        ["outcome"],
+    )
+    return checkpoints
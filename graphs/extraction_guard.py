@@ -0,0 +1,304 @@
+import asyncio
+import contextvars
+import logging
+import os
+import statistics
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Awaitable, Callable, TypeVar
+
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Latencies kept to compute the hedging delay, and how many are needed before hedging at all
+LATENCY_WINDOW_SIZE = 500
+MIN_LATENCY_SAMPLES = 20
+
+# The calls of an extraction run under a deadline (see `ExtractionGuard.run_with_deadline`) flag it here when
+# the deadline cancels them. The run's tasks share the flag, as they copy the context it is set in
+_deadline_run: contextvars.ContextVar[dict | None] = contextvars.ContextVar("deadline_run", default=None)
+
+# HTTP statuses of the model API that reject the request itself (e.g. a prompt it refuses), not the provider's health
+INPUT_ERROR_STATUS_CODES = {400, 413}
+
+
+def is_input_error(error: BaseException) -> bool:
+    """
+    Whether a failed call is due to its input, e.g. a prompt refused by the API or an answer that does not
+    parse into a card, rather than to the provider or the transport. The provider answered, so such errors
+    must not open the circuit for every user.
+    """
+    # Imported here: the guard is loaded at startup, LangChain only with the extraction stack
+    from langchain_core.exceptions import OutputParserException
+
+    if isinstance(error, (OutputParserException, ValidationError)):
+        return True
+    # Gemini client errors carry the HTTP status, and LangChain wraps them
+    return any(
+        getattr(candidate, "code", None) in INPUT_ERROR_STATUS_CODES
+        for candidate in (error, error.__cause__)
+    )
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling the model while the circuit breaker is open.
+    """
+
+    def __init__(self, retry_after_seconds: float):
+        super().__init__(f"Extraction model unavailable, retry in {retry_after_seconds:.0f}s")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed calls (provider, transport or timeout errors, see
+    `is_input_error`), so that callers fail fast instead of waiting on an unhealthy provider.
+    After `reset_timeout_seconds`, a single probe call is let through (half-open): its success closes the
+    circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.consecutive_failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """
+        Raises CircuitOpenError if the call must not be made. Returns whether the call is the half-open probe.
+        """
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+
+        self.rejected += 1
+        retry_after = self._opened_at + self.reset_timeout_seconds - time.monotonic()
+        raise CircuitOpenError(max(retry_after, 1.0))
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """
+        Lets another call probe, when the probe was cancelled before it had an outcome.
+        """
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        # Calls that were already in flight when the circuit opened do not extend it
+        if self._probing or (self._opened_at is None and self.consecutive_failures >= self.failure_threshold):
+            self.opened += 1
+            self._opened_at = time.monotonic()
+            logger.warning(f"Extraction circuit breaker opened after {self.consecutive_failures} consecutive failures")
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout_seconds,
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class ExtractionGuard:
+    """
+    Protects callers from a slow or failing extraction model:
+    - deadline: `run_with_deadline` bounds a whole extraction (graph run) to `deadline_seconds`
+    - hedging: when a call is slower than the `hedge_percentile` of recent calls, a second identical call
+      is sent and the first answer wins; at most `hedge_max_ratio` of calls are hedged, so a degraded
+      provider does not get twice the load
+    - circuit breaker: optional, see CircuitBreaker
+    """
+
+    def __init__(
+        self,
+        deadline_seconds: float | None,
+        hedge_percentile: float | None,
+        hedge_max_ratio: float,
+        breaker: CircuitBreaker | None,
+    ):
+        self.deadline_seconds = deadline_seconds
+        self.hedge_percentile = hedge_percentile
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breaker = breaker
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW_SIZE)
+
+        self.calls = 0
+        self.failures = 0
+        self.deadline_exceeded = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def hedge_delay(self) -> float | None:
+        """
+        Returns how long to wait for a call before hedging it, None if it must not be hedged.
+        """
+        if self.hedge_percentile is None or len(self._latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        if self.hedges_sent >= self.hedge_max_ratio * self.calls:
+            return None
+        return statistics.quantiles(self._latencies, n=100, method="inclusive")[int(self.hedge_percentile) - 1]
+
+    async def call(self, make_call: Callable[[], Awaitable[T]], hedge: bool = True) -> T:
+        """
+        Calls the model through the circuit breaker, hedging the call if it is slow.
+        `make_call` must start a new, independent call every time it is invoked.
+        """
+        probe = self.breaker.before_call() if self.breaker else False
+
+        self.calls += 1
+        started_at = time.perf_counter()
+        try:
+            result = await self._call_hedged(make_call, self.hedge_delay() if hedge else None)
+        except Exception as e:
+            self.failures += 1
+            if self.breaker:
+                if is_input_error(e):
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled, e.g. by the deadline: a run cancels all of its calls at once (one per chunk of a long
+            # input), so the deadline records a single breaker failure for the run instead
+            deadline_run = _deadline_run.get()
+            if deadline_run is not None:
+                deadline_run["cancelled_calls"] += 1
+                # Left to the run: if the deadline cancelled the probe, its failure opens the circuit again
+                deadline_run["cancelled_probe"] |= probe
+            elif probe:
+                self.breaker.release_probe()
+            raise
+
+        self._latencies.append(time.perf_counter() - started_at)
+        if self.breaker:
+            self.breaker.record_success()
+        return result
+
+    async def _call_hedged(self, make_call: Callable[[], Awaitable[T]], hedge_delay: float | None) -> T:
+        primary = asyncio.ensure_future(make_call())
+        if hedge_delay is None:
+            return await primary
+
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                return primary.result()
+
+            self.hedges_sent += 1
+            hedged = asyncio.ensure_future(make_call())
+            tasks.append(hedged)
+
+            # First success wins; the call only fails once both attempts have failed
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedged:
+                            self.hedges_won += 1
+                        return task.result()
+            return primary.result()
+        finally:
+            # Also reached when the caller is cancelled, e.g. by the deadline
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def run_with_deadline(self, awaitable: Awaitable[T]) -> T:
+        """
+        Awaits a whole extraction, raising TimeoutError once the deadline is exceeded.
+        A run whose model calls were cut short by the deadline counts as one circuit breaker failure,
+        however many calls it had in flight: a provider that is too slow is unhealthy too. A half-open probe
+        cut short by the deadline has failed, so the circuit opens again.
+        """
+        if not self.deadline_seconds:
+            return await awaitable
+
+        deadline_run = {"cancelled_calls": 0, "cancelled_probe": False}
+        token = _deadline_run.set(deadline_run)
+        timed_out = False
+        try:
+            async with asyncio.timeout(self.deadline_seconds):
+                return await awaitable
+        except TimeoutError:
+            timed_out = True
+            self.deadline_exceeded += 1
+            if deadline_run["cancelled_calls"]:
+                self.failures += 1
+                if self.breaker:
+                    self.breaker.record_failure()
+            raise
+        finally:
+            _deadline_run.reset(token)
+            # A probe cancelled for another reason (e.g. the client went away) had no outcome
+            if deadline_run["cancelled_probe"] and not timed_out:
+                self.breaker.release_probe()
+
+    def stats(self) -> dict:
+        hedge_delay = self.hedge_delay()
+        return {
+            "deadline_ms": self.deadline_seconds * 1000 if self.deadline_seconds else None,
+            "calls": self.calls,
+            "failures": self.failures,
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedging": {
+                "enabled": self.hedge_percentile is not None,
+                "percentile": self.hedge_percentile,
+                "max_ratio": self.hedge_max_ratio,
+                "delay_ms": hedge_delay * 1000 if hedge_delay is not None else None,
+                "hedges_sent": self.hedges_sent,
+                "hedges_won": self.hedges_won,
+            },
+            "circuit_breaker": self.breaker.stats() if self.breaker else {"enabled": False},
+        }
+
+
+@lru_cache(maxsize=1)
+def get_extraction_guard() -> ExtractionGuard:
+    """
+    Returns the process-wide extraction guard, configured from the environment on first use.
+    """
+    deadline_ms = float(os.getenv("EXTRACTION_DEADLINE_MS", "30000"))
+    failure_threshold = int(os.getenv("EXTRACTION_BREAKER_FAILURE_THRESHOLD", "5"))
+
+    return ExtractionGuard(
+        deadline_seconds=deadline_ms / 1000 if deadline_ms > 0 else None,
+        hedge_percentile=(
+            min(max(float(os.getenv("EXTRACTION_HEDGE_PERCENTILE", "95")), 1), 99)
+            if os.getenv("EXTRACTION_HEDGE_ENABLED", "false").lower() == "true"
+            else None
+        ),
+        hedge_max_ratio=float(os.getenv("EXTRACTION_HEDGE_MAX_RATIO", "0.1")),
+        breaker=CircuitBreaker(
+            failure_threshold=failure_threshold,
+            reset_timeout_seconds=float(os.getenv("EXTRACTION_BREAKER_RESET_SECONDS", "30")),
+        ) if failure_threshold > 0 else None,
+    )
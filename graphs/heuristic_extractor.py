@@ -0,0 +1,203 @@
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from models.InteractionWithAPersonCard import InteractionWithAPersonCard
+from services.RunningStat import RunningStat
+
+# Only short, single-sentence inputs are attempted: longer ones rarely follow a single template
+MAX_WORDS = 25
+
+# Words after the name that no field accounts for (e.g. "in person") before the confidence is lowered
+MAX_UNCONSUMED_WORDS = 2
+
+# "Met Anna", "I had lunch with Anna Smith", "Ran into Dr. Lee"... The verb is case-insensitive, the name is not
+WHO_PATTERN = re.compile(
+    r"\b(?i:met|meet|saw|ran into|bumped into|caught up with|visited|called|chatted with|"
+    r"talked (?:to|with)|spoke (?:to|with)|"
+    r"had (?:lunch|dinner|breakfast|coffee|drinks|a call|a meeting|a chat) with)\s+"
+    r"(?P<who>(?:(?:Dr|Mr|Mrs|Ms|Prof)\.? )?[A-Z][\w'-]+(?: [A-Z][\w'-]+)?)"
+)
+
+# A capitalized word right after the name means it was cut short ("Met Anna Smith Jones")
+NAME_CUT_SHORT_PATTERN = re.compile(r"\s+[A-Z]")
+
+# Capitalized words that start a group or a description rather than a name ("Met The team", "Saw My sister")
+NOT_A_NAME_PATTERN = re.compile(
+    r"(?:the|a|an|my|our|your|his|her|their|this|that|these|those|some|everyone|everybody|someone|"
+    r"somebody|people|friends|family|team|i|we|you|he|she|they|him|them|us)\b",
+    re.IGNORECASE,
+)
+
+WEEKDAYS = r"monday|tuesday|wednesday|thursday|friday|saturday|sunday"
+WHEN_PATTERN = re.compile(
+    rf"\b(?P<when>(?:on |last |this |next )?(?:{WEEKDAYS})(?: (?:morning|afternoon|evening|night))?|"
+    r"yesterday(?: (?:morning|afternoon|evening))?|today|tonight|"
+    r"this (?:morning|afternoon|evening|week|weekend)|last (?:night|week|weekend|month)|"
+    r"in the (?:morning|afternoon|evening)|at \d{1,2}(?::\d{2})? ?(?:am|pm)|(?:at )?(?:noon|midnight)|"
+    r"(?:on )?(?:the )?\d{1,2}(?:st|nd|rd|th)? of [a-z]+)\b",
+    re.IGNORECASE,
+)
+
+# The place stops at the next time, purpose or clause keyword
+WHERE_PATTERN = re.compile(
+    r"\b(?:at|in)\s+(?P<where>(?:the |a |an |my |our |his |her |their )?[^,.;!?]+?)"
+    r"(?=\s+(?:at|in|on|last|this|next|yesterday|today|tonight|to|for|about|and|with|because)\b|[,.;!?]|$)",
+    re.IGNORECASE,
+)
+
+# "in the morning", "at 5pm" are times, and "in person", "in private" manners, not places
+NOT_A_PLACE_PATTERN = re.compile(
+    r"\d.*|the (?:morning|afternoon|evening)|person|private|public|passing|secret",
+    re.IGNORECASE,
+)
+
+# Phrases after "to" or "for" that are no purpose: "for the first time", "to be honest", "for hours"...
+NOT_A_PURPOSE = (
+    r"be (?:honest|fair|sure|clear)|the (?:first|second|last|\w+th) time|a (?:while|bit)|"
+    r"(?:an? |\d+ |a few |several )?(?:minutes?|hours?|days?|weeks?|months?|years?|ages|long)|now|once|good"
+)
+
+# The purpose stops at the next time or place keyword, like the place does, and at the next clause
+WHY_PATTERN = re.compile(
+    rf"\b(?:to|about|for|because)\s+(?!(?:{NOT_A_PURPOSE})\b)(?P<why>[^,.;!?]+?)"
+    rf"(?=\s+(?:at|in|on|last|this|next|yesterday|today|tonight|{WEEKDAYS}|and|but|so|then|while)\b|"
+    r"[,.;!?]|$)",
+    re.IGNORECASE,
+)
+
+# Negated, hypothetical or future interactions are left to the LLM
+HEDGE_PATTERN = re.compile(
+    r"\b(?:not|never|didn't|don't|won't|will|going to|might|maybe|cancel(?:l?ed)?|if)\b|n't\b",
+    re.IGNORECASE,
+)
+
+WORD_PATTERN = re.compile(r"[\w'-]+")
+
+# A period after a title ("Dr. Lee") does not end the sentence
+SENTENCE_BREAK_PATTERN = re.compile(r"(?<!\bDr)(?<!\bMr)(?<!\bMs)(?<!\bMrs)(?<!\bProf)[.!?]\s+\S")
+
+# Weight of each extracted field in the confidence score; `who` is required
+WEIGHTS = {"who": 0.5, "where": 0.2, "when": 0.15, "why": 0.15}
+
+
+@dataclass
+class HeuristicExtraction:
+    card: InteractionWithAPersonCard | None
+    confidence: float
+
+
+def heuristic_extract(input: str) -> HeuristicExtraction:
+    """
+    Fills a card from formulaic inputs such as "Met Anna at the gym on Monday to plan the run".
+    The confidence is the weighted share of the fields found, 0 when no template applies. When more than
+    MAX_UNCONSUMED_WORDS words after the name are left out of every field ("... and to be honest it was
+    weird"), the input says more than the card, and the confidence is scaled by the share of words used.
+    """
+    text = input.strip()
+    if (
+        not text
+        or len(text.split()) > MAX_WORDS
+        or SENTENCE_BREAK_PATTERN.search(text)
+        or HEDGE_PATTERN.search(text)
+    ):
+        return HeuristicExtraction(card=None, confidence=0.0)
+
+    who_match = WHO_PATTERN.search(text)
+    if not who_match or NOT_A_NAME_PATTERN.match(who_match.group("who")):
+        return HeuristicExtraction(card=None, confidence=0.0)
+
+    # The other fields are only looked for after the name, so "Met Anna" never yields a place before it
+    rest = text[who_match.end():]
+    if NAME_CUT_SHORT_PATTERN.match(rest):
+        return HeuristicExtraction(card=None, confidence=0.0)
+
+    when_match = WHEN_PATTERN.search(rest)
+    when = when_match.group("when") if when_match else None
+
+    where = None
+    place_match = None
+    for where_match in WHERE_PATTERN.finditer(rest):
+        candidate = where_match.group("where").strip()
+        if not WHEN_PATTERN.fullmatch(candidate) and not NOT_A_PLACE_PATTERN.fullmatch(candidate):
+            where = candidate
+            place_match = where_match
+            break
+
+    why_match = WHY_PATTERN.search(rest)
+    why = why_match.group("why").strip() if why_match else None
+
+    fields = {"who": who_match.group("who"), "where": where, "when": when, "why": why}
+    confidence = sum(WEIGHTS[name] for name, value in fields.items() if value)
+
+    unconsumed = list(rest)
+    for match in (when_match, place_match, why_match):
+        if match:
+            unconsumed[match.start():match.end()] = " " * (match.end() - match.start())
+    words = len(WORD_PATTERN.findall(rest))
+    unconsumed_words = len(WORD_PATTERN.findall("".join(unconsumed)))
+    if unconsumed_words > MAX_UNCONSUMED_WORDS:
+        confidence *= (words - unconsumed_words) / words
+
+    return HeuristicExtraction(card=InteractionWithAPersonCard(**fields), confidence=round(confidence, 2))
+
+
+class HeuristicExtractor:
+    """
+    Decides which extractions skip the LLM: those whose heuristic confidence reaches `threshold`.
+    Counts hits (LLM skipped), fallbacks (a card below the threshold) and no-matches (no template applied).
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+
+        self.hits = 0
+        self.fallbacks = 0
+        self.no_matches = 0
+        self.confidence = RunningStat()
+
+    def extract(self, input: str) -> HeuristicExtraction | None:
+        """
+        Returns the extraction if it is confident enough to be used instead of the LLM, None otherwise.
+        """
+        extraction = heuristic_extract(input)
+        self.confidence.observe(extraction.confidence)
+
+        if extraction.card is None:
+            self.no_matches += 1
+            return None
+        if extraction.confidence < self.threshold:
+            self.fallbacks += 1
+            return None
+
+        self.hits += 1
+        return extraction
+
+    def stats(self) -> dict:
+        attempts = self.hits + self.fallbacks + self.no_matches
+        return {
+            "enabled": True,
+            "threshold": self.threshold,
+            "attempts": attempts,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "no_matches": self.no_matches,
+            "hit_rate": self.hits / attempts if attempts else 0.0,
+            "confidence": self.confidence.to_dict(),
+        }
+
+
+def get_heuristic_threshold() -> float:
+    return float(os.getenv("EXTRACTION_HEURISTIC_THRESHOLD", "0.85"))
+
+
+@lru_cache(maxsize=1)
+def get_heuristic_extractor() -> HeuristicExtractor | None:
+    """
+    Returns the process-wide heuristic extractor, or None unless EXTRACTION_HEURISTIC_ENABLED is set.
+    """
+    if os.getenv("EXTRACTION_HEURISTIC_ENABLED", "false").lower() != "true":
+        return None
+
+    return HeuristicExtractor(threshold=get_heuristic_threshold())
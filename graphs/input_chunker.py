@@ -0,0 +1,167 @@
+import math
+import os
+import re
+from functools import lru_cache
+
+from services.RunningStat import RunningStat
+
+# Rough size of a token in characters, for English text: budgets are estimated without calling a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Chunks are cut between sentences or paragraphs when possible, then between words
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class InputTooLongError(ValueError):
+    """
+    Raised when an input is over the hard cap, to be answered with a 413 before any extraction work.
+    """
+
+    def __init__(self, estimated_tokens: int, max_tokens: int):
+        super().__init__(
+            f"Interaction text is too long: about {estimated_tokens} tokens, at most {max_tokens} are accepted"
+        )
+        self.estimated_tokens = estimated_tokens
+        self.max_tokens = max_tokens
+
+
+def chunk_tail(chunk: str, max_chars: int) -> str:
+    """
+    Returns the end of a chunk, at most `max_chars` characters long: its last sentences if they fit,
+    else its last words.
+    """
+    if max_chars <= 0:
+        return ""
+    if len(chunk) <= max_chars:
+        return chunk
+
+    tail = chunk[-max_chars:]
+    sentence_start = SENTENCE_END_PATTERN.search(tail)
+    if sentence_start and sentence_start.end() < len(tail):
+        return tail[sentence_start.end():]
+    # Drop the word the cut falls in, unless it is the only one (e.g. a long URL)
+    if not chunk[-max_chars - 1].isspace() and " " in tail:
+        tail = tail.split(" ", 1)[1]
+    return tail.strip()
+
+
+def split_into_chunks(text: str, chunk_chars: int, overlap_chars: int) -> list[str]:
+    """
+    Splits text into chunks of at most about `chunk_chars` characters, cut between sentences when possible,
+    else between words. Each chunk starts with the end of the previous one (up to `overlap_chars`, see
+    `chunk_tail`), so that a fact spanning a cut is seen whole by at least one chunk.
+    """
+    overlap_chars = min(overlap_chars, chunk_chars // 2)
+    # Longer sentences are cut between words, so that any piece fits in a chunk after the overlap
+    piece_chars = chunk_chars - overlap_chars
+
+    pieces = []
+    for sentence in SENTENCE_END_PATTERN.split(text):
+        sentence = WHITESPACE_PATTERN.sub(" ", sentence).strip()
+        if not sentence:
+            continue
+        if len(sentence) <= piece_chars:
+            pieces.append(sentence)
+            continue
+        # A sentence longer than a piece (e.g. an unpunctuated transcript) is cut between words
+        words = []
+        size = 0
+        for word in sentence.split(" "):
+            for start in range(0, len(word), piece_chars):
+                part = word[start:start + piece_chars]
+                if words and size + len(part) + 1 > piece_chars:
+                    pieces.append(" ".join(words))
+                    words, size = [], 0
+                words.append(part)
+                size += len(part) + 1
+        if words:
+            pieces.append(" ".join(words))
+
+    chunks = []
+    current = ""
+    overlap_size = 0
+    for piece in pieces:
+        # A chunk holding only the previous one's overlap is never cut
+        if len(current) > overlap_size and len(current) + len(piece) + 1 > chunk_chars:
+            chunks.append(current)
+            current = chunk_tail(current, overlap_chars - 1)
+            overlap_size = len(current)
+        current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+
+class InputChunker:
+    """
+    Enforces the input size cap, and splits inputs over the chunk budget into overlapping chunks that are
+    extracted concurrently, then merged (see `merge_chunks_node` in graphs/extract_interaction_with_a_person_card.py).
+    Budgets are in estimated tokens; 0 disables the cap (`max_input_tokens`) or the chunking (`chunk_tokens`).
+    """
+
+    def __init__(self, max_input_tokens: int, chunk_tokens: int, overlap_tokens: int):
+        self.max_input_tokens = max_input_tokens
+        self.chunk_tokens = chunk_tokens
+        # An overlap of half a chunk or more would make every chunk repeat the previous one
+        self.overlap_tokens = min(overlap_tokens, chunk_tokens // 2)
+
+        self.rejected = 0
+        self.chunked = 0
+        self.chunks = RunningStat()
+
+    def check(self, input: str) -> None:
+        """
+        Raises InputTooLongError if the input is over the hard cap.
+        """
+        if not self.max_input_tokens:
+            return
+
+        estimated_tokens = estimate_tokens(input)
+        if estimated_tokens > self.max_input_tokens:
+            self.rejected += 1
+            raise InputTooLongError(estimated_tokens, self.max_input_tokens)
+
+    def split(self, input: str) -> list[str] | None:
+        """
+        Returns the chunks of an input over the chunk budget, or None if it fits in a single call.
+        """
+        if not self.chunk_tokens or estimate_tokens(input) <= self.chunk_tokens:
+            return None
+
+        chunks = split_into_chunks(
+            input, self.chunk_tokens * CHARS_PER_TOKEN, self.overlap_tokens * CHARS_PER_TOKEN
+        )
+        if len(chunks) < 2:
+            return None
+
+        self.chunked += 1
+        self.chunks.observe(len(chunks))
+        return chunks
+
+    def stats(self) -> dict:
+        return {
+            "max_input_tokens": self.max_input_tokens,
+            "chunk_tokens": self.chunk_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "rejected": self.rejected,
+            "chunked": self.chunked,
+            "chunks": self.chunks.to_dict(),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_input_chunker() -> InputChunker:
+    """
+    Returns the process-wide input chunker, configured from the environment on first use.
+    """
+    return InputChunker(
+        max_input_tokens=int(os.getenv("EXTRACTION_MAX_INPUT_TOKENS", "32000")),
+        chunk_tokens=int(os.getenv("EXTRACTION_CHUNK_TOKENS", "4000")),
+        overlap_tokens=int(os.getenv("EXTRACTION_CHUNK_OVERLAP_TOKENS", "200")),
+    )
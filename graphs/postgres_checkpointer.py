@@ -0,0 +1,202 @@
+from typing import Any, AsyncIterator, Sequence
+
+import asyncpg
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_serializable_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from database import queries
+from database.pool import acquire
+from models.InteractionWithAPersonCard import InteractionWithAPersonCard
+from services.Metrics import CHECKPOINT_SECONDS
+
+
+class AsyncpgCheckpointSaver(BaseCheckpointSaver[int]):
+    """
+    LangGraph checkpointer storing threads in the `graph_checkpoints` and `graph_checkpoint_writes` tables
+    through the application's asyncpg pool (LangGraph's own Postgres saver requires psycopg).
+    Async only, as the extraction graph is always run with `ainvoke`.
+    Checkpoints are stored whole, channel values included: the extraction state is a handful of fields,
+    so splitting unchanged values out, as LangGraph's savers do, would cost more queries than bytes saved.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        super().__init__(serde=JsonPlusSerializer(allowed_msgpack_modules=[InteractionWithAPersonCard]))
+        self.pool = pool
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """
+        Returns the checkpoint of `config` (the latest of its thread if it has no checkpoint ID), with the
+        pending writes of its next step.
+        """
+        configurable = config["configurable"]
+        with CHECKPOINT_SECONDS.time("get"):
+            async with acquire(self.pool) as conn:
+                row = await queries.fetchrow(
+                    conn, "list_graph_checkpoints",
+                    configurable["thread_id"], configurable.get("checkpoint_ns", ""), get_checkpoint_id(config),
+                    None, 1,
+                )
+                if row is None:
+                    return None
+                writes = await queries.fetch(
+                    conn, "get_graph_checkpoint_writes", row['thread_id'], row['checkpoint_ns'], row['checkpoint_id']
+                )
+
+        return self._to_tuple(row, writes)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """
+        Lists checkpoints, latest first. Metadata filters are applied after loading: threads are short.
+        """
+        configurable = config["configurable"] if config else {}
+        tuples = []
+        # Loaded before yielding, so that the connection is not held while the caller iterates
+        async with acquire(self.pool) as conn:
+            rows = await queries.fetch(
+                conn, "list_graph_checkpoints",
+                configurable.get("thread_id"), configurable.get("checkpoint_ns"),
+                get_checkpoint_id(config) if config else None,
+                get_checkpoint_id(before) if before else None,
+                None if filter else limit,
+            )
+            for row in rows:
+                metadata = self.serde.loads_typed((row['metadata_type'], row['metadata']))
+                if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+                if limit is not None and len(tuples) >= limit:
+                    break
+                writes = await queries.fetch(
+                    conn, "get_graph_checkpoint_writes", row['thread_id'], row['checkpoint_ns'], row['checkpoint_id']
+                )
+                tuples.append(self._to_tuple(row, writes, metadata))
+
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_bytes = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_bytes = self.serde.dumps_typed(get_serializable_checkpoint_metadata(config, metadata))
+
+        with CHECKPOINT_SECONDS.time("put"):
+            async with acquire(self.pool) as conn:
+                await queries.execute(
+                    conn, "put_graph_checkpoint",
+                    thread_id, checkpoint_ns, checkpoint["id"], configurable.get("checkpoint_id"),
+                    checkpoint_type, checkpoint_bytes, metadata_type, metadata_bytes,
+                )
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """
+        Stores the writes of a task that finished, so that resuming an interrupted step does not run it again.
+        """
+        configurable = config["configurable"]
+        rows = [
+            (
+                configurable["thread_id"],
+                configurable.get("checkpoint_ns", ""),
+                configurable["checkpoint_id"],
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self.serde.dumps_typed(value),
+                task_path,
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        # Special writes (errors, interrupts) replace the previous ones; regular writes are kept as first written
+        query = (
+            "upsert_graph_checkpoint_write"
+            if all(channel in WRITES_IDX_MAP for channel, _ in writes)
+            else "put_graph_checkpoint_write"
+        )
+
+        with CHECKPOINT_SECONDS.time("put_writes"):
+            async with acquire(self.pool) as conn:
+                await queries.executemany(conn, query, rows)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        with CHECKPOINT_SECONDS.time("delete"):
+            async with acquire(self.pool) as conn:
+                await queries.execute(conn, "delete_graph_checkpoint_thread", thread_id)
+
+    async def apurge(self, ttl_seconds: float) -> None:
+        """
+        Deletes the checkpoints and writes older than `ttl_seconds`, e.g. of runs that were never resumed.
+        """
+        async with acquire(self.pool) as conn:
+            await queries.execute(conn, "purge_graph_checkpoints", ttl_seconds)
+
+    def _to_tuple(
+        self,
+        row: asyncpg.Record,
+        writes: list[asyncpg.Record],
+        metadata: CheckpointMetadata | None = None,
+    ) -> CheckpointTuple:
+        thread_id = row['thread_id']
+        checkpoint_ns = row['checkpoint_ns']
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": row['checkpoint_id'],
+                }
+            },
+            checkpoint=self.serde.loads_typed((row['checkpoint_type'], row['checkpoint'])),
+            metadata=metadata if metadata is not None else self.serde.loads_typed((row['metadata_type'], row['metadata'])),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": row['parent_checkpoint_id'],
+                    }
+                }
+                if row['parent_checkpoint_id']
+                else None
+            ),
+            pending_writes=[
+                (write['task_id'], write['channel'], self.serde.loads_typed((write['value_type'], write['value'])))
+                for write in writes
+            ],
+        )
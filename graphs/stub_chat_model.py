@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import time
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_json_schema
+from pydantic import BaseModel, PrivateAttr
+
+from models.InteractionWithAPersonCard import InteractionWithAPersonCard
+from models.InteractionWithAPersonCardBatch import InteractionWithAPersonCardBatch
+
+NAMES = ["Alice", "Bob", "Chloé", "Diego", "Emma", "Farid", "Grace", "Hiro"]
+PLACES = ["the coffee shop", "the office", "a conference", "the park", "a video call", None]
+REASONS = ["a new project", "catching up", "a job interview", "a product demo", None]
+
+BATCH_TEXT_MARKER = re.compile(r"^Text \d+:$", re.MULTILINE)
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def make_card(text: str) -> InteractionWithAPersonCard:
+    """
+    Derives a card from the text alone, so the same text always yields the same card.
+    """
+    digest = _digest(text)
+    return InteractionWithAPersonCard(
+        who=NAMES[digest % len(NAMES)],
+        where=PLACES[(digest >> 8) % len(PLACES)],
+        when="yesterday",
+        why=REASONS[(digest >> 16) % len(REASONS)],
+        how="in person",
+    )
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Stands in for the Gemini client in benchmarks: no network, no API key, no cost.
+    A LangChain chat model answering with the JSON of a deterministic card (or batch of cards) after a
+    deterministic delay, so that structured output parsing, callbacks and tracing run as they do with Gemini.
+    Calls can also be made slow or failing at random, to exercise hedging, deadlines and the circuit breaker.
+    """
+
+    latency_seconds: float = 0.0
+    jitter_seconds: float = 0.0
+    slow_rate: float = 0.0
+    slow_seconds: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr()
+
+    def model_post_init(self, context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def with_structured_output(self, schema: type[BaseModel], **kwargs: Any) -> Runnable:
+        """
+        Binds the schema and parses the JSON answer into it, as Gemini's default "json_schema" method does.
+        """
+        llm = self.bind(
+            response_json_schema=schema.model_json_schema(),
+            ls_structured_output_format={"kwargs": {"method": "json_schema"}, "schema": convert_to_json_schema(schema)},
+        )
+        return llm | PydanticOutputParser(pydantic_object=schema)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = messages[-1].text
+        delay, is_error = self._draw(prompt)
+        await asyncio.sleep(delay)
+        return self._answer(prompt, is_error, kwargs)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = messages[-1].text
+        delay, is_error = self._draw(prompt)
+        time.sleep(delay)
+        return self._answer(prompt, is_error, kwargs)
+
+    def _draw(self, prompt: str) -> tuple[float, bool]:
+        """
+        Returns how long the call takes and whether it fails.
+        """
+        # The jitter is derived from the prompt rather than drawn at random, so a given input always waits the same
+        jitter = (_digest(prompt) % 1000) / 1000 * self.jitter_seconds
+        # Faults are drawn per call, so that a retry or a hedge of the same prompt may succeed
+        is_slow = self._rng.random() < self.slow_rate
+        is_error = self._rng.random() < self.error_rate
+        return (self.slow_seconds if is_slow else self.latency_seconds) + jitter, is_error
+
+    def _answer(self, prompt: str, is_error: bool, kwargs: dict) -> ChatResult:
+        if is_error:
+            raise RuntimeError("Stub model error")
+
+        if kwargs.get("response_json_schema", {}).get("title") == InteractionWithAPersonCardBatch.__name__:
+            texts = BATCH_TEXT_MARKER.split(prompt)[1:]
+            answer = InteractionWithAPersonCardBatch(cards=[make_card(text.strip()) for text in texts])
+        else:
+            answer = make_card(prompt.split("Text:\n", 1)[-1].strip())
+
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer.model_dump_json()))])
+
+
+def create_stub_chat_model() -> StubChatModel:
+    """
+    Builds the stub from the STUB_MODEL_* environment variables.
+    """
+    return StubChatModel(
+        latency_seconds=float(os.getenv("STUB_MODEL_LATENCY_MS", "500")) / 1000,
+        jitter_seconds=float(os.getenv("STUB_MODEL_JITTER_MS", "0")) / 1000,
+        slow_rate=float(os.getenv("STUB_MODEL_SLOW_RATE", "0")),
+        slow_seconds=float(os.getenv("STUB_MODEL_SLOW_MS", "10000")) / 1000,
+        error_rate=float(os.getenv("STUB_MODEL_ERROR_RATE", "0")),
+        seed=int(os.getenv("STUB_MODEL_SEED", "0")),
+    )
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from services.RunningStat import RunningStat
+
+if TYPE_CHECKING:
+    from opik.integrations.langchain import OpikTracer
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionTracing:
+    """
+    Decides which extraction graph runs are traced with Opik.
+    A `sample_rate` fraction of runs is traced live with an OpikTracer. Unsampled runs that fail, or take
+    longer than `slow_threshold_seconds`, are still traced after the fact as a single trace, from a thread,
+    so that exporting never adds latency to the request.
+    """
+
+    def __init__(self, sample_rate: float, slow_threshold_seconds: float):
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.slow_threshold_seconds = slow_threshold_seconds
+
+        self.sampled = 0
+        self.unsampled = 0
+        self.retroactive_errors = 0
+        self.retroactive_slow = 0
+        self.export_errors = 0
+        self.tracer_setup_ms = RunningStat()
+
+    def start(self) -> "OpikTracer | None":
+        """
+        Returns the tracer for a run, or None if the run is not sampled.
+        """
+        if random.random() >= self.sample_rate:
+            self.unsampled += 1
+            return None
+
+        from opik.integrations.langchain import OpikTracer
+
+        from graphs.extract_interaction_with_a_person_card import get_graph_description
+
+        self.sampled += 1
+        started_at = time.perf_counter()
+        tracer = OpikTracer(graph=get_graph_description())
+        self.tracer_setup_ms.observe((time.perf_counter() - started_at) * 1000)
+        return tracer
+
+    def finish(
+        self,
+        tracer: "OpikTracer | None",
+        input: str,
+        started_at: datetime,
+        duration_seconds: float,
+        output: dict | None = None,
+        error: str | None = None,
+    ) -> None:
+        """
+        Traces an unsampled run retroactively if it failed or was slow. Sampled runs are already traced.
+        """
+        if tracer is not None:
+            return
+
+        is_slow = duration_seconds >= self.slow_threshold_seconds
+        if not error and not is_slow:
+            return
+
+        if error:
+            self.retroactive_errors += 1
+        else:
+            self.retroactive_slow += 1
+
+        asyncio.get_running_loop().run_in_executor(
+            None, self._export, input, started_at, duration_seconds, output, error
+        )
+
+    def _export(
+        self,
+        input: str,
+        started_at: datetime,
+        duration_seconds: float,
+        output: dict | None,
+        error: str | None,
+    ) -> None:
+        try:
+            from opik.api_objects.opik_client import get_client_cached
+
+            get_client_cached().trace(
+                name="extract_interaction_with_a_person_card",
+                start_time=started_at,
+                end_time=datetime.fromtimestamp(started_at.timestamp() + duration_seconds, tz=timezone.utc),
+                input={"input": input},
+                output=_to_jsonable(output) if output else None,
+                metadata={"sampled": False, "duration_ms": duration_seconds * 1000, "error": error},
+                tags=["error" if error else "slow"],
+            )
+        except Exception as e:
+            self.export_errors += 1
+            logger.warning(f"Could not export extraction trace: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "slow_threshold_ms": self.slow_threshold_seconds * 1000,
+            "sampled": self.sampled,
+            "unsampled": self.unsampled,
+            "retroactive_errors": self.retroactive_errors,
+            "retroactive_slow": self.retroactive_slow,
+            "export_errors": self.export_errors,
+            "tracer_setup_ms": self.tracer_setup_ms.to_dict(),
+        }
+
+
+def _to_jsonable(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, dict):
+        return {key: _to_jsonable(item) for key, item in value.items()}
+    return value
+
+
+@lru_cache(maxsize=1)
+def get_extraction_tracing() -> ExtractionTracing:
+    """
+    Returns the process-wide tracing policy, configured from the environment on first use.
+    """
+    return ExtractionTracing(
+        sample_rate=float(os.getenv("OPIK_TRACE_SAMPLE_RATE", "1.0")),
+        slow_threshold_seconds=float(os.getenv("OPIK_TRACE_SLOW_THRESHOLD_MS", "10000")) / 1000,
+    )
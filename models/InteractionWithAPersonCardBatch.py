@@ -0,0 +1,9 @@
+from typing import List
+from pydantic import BaseModel, Field
+from models.InteractionWithAPersonCard import InteractionWithAPersonCard
+
+class InteractionWithAPersonCardBatch(BaseModel):
+    """
+    Several interaction cards extracted in a single call, in the same order as the texts they were extracted from.
+    """
+    cards: List[InteractionWithAPersonCard] = Field(description="One card per text, in the same order as the texts")
@@ -0,0 +1,36 @@
+"""
+Backfills the relationships table from the existing interactions.
+
+Safe to re-run: every relationship is recomputed from scratch. New interactions
+wait for the backfill to finish, so run it when traffic is low.
+
+Usage:
+    uv run python -m scripts.backfill_relationships
+"""
+
+import asyncio
+
+from dotenv import load_dotenv
+
+from database.migrations import run_migrations
+from database.pool import create_pool
+from services.RelationshipService import RelationshipService
+
+load_dotenv()
+
+
+async def main():
+    pool = await create_pool()
+
+    try:
+        await run_migrations(pool)
+
+        count = await RelationshipService(pool).backfill()
+        print(f"✓ Backfilled {count} relationships")
+
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""
+Measures what checkpointing the extraction graph in Postgres (EXTRACTION_CHECKPOINTS_ENABLED) costs an
+extraction, and what resuming a checkpointed run saves.
+
+Runs the extraction graph with the stub model (no Gemini call, no latency) so that only the graph and its
+checkpoints are timed, against the database of the POSTGRES_* environment variables:
+- plain: the graph without checkpointer
+- exit, async, sync: the checkpointed graph with each EXTRACTION_CHECKPOINT_DURABILITY
+- resume: a retry of a finished run, answered from its checkpoint
+- delete: deleting the thread once the interaction is stored
+With --chunks, the input is split into that many chunks, which makes every step write more.
+
+Usage:
+    uv run python -m scripts.benchmark_checkpoints
+    uv run python -m scripts.benchmark_checkpoints --runs 500 --chunks 4
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Before the graph is imported: the stub model is read from the environment on first use
+os.environ["EXTRACTION_MODEL_PROVIDER"] = "stub"
+os.environ["STUB_MODEL_LATENCY_MS"] = "0"
+os.environ["STUB_MODEL_JITTER_MS"] = "0"
+os.environ["EXTRACTION_HEURISTIC_ENABLED"] = "false"
+
+from database.migrations import run_migrations  # noqa: E402
+from database.pool import create_pool  # noqa: E402
+from graphs.extract_interaction_with_a_person_card import (  # noqa: E402
+    get_checkpointed_extraction_graph,
+    get_extraction_graph,
+)
+from graphs.extraction_checkpoints import ExtractionCheckpoints  # noqa: E402
+from graphs.input_chunker import CHARS_PER_TOKEN, get_input_chunker  # noqa: E402
+
+DURABILITIES = ["exit", "async", "sync"]
+
+
+def make_input(chunks: int) -> str:
+    if chunks <= 1:
+        return f"Had lunch with Maria downtown to talk about her move to Lisbon. {uuid.uuid4().hex}"
+
+    chunker = get_input_chunker()
+    sentence = "We went over the roadmap with Maria and agreed on the next milestones. "
+    sentences = chunks * chunker.chunk_tokens * CHARS_PER_TOKEN // len(sentence)
+    return f"{uuid.uuid4().hex}. " + sentence * sentences
+
+
+def summarize(durations_ms: list[float]) -> str:
+    quantiles = statistics.quantiles(durations_ms, n=100)
+    return (
+        f"mean {statistics.mean(durations_ms):7.2f} ms   p50 {quantiles[49]:7.2f} ms   "
+        f"p95 {quantiles[94]:7.2f} ms"
+    )
+
+
+async def main(runs: int, chunks: int) -> None:
+    pool = await create_pool()
+
+    try:
+        await run_migrations(pool)
+        await pool.expire_connections()
+
+        plain_graph = get_extraction_graph()
+        checkpointed_graph = get_checkpointed_extraction_graph(pool)
+        inputs = [make_input(chunks) for _ in range(runs)]
+        results: dict[str, list[float]] = {}
+
+        # Warm up the stub, the graphs and the pool
+        await plain_graph.ainvoke({"input": make_input(chunks)})
+        warm_up_thread_id = uuid.uuid4().hex
+        await ExtractionCheckpoints("exit", 3600).run(checkpointed_graph, make_input(chunks), warm_up_thread_id, {})
+        await checkpointed_graph.checkpointer.adelete_thread(warm_up_thread_id)
+
+        results["plain"] = []
+        for input in inputs:
+            started_at = time.perf_counter()
+            await plain_graph.ainvoke({"input": input})
+            results["plain"].append((time.perf_counter() - started_at) * 1000)
+
+        threads = []
+        for durability in DURABILITIES:
+            checkpoints = ExtractionCheckpoints(durability, 3600)
+            results[durability] = []
+            for input in inputs:
+                thread_id = uuid.uuid4().hex
+                started_at = time.perf_counter()
+                await checkpoints.run(checkpointed_graph, input, thread_id, {})
+                results[durability].append((time.perf_counter() - started_at) * 1000)
+                threads.append((thread_id, input))
+
+        checkpoints = ExtractionCheckpoints("exit", 3600)
+        results["resume"] = []
+        for thread_id, input in threads[:runs]:
+            started_at = time.perf_counter()
+            await checkpoints.run(checkpointed_graph, input, thread_id, {})
+            results["resume"].append((time.perf_counter() - started_at) * 1000)
+
+        results["delete"] = []
+        for thread_id, _ in threads:
+            started_at = time.perf_counter()
+            await checkpointed_graph.checkpointer.adelete_thread(thread_id)
+            results["delete"].append((time.perf_counter() - started_at) * 1000)
+
+    finally:
+        await pool.close()
+
+    plain_ms = statistics.mean(results["plain"])
+    print(f"{runs} runs, {max(chunks, 1)} chunk(s) per input, stub model without latency")
+    for name, durations_ms in results.items():
+        overhead = ""
+        if name in DURABILITIES:
+            overhead = f"   overhead {statistics.mean(durations_ms) - plain_ms:+7.2f} ms"
+        print(f"{name:7} {summarize(durations_ms)}{overhead}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cost of checkpointing the extraction graph.")
+    parser.add_argument("--runs", type=int, default=200, help="Extractions per mode")
+    parser.add_argument("--chunks", type=int, default=1, help="Chunks per input (1 for a short input)")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.runs, args.chunks))
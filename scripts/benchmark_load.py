@@ -0,0 +1,325 @@
+"""
+Load-tests the API end to end, to catch throughput and tail-latency regressions before deploying.
+
+The API is started with uvicorn against the Postgres configured in .env, with the Gemini model
+replaced by a deterministic stub (EXTRACTION_MODEL_PROVIDER=stub), so that runs cost nothing and
+only measure our own code. Then:
+1. POST /users creates --users benchmark users
+2. POST /interactions replays --requests interactions built from a JSONL corpus (same format as
+   requests.jsonl: request_id, title, body), between random pairs of those users, --concurrency at a time
+
+For each endpoint, it reports p50/p95/p99 latency, throughput, errors, and how long requests waited
+for a pool connection (from GET /stats). The corpus order and the user pairs come from --seed, so runs
+with the same arguments replay the same load and can be compared across commits:
+
+    uv run python -m scripts.benchmark_load --output before.json
+    git checkout my-branch
+    uv run python -m scripts.benchmark_load --baseline before.json --max-regression 0.2
+
+With --baseline, exits with a non-zero status if an endpoint's p95 is more than --max-regression
+(a fraction) above the baseline's. Use --url to target an API that is already running instead.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CORPUS = PROJECT_ROOT / "scripts" / "benchmark_corpus.jsonl"
+
+CITIES = ["Paris", "Lyon", "Berlin", "Lisbon", "Montreal"]
+
+
+def load_corpus(path: Path) -> list[str]:
+    inputs = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                inputs.append(f"{entry['title']}. {entry['body']}")
+    if not inputs:
+        raise SystemExit(f"Empty corpus: {path}")
+    return inputs
+
+
+def git_commit() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def start_api(args: argparse.Namespace, log_file) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "EXTRACTION_MODEL_PROVIDER": "stub",
+        "STUB_MODEL_LATENCY_MS": str(args.latency_ms),
+        "STUB_MODEL_JITTER_MS": str(args.jitter_ms),
+        "STUB_MODEL_SLOW_RATE": str(args.slow_rate),
+        "STUB_MODEL_SLOW_MS": str(args.slow_ms),
+        "STUB_MODEL_ERROR_RATE": str(args.error_rate),
+        "STUB_MODEL_SEED": str(args.seed),
+        # Load the extraction stack before the first request, so that it is not measured
+        "EXTRACTION_WARMUP_ON_STARTUP": "true",
+    }
+    # Keep Opik exports and the jobs worker off the measured path, unless explicitly configured
+    env.setdefault("OPIK_TRACE_SAMPLE_RATE", "0")
+    env.setdefault("JOB_WORKERS_IN_PROCESS", "false")
+
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, server: subprocess.Popen | None, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"The API exited with status {server.returncode}")
+        try:
+            response = await client.get("/")
+            if response.json()["data"]["status"]["database"]:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"The API was not ready with a database after {timeout:.0f}s")
+
+
+async def get_pool_wait(client: httpx.AsyncClient) -> dict:
+    response = await client.get("/stats")
+    return response.json()["data"]["database_pool"]["acquire_wait_ms"]
+
+
+async def run_phase(client: httpx.AsyncClient, path: str, payloads: list[dict], concurrency: int) -> dict:
+    """
+    POSTs every payload to `path`, `concurrency` at a time, and summarizes the latencies and the pool wait.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    durations_ms: list[float] = []
+    errors: dict[str, int] = {}
+
+    async def send(payload: dict) -> None:
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload)
+                status_code = str(response.status_code)
+            except httpx.HTTPError as e:
+                status_code = type(e).__name__
+            durations_ms.append((time.perf_counter() - started_at) * 1000)
+            if status_code != "200":
+                errors[status_code] = errors.get(status_code, 0) + 1
+
+    pool_wait_before = await get_pool_wait(client)
+    started_at = time.perf_counter()
+    await asyncio.gather(*(send(payload) for payload in payloads))
+    elapsed = time.perf_counter() - started_at
+    pool_wait_after = await get_pool_wait(client)
+
+    return {
+        **summarize(durations_ms),
+        "errors": errors,
+        "throughput_rps": round(len(payloads) / elapsed, 1),
+        "pool_wait_ms": pool_wait_delta(pool_wait_before, pool_wait_after),
+    }
+
+
+def summarize(durations_ms: list[float]) -> dict:
+    if len(durations_ms) < 2:
+        return {"count": len(durations_ms)}
+    quantiles = statistics.quantiles(durations_ms, n=100, method="inclusive")
+    return {
+        "count": len(durations_ms),
+        "mean_ms": round(statistics.mean(durations_ms), 2),
+        "p50_ms": round(quantiles[49], 2),
+        "p95_ms": round(quantiles[94], 2),
+        "p99_ms": round(quantiles[98], 2),
+        "max_ms": round(max(durations_ms), 2),
+    }
+
+
+def pool_wait_delta(before: dict, after: dict) -> dict:
+    """
+    The pool wait stats are cumulative over the life of the API: keeps the share of this phase.
+    """
+    count = after["count"] - before["count"]
+    total = after["mean"] * after["count"] - before["mean"] * before["count"]
+    return {"acquisitions": count, "mean_ms": round(total / count, 3) if count else 0.0}
+
+
+def build_payloads(args: argparse.Namespace, inputs: list[str]) -> tuple[list[dict], list[dict]]:
+    rng = random.Random(args.seed)
+    # Unique per run, so that neither users nor extraction cache entries carry over from a previous run
+    run_id = uuid.uuid4().hex[:8]
+
+    user_ids = [f"bench-{run_id}-{i}" for i in range(args.users)]
+    users = [
+        {
+            "sub": user_id,
+            "email": f"{user_id}@benchmark.invalid",
+            "full_name": f"Benchmark User {i}",
+            "city": rng.choice(CITIES),
+        }
+        for i, user_id in enumerate(user_ids)
+    ]
+
+    interactions = []
+    for i in range(args.requests):
+        user_id, target_user_id = rng.sample(user_ids, 2)
+        interactions.append({
+            "input": f"{rng.choice(inputs)} (benchmark {run_id}, #{i})",
+            "user_id": user_id,
+            "target_user_id": target_user_id,
+            "sub": user_id,
+        })
+
+    return users, interactions
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> int:
+    if baseline.get("config") != results["config"]:
+        print("! The baseline was run with a different configuration, the comparison may not be meaningful")
+
+    failed = False
+    for path, summary in results["results"].items():
+        baseline_summary = baseline.get("results", {}).get(path)
+        if not baseline_summary or "p95_ms" not in baseline_summary or "p95_ms" not in summary:
+            continue
+        change = summary["p95_ms"] / baseline_summary["p95_ms"] - 1
+        marker = "✗" if change > max_regression else "✓"
+        print(
+            f"{marker} {path} p95 {baseline_summary['p95_ms']:.1f} ms -> {summary['p95_ms']:.1f} ms "
+            f"({change:+.0%}, baseline {baseline.get('commit')})"
+        )
+        failed = failed or change > max_regression
+
+    return 1 if failed else 0
+
+
+def print_results(results: dict) -> None:
+    config = results["config"]
+    print(
+        f"commit {results['commit']}: {config['requests']} interactions, {config['users']} users, "
+        f"concurrency {config['concurrency']}, stub latency {config['latency_ms']:.0f}±{config['jitter_ms']:.0f} ms, "
+        f"{config['slow_rate']:.0%} slow, {config['error_rate']:.0%} errors"
+    )
+    for path, summary in results["results"].items():
+        if "p50_ms" not in summary:
+            print(f"{path:<14} {summary['count']} requests, too few to summarize")
+            continue
+        print(
+            f"{path:<14} p50 {summary['p50_ms']:8.1f} ms   p95 {summary['p95_ms']:8.1f} ms   "
+            f"p99 {summary['p99_ms']:8.1f} ms   {summary['throughput_rps']:7.1f} req/s   "
+            f"pool wait {summary['pool_wait_ms']['mean_ms']:6.2f} ms   errors {summary['errors'] or 0}"
+        )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    inputs = load_corpus(args.corpus)
+    users, interactions = build_payloads(args, inputs)
+
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    log_file = tempfile.NamedTemporaryFile("w+", prefix="benchmark_load_", suffix=".log", delete=False)
+    server = None if args.url else start_api(args, log_file)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await wait_until_ready(client, server, timeout=60)
+            results = {
+                "/users": await run_phase(client, "/users", users, args.concurrency),
+                "/interactions": await run_phase(client, "/interactions", interactions, args.concurrency),
+            }
+    except RuntimeError:
+        log_file.seek(0)
+        print(log_file.read()[-4000:], file=sys.stderr)
+        raise
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        log_file.close()
+        os.unlink(log_file.name)
+
+    return {
+        "commit": git_commit(),
+        "config": {
+            "corpus": args.corpus.name,
+            "requests": args.requests,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "slow_rate": args.slow_rate,
+            "slow_ms": args.slow_ms,
+            "error_rate": args.error_rate,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def main(args: argparse.Namespace) -> int:
+    results = asyncio.run(run(args))
+    print_results(results)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        return compare(results, baseline, args.max_regression)
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test /users and /interactions with a stub LLM.")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS, help="JSONL of {request_id, title, body}")
+    parser.add_argument("--requests", type=int, default=500, help="Interactions to record")
+    parser.add_argument("--users", type=int, default=50, help="Users to create (at least 2)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=500, help="Stub model latency")
+    parser.add_argument("--jitter-ms", type=float, default=200, help="Extra stub model latency, up to this much")
+    parser.add_argument("--slow-rate", type=float, default=0, help="Fraction of stub model calls that take --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=10000, help="Stub model latency of the slow calls")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of stub model calls that fail")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus order, the user pairs and the stub model faults")
+    parser.add_argument("--port", type=int, default=8765, help="Port of the API started by the benchmark")
+    parser.add_argument("--url", help="Benchmark an API that is already running instead (it must use the stub model)")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout, in seconds")
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="Results JSON of a previous run to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Tolerated p95 increase over the baseline")
+    args = parser.parse_args()
+
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+
+    sys.exit(main(args))
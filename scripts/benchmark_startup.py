@@ -0,0 +1,88 @@
+"""
+Benchmarks the cold start of the API, to catch startup-time regressions.
+
+Each run is a fresh interpreter, so nothing is shared between runs:
+- import: time to `import app`, as reported by the app itself (IMPORTS_DURATION_MS)
+- warm_up: time to load the extraction stack (LangChain, Opik, the graph) on first use
+
+No database nor Gemini call is involved. Exits with a non-zero status if the median
+import time exceeds --max-import-ms, so it can run in CI.
+
+Usage:
+    uv run python -m scripts.benchmark_startup
+    uv run python -m scripts.benchmark_startup --runs 10 --max-import-ms 1000
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in the child interpreter; prints one JSON line
+PROBE = """
+import json, sys, time
+import app
+started_at = time.perf_counter()
+from graphs.extract_interaction_with_a_person_card import warm_up
+warm_up()
+warm_up_ms = (time.perf_counter() - started_at) * 1000
+heavy = [name for name in ("langchain_google_genai", "langgraph", "opik") if name in sys.modules]
+print(json.dumps({"import": app.IMPORTS_DURATION_MS, "warm_up": warm_up_ms, "heavy_modules": heavy}))
+"""
+
+# Same, without the warm-up, to check that importing the app does not pull in the extraction stack
+IMPORT_ONLY_PROBE = """
+import json, sys
+import app
+heavy = [name for name in ("langchain_google_genai", "langgraph", "opik") if name in sys.modules]
+print(json.dumps({"import": app.IMPORTS_DURATION_MS, "heavy_modules": heavy}))
+"""
+
+
+def run_probe(probe: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", probe],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(values: list[float]) -> str:
+    return f"median {statistics.median(values):.0f} ms, min {min(values):.0f} ms, max {max(values):.0f} ms"
+
+
+def main(runs: int, max_import_ms: float | None) -> int:
+    import_results = [run_probe(IMPORT_ONLY_PROBE) for _ in range(runs)]
+    warm_up_results = [run_probe(PROBE) for _ in range(runs)]
+
+    import_ms = [result["import"] for result in import_results]
+    warm_up_ms = [result["warm_up"] for result in warm_up_results]
+    eager_modules = sorted({name for result in import_results for name in result["heavy_modules"]})
+
+    print(f"import app: {summarize(import_ms)} ({runs} runs)")
+    print(f"warm_up:    {summarize(warm_up_ms)} ({runs} runs)")
+    if eager_modules:
+        print(f"✗ Importing the app loads the extraction stack eagerly: {', '.join(eager_modules)}")
+        return 1
+
+    if max_import_ms is not None and statistics.median(import_ms) > max_import_ms:
+        print(f"✗ Median import time is above {max_import_ms:.0f} ms")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of the API.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--max-import-ms", type=float, help="Fail if the median import time is above this")
+    args = parser.parse_args()
+
+    sys.exit(main(args.runs, args.max_import_ms))
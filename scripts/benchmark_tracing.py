@@ -0,0 +1,85 @@
+"""
+Measures what Opik tracing costs each extraction request.
+
+The extraction graph runs against an instant stub model, so that only the graph and
+tracer overhead is measured, in three modes:
+- untraced: no tracer (an unsampled request)
+- traced, rebuilt: a tracer built with a fresh get_graph(xray=True) per request (the previous behavior)
+- traced, cached: a tracer built with the cached graph description (the current behavior)
+
+Traces are exported by Opik's background streamer, off the measured path. Point the
+OPIK_* variables at a real or local Opik instance to also exercise the export.
+
+Usage:
+    uv run python -m scripts.benchmark_tracing
+    uv run python -m scripts.benchmark_tracing --requests 500
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+import graphs.extract_interaction_with_a_person_card as extraction_graph
+from models.InteractionWithAPersonCard import InteractionWithAPersonCard
+
+load_dotenv()
+
+INPUT = "I met John at the coffee shop yesterday. We talked about AI and machine learning for hours."
+
+
+class StubStructuredLLM:
+    async def ainvoke(self, prompt: str) -> InteractionWithAPersonCard:
+        return InteractionWithAPersonCard(who="John", where="the coffee shop", when="yesterday", why="AI", how="talking")
+
+
+async def measure(make_callbacks, requests: int) -> list[float]:
+    graph = extraction_graph.get_extraction_graph()
+    durations_ms = []
+    for _ in range(requests):
+        started_at = time.perf_counter()
+        await graph.ainvoke({"input": INPUT}, config={"callbacks": make_callbacks()})
+        durations_ms.append((time.perf_counter() - started_at) * 1000)
+    return durations_ms
+
+
+def percentile(values: list[float], q: float) -> float:
+    return statistics.quantiles(values, n=100)[int(q) - 1]
+
+
+async def main(requests: int) -> None:
+    from opik.integrations.langchain import OpikTracer
+
+    extraction_graph.get_structured_llm = lambda: StubStructuredLLM()
+    extraction_graph.warm_up()
+
+    modes = {
+        "untraced": lambda: [],
+        "traced, rebuilt": lambda: [OpikTracer(graph=extraction_graph.get_extraction_graph().get_graph(xray=True))],
+        "traced, cached": lambda: [OpikTracer(graph=extraction_graph.get_graph_description())],
+    }
+
+    # One untimed round per mode, so that lazy initializations are not measured
+    for make_callbacks in modes.values():
+        await measure(make_callbacks, 5)
+
+    results = {name: await measure(make_callbacks, requests) for name, make_callbacks in modes.items()}
+    baseline = statistics.mean(results["untraced"])
+
+    print(f"{requests} requests per mode")
+    for name, durations_ms in results.items():
+        mean = statistics.mean(durations_ms)
+        print(
+            f"{name:<16} mean {mean:7.2f} ms   p50 {statistics.median(durations_ms):7.2f} ms   "
+            f"p95 {percentile(durations_ms, 95):7.2f} ms   overhead {mean - baseline:+7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the per-request cost of Opik tracing.")
+    parser.add_argument("--requests", type=int, default=200, help="Graph runs per mode")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.requests))
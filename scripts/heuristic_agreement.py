@@ -0,0 +1,107 @@
+"""
+Checks the heuristic extractor offline against the cards the LLM extracted in production.
+
+Replays the inputs stored in the extraction cache through the heuristic extractor, and compares
+the confident cards (those that would have skipped the LLM) with the LLM's, field by field.
+Use it before enabling EXTRACTION_HEURISTIC_ENABLED, or changing EXTRACTION_HEURISTIC_THRESHOLD.
+
+Fields are compared loosely (case, punctuation and articles are ignored, and a value containing
+the other agrees), and only when the heuristic filled them. Exits with a non-zero status if the
+`who` agreement is below --min-agreement, so it can run in CI.
+
+Usage:
+    uv run python -m scripts.heuristic_agreement
+    uv run python -m scripts.heuristic_agreement --limit 5000 --threshold 0.8 --min-agreement 0.95
+"""
+
+import argparse
+import asyncio
+import re
+import sys
+
+from dotenv import load_dotenv
+
+from database import queries
+from database.pool import create_pool
+from graphs.heuristic_extractor import get_heuristic_threshold, heuristic_extract
+from models.InteractionWithAPersonCard import InteractionWithAPersonCard
+
+load_dotenv()
+
+FIELDS = ["who", "where", "when", "why"]
+
+ARTICLES_PATTERN = re.compile(r"\b(?:the|a|an|on|at|in)\b")
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+
+
+def normalize(value: str) -> str:
+    value = PUNCTUATION_PATTERN.sub(" ", value.casefold())
+    return " ".join(ARTICLES_PATTERN.sub(" ", value).split())
+
+
+def agrees(heuristic_value: str, llm_value: str | None) -> bool:
+    if not llm_value:
+        return False
+    heuristic_value, llm_value = normalize(heuristic_value), normalize(llm_value)
+    return heuristic_value in llm_value or llm_value in heuristic_value
+
+
+async def main(limit: int, threshold: float, min_agreement: float | None, examples: int) -> int:
+    pool = await create_pool()
+
+    try:
+        async with pool.acquire() as conn:
+            rows = await queries.fetch(conn, "list_cached_extractions_with_input", limit)
+    finally:
+        await pool.close()
+
+    if not rows:
+        print("No cached extraction with an input yet (inputs are only stored with EXTRACTION_CACHE_STORE_INPUT=true)")
+        return 0
+
+    confident = 0
+    compared = {field: 0 for field in FIELDS}
+    agreed = {field: 0 for field in FIELDS}
+    disagreements = []
+
+    for row in rows:
+        extraction = heuristic_extract(row['input'])
+        if extraction.card is None or extraction.confidence < threshold:
+            continue
+
+        confident += 1
+        llm_card = InteractionWithAPersonCard.model_validate_json(row['interaction_card'])
+        for field in FIELDS:
+            heuristic_value = getattr(extraction.card, field)
+            if not heuristic_value:
+                continue
+            compared[field] += 1
+            if agrees(heuristic_value, getattr(llm_card, field)):
+                agreed[field] += 1
+            elif len(disagreements) < examples:
+                disagreements.append((row['input'], field, heuristic_value, getattr(llm_card, field)))
+
+    print(f"{len(rows)} cached extractions, {confident} ({confident / len(rows):.0%}) would have skipped the LLM at threshold {threshold}")
+    for field in FIELDS:
+        if compared[field]:
+            print(f"  {field:<6} agreement {agreed[field] / compared[field]:6.1%} ({agreed[field]}/{compared[field]})")
+
+    for input, field, heuristic_value, llm_value in disagreements:
+        print(f"✗ {field}: heuristic {heuristic_value!r}, LLM {llm_value!r} in {input!r}")
+
+    if min_agreement is not None and compared["who"] and agreed["who"] / compared["who"] < min_agreement:
+        print(f"✗ who agreement is below {min_agreement:.0%}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the heuristic extractor with stored LLM extractions.")
+    parser.add_argument("--limit", type=int, default=1000, help="Most recent cached extractions to replay")
+    parser.add_argument("--threshold", type=float, default=get_heuristic_threshold(), help="Confidence needed to skip the LLM")
+    parser.add_argument("--min-agreement", type=float, help="Fail if the who agreement is below this fraction")
+    parser.add_argument("--examples", type=int, default=10, help="Disagreements to print")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args.limit, args.threshold, args.min_agreement, args.examples)))
@@ -0,0 +1,63 @@
+"""
+Bulk-imports users from a CSV or JSONL file.
+
+Same behavior as the POST /users/import endpoint, without going through HTTP:
+the file is streamed in chunks, so memory stays constant regardless of its size.
+
+Usage:
+    uv run python -m scripts.import_users users.csv
+    uv run python -m scripts.import_users users.jsonl --format jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import AsyncIterator
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from database.migrations import run_migrations
+from database.pool import create_pool
+from services.UserImportService import UserImportService
+
+load_dotenv()
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def read_chunks(path: Path) -> AsyncIterator[bytes]:
+    with path.open("rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            yield chunk
+
+
+async def main(path: Path, format: str) -> int:
+    pool = await create_pool()
+
+    try:
+        await run_migrations(pool)
+
+        try:
+            report = await UserImportService(pool).import_users(read_chunks(path), format)
+        except HTTPException as e:
+            print(f"✗ Import failed: {e.detail}", file=sys.stderr)
+            return 1
+
+        print(json.dumps(report, indent=2))
+        return 0
+
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import users from a CSV or JSONL file.")
+    parser.add_argument("path", type=Path, help="CSV (with an email,full_name,city,unique_id header) or JSONL file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension")
+    args = parser.parse_args()
+
+    format = args.format or ("jsonl" if args.path.suffix in (".jsonl", ".ndjson") else "csv")
+    sys.exit(asyncio.run(main(args.path, format)))
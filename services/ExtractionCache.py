@@ -0,0 +1,197 @@
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+import asyncpg
+
+from constants import BASE_MODEL, EXTRACTION_PROMPT_VERSION
+from database import queries
+from models.InteractionWithAPersonCard import InteractionWithAPersonCard
+from services.TTLCache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Expired entries are deleted every this many stores, so that the table does not grow forever
+PURGE_EVERY_STORES = 1000
+
+
+def normalize_input(input: str) -> str:
+    """
+    Normalizes interaction text so that retries and trivial edits (case, spacing) share a cache entry.
+    """
+    normalized = unicodedata.normalize("NFKC", input).casefold()
+    return WHITESPACE_PATTERN.sub(" ", normalized).strip()
+
+
+def make_cache_key(input: str) -> str:
+    """
+    Content-addressed key: changing the model or the prompt version invalidates every entry.
+    """
+    material = "\x00".join([BASE_MODEL, EXTRACTION_PROMPT_VERSION, normalize_input(input)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Two-tier cache of extraction results: an in-process LRU with TTL in front of the `extraction_cache` table.
+    Database lookups reuse the caller's connection so a hit costs no extra pool acquisition.
+    With `store_input`, the table also keeps the input text of each entry (personal data) for
+    `input_ttl_seconds`, to check the heuristic extractor against the LLM offline.
+    """
+
+    def __init__(
+        self,
+        memory: TTLCache,
+        db_ttl_seconds: float,
+        enabled: bool = True,
+        store_input: bool = False,
+        input_ttl_seconds: float = 0,
+    ):
+        self.memory = memory
+        self.db_ttl_seconds = db_ttl_seconds
+        self.enabled = enabled
+        self.store_input = store_input
+        self.input_ttl_seconds = input_ttl_seconds
+        self.db_hits = 0
+        self.db_misses = 0
+        self.db_errors = 0
+        self.db_stores = 0
+
+    def get_from_memory(self, key: str) -> InteractionWithAPersonCard | None:
+        if not self.enabled:
+            return None
+        return self.memory.get(key)
+
+    async def get_from_db(self, conn: asyncpg.Connection, key: str) -> InteractionWithAPersonCard | None:
+        """
+        Looks the key up in the database, to be called after a memory miss. Hits are promoted to memory.
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            payload = await queries.fetchval(conn, "get_cached_extraction", key, self.db_ttl_seconds)
+        except Exception as e:
+            # The cache must never fail a request
+            self.db_errors += 1
+            logger.warning(f"Error reading extraction cache: {e}")
+            return None
+
+        if payload is None:
+            self.db_misses += 1
+            return None
+
+        self.db_hits += 1
+        card = InteractionWithAPersonCard.model_validate_json(payload)
+        self.memory.set(key, card)
+        return card
+
+    async def get_many(self, conn: asyncpg.Connection, keys: list[str]) -> dict[str, InteractionWithAPersonCard]:
+        """
+        Looks several keys up: memory first, then a single database query for the remaining keys.
+        """
+        if not self.enabled or not keys:
+            return {}
+
+        cards = {}
+        for key in keys:
+            card = self.memory.get(key)
+            if card is not None:
+                cards[key] = card
+
+        missing_keys = [key for key in keys if key not in cards]
+        if not missing_keys:
+            return cards
+
+        try:
+            rows = await queries.fetch(conn, "get_cached_extractions", missing_keys, self.db_ttl_seconds)
+        except Exception as e:
+            self.db_errors += 1
+            logger.warning(f"Error reading extraction cache: {e}")
+            return cards
+
+        for row in rows:
+            card = InteractionWithAPersonCard.model_validate_json(row['interaction_card'])
+            self.memory.set(row['cache_key'], card)
+            cards[row['cache_key']] = card
+
+        self.db_hits += len(rows)
+        self.db_misses += len(missing_keys) - len(rows)
+        return cards
+
+    async def set_many(
+        self, conn: asyncpg.Connection, cards: dict[str, tuple[str, InteractionWithAPersonCard]]
+    ) -> None:
+        """
+        Stores freshly extracted (input, card) pairs in both tiers. The input is kept in the database
+        only, and only with `store_input`.
+        """
+        if not self.enabled or not cards:
+            return
+
+        for key, (_, card) in cards.items():
+            self.memory.set(key, card)
+
+        try:
+            await queries.executemany(conn, "store_cached_extraction", [
+                (key, card.model_dump_json(), input if self.store_input else None)
+                for key, (input, card) in cards.items()
+            ])
+        except Exception as e:
+            self.db_errors += 1
+            logger.warning(f"Error writing extraction cache: {e}")
+            return
+
+        # Reads already skip expired entries; deleting them keeps the table small, and inputs are
+        # cleared past their retention
+        stores_before = self.db_stores
+        self.db_stores += len(cards)
+        if self.db_stores // PURGE_EVERY_STORES > stores_before // PURGE_EVERY_STORES:
+            await self._purge(conn)
+
+    async def _purge(self, conn: asyncpg.Connection) -> None:
+        try:
+            await queries.execute(conn, "purge_cached_extractions", self.db_ttl_seconds)
+            await queries.execute(conn, "clear_cached_extraction_inputs", self.input_ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Error purging expired extraction cache entries: {e}")
+
+    def stats(self) -> dict:
+        memory_stats = self.memory.stats()
+        return {
+            "enabled": self.enabled,
+            "hits": memory_stats["hits"] + self.db_hits,
+            "misses": self.db_misses,
+            "memory": memory_stats,
+            "db": {
+                "ttl_seconds": self.db_ttl_seconds,
+                "store_input": self.store_input,
+                "input_ttl_seconds": self.input_ttl_seconds,
+                "hits": self.db_hits,
+                "misses": self.db_misses,
+                "errors": self.db_errors,
+                "stores": self.db_stores,
+            },
+        }
+
+
+@lru_cache(maxsize=1)
+def get_extraction_cache() -> ExtractionCache:
+    """
+    Returns the process-wide extraction cache, configured from the environment on first use.
+    """
+    return ExtractionCache(
+        memory=TTLCache(
+            max_size=int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", "3600")),
+        ),
+        db_ttl_seconds=float(os.getenv("EXTRACTION_CACHE_DB_TTL_SECONDS", "604800")),
+        enabled=os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true",
+        store_input=os.getenv("EXTRACTION_CACHE_STORE_INPUT", "false").lower() == "true",
+        input_ttl_seconds=float(os.getenv("EXTRACTION_CACHE_INPUT_TTL_SECONDS", "259200")),
+    )
@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator
+
+from services.Metrics import EXTRACTION_QUEUE_WAIT_SECONDS, REGISTRY
+from services.RunningStat import RunningStat
+
+# Above this many tracked users, buckets that have refilled are dropped (they would start full anyway)
+MAX_TRACKED_USERS = 10_000
+
+
+class RateLimitedError(Exception):
+    """
+    Raised when an extraction is refused by the scheduler, to be answered with a 429.
+    """
+
+    def __init__(self, reason: str, retry_after_seconds: float):
+        super().__init__(f"Extraction rate limited ({reason}), retry in {retry_after_seconds:.0f}s")
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+
+class ExtractionScheduler:
+    """
+    Shares the extraction capacity fairly between users (keyed on the validated `sub`):
+    - admission: a token bucket per user, refilled at `rate_per_second` up to `burst`
+    - fairness: at most `max_concurrency` extractions run at once; the others wait in a weighted fair
+      queue (start-time fair queuing), so that a user with many queued extractions only gets their share
+      of the freed slots instead of all of them
+    - bounds: a user may have at most `max_queued_per_user` waiting extractions, and none waits more
+      than `max_queue_wait_seconds`
+    Every refusal raises RateLimitedError.
+    Not thread-safe: meant to be shared by coroutines of a single event loop.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: float,
+        max_concurrency: int,
+        max_queued_per_user: int,
+        max_queue_wait_seconds: float,
+    ):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queued_per_user = max_queued_per_user
+        self.max_queue_wait_seconds = max_queue_wait_seconds
+
+        # sub -> (tokens, refilled at)
+        self._buckets: dict[str, tuple[float, float]] = {}
+        # (finish tag, sequence, start tag, waiter); cancelled waiters are skipped when popped
+        self._queue: list[tuple[float, int, float, asyncio.Future]] = []
+        self._sequence = 0
+        self._virtual_time = 0.0
+        self._last_finish: dict[str, float] = {}
+        self._queued: dict[str, int] = {}
+        self._active = 0
+
+        self.admitted = 0
+        self.rejected = {"rate": 0, "queue_full": 0, "queue_timeout": 0}
+        self.queue_wait_ms = RunningStat()
+
+    @asynccontextmanager
+    async def slot(self, sub: str, weight: float = 1.0) -> AsyncIterator[None]:
+        """
+        Waits for the user's turn to run an extraction, and holds a slot for the duration of the block.
+        A user of weight 2 gets twice the slots of a user of weight 1 when both have extractions queued.
+        """
+        self._take_token(sub)
+        await self._acquire(sub, weight)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _take_token(self, sub: str) -> None:
+        now = time.monotonic()
+        tokens, refilled_at = self._buckets.get(sub, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - refilled_at) * self.rate_per_second)
+
+        if tokens < 1:
+            self._buckets[sub] = (tokens, now)
+            self.rejected["rate"] += 1
+            raise RateLimitedError("rate", (1 - tokens) / self.rate_per_second)
+
+        if sub not in self._buckets and len(self._buckets) >= MAX_TRACKED_USERS:
+            self._prune_buckets(now)
+        self._buckets[sub] = (tokens - 1, now)
+
+    def _prune_buckets(self, now: float) -> None:
+        refill_seconds = self.burst / self.rate_per_second
+        self._buckets = {
+            sub: (tokens, refilled_at)
+            for sub, (tokens, refilled_at) in self._buckets.items()
+            if now - refilled_at < refill_seconds
+        }
+
+    async def _acquire(self, sub: str, weight: float) -> None:
+        if self._active < self.max_concurrency and not self._queue:
+            self._active += 1
+            self.admitted += 1
+            self.queue_wait_ms.observe(0.0)
+            EXTRACTION_QUEUE_WAIT_SECONDS.observe(0.0)
+            return
+
+        queued = self._queued.get(sub, 0)
+        if queued >= self.max_queued_per_user:
+            self.rejected["queue_full"] += 1
+            raise RateLimitedError("queue_full", max(1.0, queued / self.rate_per_second))
+
+        # The user's next extraction starts where their previous one finishes, or now if they were idle
+        start = max(self._virtual_time, self._last_finish.get(sub, 0.0))
+        finish = start + 1 / weight
+        self._last_finish[sub] = finish
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._sequence += 1
+        heapq.heappush(self._queue, (finish, self._sequence, start, waiter))
+        self._queued[sub] = queued + 1
+
+        started_at = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.max_queue_wait_seconds):
+                await waiter
+        except TimeoutError:
+            # Unless the slot was granted just as the timeout fired
+            if not waiter.done() or waiter.cancelled():
+                self.rejected["queue_timeout"] += 1
+                raise RateLimitedError("queue_timeout", 1.0)
+        except BaseException:
+            # Granted a slot just as the caller was cancelled: give it back
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+        finally:
+            self._queued[sub] -= 1
+            if not self._queued[sub]:
+                del self._queued[sub]
+                if self._last_finish.get(sub, 0.0) <= self._virtual_time:
+                    self._last_finish.pop(sub, None)
+
+        wait_seconds = time.perf_counter() - started_at
+        self.admitted += 1
+        self.queue_wait_ms.observe(wait_seconds * 1000)
+        EXTRACTION_QUEUE_WAIT_SECONDS.observe(wait_seconds)
+
+    def _release(self) -> None:
+        self._active -= 1
+        while self._queue and self._active < self.max_concurrency:
+            _, _, start, waiter = heapq.heappop(self._queue)
+            if waiter.done():
+                continue
+            self._virtual_time = max(self._virtual_time, start)
+            self._active += 1
+            waiter.set_result(None)
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def queue_depth(self) -> int:
+        return sum(self._queued.values())
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "rate_per_second": self.rate_per_second,
+            "burst": self.burst,
+            "max_concurrency": self.max_concurrency,
+            "max_queued_per_user": self.max_queued_per_user,
+            "active": self._active,
+            "queued": self.queue_depth(),
+            "queued_users": len(self._queued),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "queue_wait_ms": self.queue_wait_ms.to_dict(),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_extraction_scheduler() -> ExtractionScheduler | None:
+    """
+    Returns the process-wide extraction scheduler, or None unless EXTRACTION_SCHEDULER_ENABLED is set.
+    """
+    if os.getenv("EXTRACTION_SCHEDULER_ENABLED", "false").lower() != "true":
+        return None
+
+    scheduler = ExtractionScheduler(
+        rate_per_second=float(os.getenv("EXTRACTION_USER_RATE_PER_MINUTE", "60")) / 60,
+        burst=float(os.getenv("EXTRACTION_USER_BURST", "10")),
+        max_concurrency=int(os.getenv("EXTRACTION_MAX_CONCURRENCY", "16")),
+        max_queued_per_user=int(os.getenv("EXTRACTION_USER_MAX_QUEUED", "8")),
+        max_queue_wait_seconds=float(os.getenv("EXTRACTION_MAX_QUEUE_WAIT_MS", "10000")) / 1000,
+    )
+
+    REGISTRY.gauge(
+        "extraction_scheduler_active", "Extractions holding a slot of the extraction scheduler",
+        lambda: [((), scheduler.active)],
+    )
+    REGISTRY.gauge(
+        "extraction_scheduler_queued", "Extractions waiting for a slot of the extraction scheduler",
+        lambda: [((), scheduler.queue_depth())],
+    )
+    REGISTRY.counter(
+        "extraction_scheduler_rejected_total", "Extractions refused by the extraction scheduler with a 429",
+        lambda: [((reason,), count) for reason, count in scheduler.rejected.items()],
+        ["reason"],
+    )
+    return scheduler
@@ -1,6 +1,8 @@
 import asyncpg
 import logging
 
+from database import queries
+
 logger = logging.getLogger(__name__)
 
 class HealthService:
@@ -12,5 +14,5 @@ class HealthService:
         Run a basic query to verify database connection.
         """
         async with self.pool.acquire() as conn:
-            current_date = await conn.fetchval("SELECT CURRENT_DATE")
+            current_date = await queries.fetchval(conn, "check_db_connection")
             return str(current_date)
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
+
+import asyncpg
+from fastapi import HTTPException, status
+
+from database import queries
+from database.pool import acquire
+from services.Metrics import REGISTRY
+from services.SingleFlight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_STATUS_IN_PROGRESS = "in_progress"
+IDEMPOTENCY_STATUS_COMPLETED = "completed"
+
+# Expired keys are deleted every this many claims, so that the table does not grow forever
+PURGE_EVERY_CLAIMS = 1000
+
+# Client errors that a retry may not get again, so they are not stored
+RETRYABLE_CLIENT_ERRORS = {
+    status.HTTP_408_REQUEST_TIMEOUT,
+    status.HTTP_409_CONFLICT,
+    status.HTTP_425_TOO_EARLY,
+    status.HTTP_429_TOO_MANY_REQUESTS,
+}
+
+
+def make_request_hash(*parts: Any) -> str:
+    """
+    Hashes a request (e.g. its mode and payload) as canonical JSON, to tell a retry from a different request
+    sent with the same key.
+    """
+    material = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class IdempotentResponse:
+    status_code: int
+    body: Any
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+class IdempotencyKeyStore:
+    """
+    Runs requests sent with an Idempotency-Key header at most once per (sub, key), backed by the
+    `idempotency_keys` table:
+    - the first request claims the key, runs, and stores its response (success or final client error)
+    - a later request with the same key and the same request hash gets the stored response back
+    - the same key with a different request hash is refused with a 422
+    - duplicates in flight in this process join the first request; in another process, they get a 409
+    Server errors and retryable client errors release the key, so that a retry runs the request again.
+    A key is reusable after `ttl_seconds`, or after `lock_timeout_seconds` if its request never completed
+    (e.g. the process died).
+    """
+
+    def __init__(self, ttl_seconds: float, lock_timeout_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.lock_timeout_seconds = lock_timeout_seconds
+        self.flights: SingleFlight[IdempotentResponse] = SingleFlight()
+        self.outcomes = {"claimed": 0, "replayed": 0, "conflict": 0, "mismatch": 0, "released": 0}
+
+    async def run(
+        self,
+        pool: asyncpg.Pool,
+        sub: str,
+        key: str,
+        request_hash: str,
+        handle: Callable[[], Awaitable[IdempotentResponse]],
+    ) -> IdempotentResponse:
+        """
+        Returns the response of `handle`, run at most once for the key, or the stored one.
+        A final client error raised by `handle` is stored, and raised again as is to the first requester.
+        """
+        return await self.flights.run(
+            (sub, key, request_hash), lambda: self._run_once(pool, sub, key, request_hash, handle)
+        )
+
+    async def _run_once(
+        self,
+        pool: asyncpg.Pool,
+        sub: str,
+        key: str,
+        request_hash: str,
+        handle: Callable[[], Awaitable[IdempotentResponse]],
+    ) -> IdempotentResponse:
+        async with acquire(pool) as conn:
+            claimed = await queries.fetchval(
+                conn, "claim_idempotency_key", sub, key, request_hash, self.ttl_seconds, self.lock_timeout_seconds
+            )
+            row = None if claimed else await queries.fetchrow(conn, "get_idempotency_key", sub, key)
+            if claimed and (self.outcomes["claimed"] + 1) % PURGE_EVERY_CLAIMS == 0:
+                await self._purge(conn)
+
+        if not claimed:
+            return self._replay(row, request_hash)
+        self.outcomes["claimed"] += 1
+
+        try:
+            response = await handle()
+        except HTTPException as e:
+            if not self._is_final(e.status_code):
+                await self._release(pool, sub, key)
+                raise
+            await self._complete(pool, sub, key, IdempotentResponse(e.status_code, {"detail": e.detail}))
+            raise
+        except BaseException:
+            await self._release(pool, sub, key)
+            raise
+
+        if self._is_final(response.status_code):
+            await self._complete(pool, sub, key, response)
+        else:
+            await self._release(pool, sub, key)
+        return response
+
+    def _replay(self, row: asyncpg.Record | None, request_hash: str) -> IdempotentResponse:
+        if row is not None and row['request_hash'] != request_hash:
+            self.outcomes["mismatch"] += 1
+            raise HTTPException(
+                # Starlette renamed the constant of 422 between versions
+                status_code=422,
+                detail="This Idempotency-Key was already used for a different request",
+            )
+
+        # Still running in another process (or released in between): the client retries later
+        if row is None or row['status'] != IDEMPOTENCY_STATUS_COMPLETED:
+            self.outcomes["conflict"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is already being processed",
+                headers={"Retry-After": "1"},
+            )
+
+        self.outcomes["replayed"] += 1
+        headers = json.loads(row['response_headers']) if row['response_headers'] else {}
+        headers["Idempotent-Replayed"] = "true"
+        return IdempotentResponse(row['response_status'], json.loads(row['response_body']), headers)
+
+    @staticmethod
+    def _is_final(status_code: int) -> bool:
+        return status_code < 500 and status_code not in RETRYABLE_CLIENT_ERRORS
+
+    async def _complete(self, pool: asyncpg.Pool, sub: str, key: str, response: IdempotentResponse) -> None:
+        # The response was produced: failing to store it must not fail the request, the key is then
+        # reclaimed after the lock timeout
+        try:
+            async with acquire(pool) as conn:
+                await queries.execute(
+                    conn, "complete_idempotency_key", sub, key, response.status_code,
+                    json.dumps(response.body), json.dumps(response.headers),
+                )
+        except Exception as e:
+            logger.error(f"Error storing idempotent response: {e}")
+
+    async def _release(self, pool: asyncpg.Pool, sub: str, key: str) -> None:
+        self.outcomes["released"] += 1
+        try:
+            async with acquire(pool) as conn:
+                await queries.execute(conn, "release_idempotency_key", sub, key)
+        except Exception as e:
+            logger.error(f"Error releasing idempotency key: {e}")
+
+    async def _purge(self, conn: asyncpg.Connection) -> None:
+        try:
+            await queries.execute(conn, "purge_idempotency_keys", self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Error purging expired idempotency keys: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "lock_timeout_seconds": self.lock_timeout_seconds,
+            **self.outcomes,
+            "joined": self.flights.joined,
+            "in_flight": self.flights.stats()["in_flight"],
+        }
+
+
+@lru_cache(maxsize=1)
+def get_idempotency_key_store() -> IdempotencyKeyStore:
+    """
+    Returns the process-wide idempotency key store, configured from the environment on first use.
+    """
+    store = IdempotencyKeyStore(
+        ttl_seconds=float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "86400")),
+        lock_timeout_seconds=float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", "120")),
+    )
+
+    REGISTRY.counter(
+        "idempotency_requests_total", "Requests sent with an Idempotency-Key header, per outcome",
+        lambda: [
+            *(((outcome,), count) for outcome, count in store.outcomes.items()),
+            (("joined",), store.flights.joined),
+        ],
+        ["outcome"],
+    )
+    return store
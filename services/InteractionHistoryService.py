@@ -0,0 +1,280 @@
+import base64
+import binascii
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+import asyncpg
+from fastapi import HTTPException, status
+
+from database import queries
+from database.pool import acquire
+from services.UserIdResolver import get_user_id_resolver
+from services.UserService import UserService
+
+logger = logging.getLogger(__name__)
+
+# Interaction IDs are Postgres integers
+MAX_INTERACTION_ID = 2**31 - 1
+
+# Start of the first page: sorts after every (created_at, id) key
+FIRST_PAGE_KEY = (datetime.max.replace(tzinfo=timezone.utc), MAX_INTERACTION_ID)
+
+# Start of the first page of search results: sorts after every (rank, id) key
+FIRST_SEARCH_KEY = (float("inf"), MAX_INTERACTION_ID)
+
+# Start of an export, oldest first: sorts before every (created_at, id) key
+FIRST_EXPORT_KEY = (datetime.min.replace(tzinfo=timezone.utc), 0)
+
+
+def encode_cursor(*values) -> str:
+    """
+    Encodes the sort key of the last row of a page into an opaque, URL-safe cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Decodes a cursor made by `encode_cursor`. Raises HTTPException 400 if it is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        values = None
+
+    if not isinstance(values, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return values
+
+
+def decode_interaction_id(value) -> int:
+    """
+    Decodes the interaction ID of a cursor, refusing IDs that a forged cursor could push out of
+    the integer range of the column. Raises ValueError if it is invalid.
+    """
+    id = int(value)
+    if not 0 <= id <= MAX_INTERACTION_ID:
+        raise ValueError(f"Interaction ID out of range: {id}")
+    return id
+
+
+def decode_page_key(cursor: str) -> tuple[datetime, int]:
+    """
+    Decodes a cursor over a (timestamp, id) sort key. Raises HTTPException 400 if it is malformed.
+    """
+    values = decode_cursor(cursor)
+    try:
+        timestamp, id = values
+        return datetime.fromisoformat(timestamp), decode_interaction_id(id)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def decode_search_key(cursor: str) -> tuple[float, int]:
+    """
+    Decodes a cursor over a (rank, id) sort key. Raises HTTPException 400 if it is malformed.
+    """
+    values = decode_cursor(cursor)
+    try:
+        rank, id = values
+        return float(rank), decode_interaction_id(id)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def get_export_chunk_size() -> int:
+    return int(os.getenv("INTERACTIONS_EXPORT_CHUNK_SIZE", "1000"))
+
+
+def get_export_timeout() -> float:
+    """
+    Returns how long (in seconds) an export may stream before it is cut short.
+    """
+    return float(os.getenv("INTERACTIONS_EXPORT_TIMEOUT_SECONDS", "300"))
+
+
+class InteractionHistoryService:
+    """
+    Read path of the interactions recorded by a user: their history, newest first, and full-text search.
+    Pages are fetched by keyset rather than OFFSET, so that the cost of a page does not depend on how deep it is.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    async def list_interactions(
+        self,
+        unique_id: str,
+        sub: str,
+        target_user_id: str | None,
+        limit: int,
+        cursor: str | None,
+    ) -> dict:
+        if not self.pool:
+             raise HTTPException(
+                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                 detail="Database not available"
+             )
+
+        UserService.validate_authorization(sub, unique_id, "Unauthorized: Requester can only read their own interactions")
+
+        after = decode_page_key(cursor) if cursor else FIRST_PAGE_KEY
+
+        async with acquire(self.pool) as conn:
+            unique_ids = [unique_id] if target_user_id is None else [unique_id, target_user_id]
+            user_db_ids = await get_user_id_resolver().resolve(conn, unique_ids)
+
+            if unique_id not in user_db_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"User not found: {unique_id}"
+                )
+            if target_user_id is not None and target_user_id not in user_db_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Target user not found: {target_user_id}"
+                )
+
+            # One extra row tells whether there is a next page
+            if target_user_id is None:
+                rows = await queries.fetch(
+                    conn, "list_user_interactions", user_db_ids[unique_id], *after, limit + 1
+                )
+            else:
+                rows = await queries.fetch(
+                    conn, "list_user_interactions_with_target",
+                    user_db_ids[unique_id], user_db_ids[target_user_id], *after, limit + 1
+                )
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['created_at'].isoformat(), rows[-1]['id'])
+
+        return {
+            "interactions": [self._serialize(row) for row in rows],
+            "next_cursor": next_cursor,
+        }
+
+    async def search_interactions(
+        self, unique_id: str, sub: str, q: str, limit: int, cursor: str | None
+    ) -> dict:
+        """
+        Full-text search over the interactions recorded by a user, best match first.
+        Matches are found through the GIN index on `search_vector`, then ranked and paged by keyset on (rank, id).
+        """
+        if not self.pool:
+             raise HTTPException(
+                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                 detail="Database not available"
+             )
+
+        UserService.validate_authorization(sub, unique_id, "Unauthorized: Requester can only read their own interactions")
+
+        after = decode_search_key(cursor) if cursor else FIRST_SEARCH_KEY
+
+        async with acquire(self.pool) as conn:
+            user_db_ids = await get_user_id_resolver().resolve(conn, [unique_id])
+            if unique_id not in user_db_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"User not found: {unique_id}"
+                )
+
+            # One extra row tells whether there is a next page
+            rows = await queries.fetch(
+                conn, "search_user_interactions", user_db_ids[unique_id], q, *after, limit + 1
+            )
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['rank'], rows[-1]['id'])
+
+        return {
+            "interactions": [{**self._serialize(row), "rank": row['rank']} for row in rows],
+            "next_cursor": next_cursor,
+        }
+
+    async def export_interactions(self, unique_id: str, sub: str) -> AsyncIterator[bytes]:
+        """
+        Streams every interaction recorded by a user as NDJSON, oldest first, in constant memory:
+        rows are read by pages, already serialized to JSON by Postgres.
+        Errors (authorization, unknown user, busy database) are raised here, before anything is streamed.
+        """
+        if not self.pool:
+             raise HTTPException(
+                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                 detail="Database not available"
+             )
+
+        UserService.validate_authorization(sub, unique_id, "Unauthorized: Requester can only read their own interactions")
+
+        chunks = self._export_chunks(unique_id)
+        first_chunk = await anext(chunks)
+
+        async def stream() -> AsyncIterator[bytes]:
+            yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+
+        return stream()
+
+    async def _export_chunks(self, unique_id: str) -> AsyncIterator[bytes]:
+        """
+        Yields the export in chunks of NDJSON lines, starting with a possibly empty one once the user is resolved.
+        Each page is fetched on its own short connection, never held while a chunk is sent, so that a slow
+        or gone client does not pin a connection. Interactions recorded during the export are included
+        if they come after the last page sent.
+        The export stops after INTERACTIONS_EXPORT_TIMEOUT_SECONDS, at a line boundary.
+        """
+        chunk_size = get_export_chunk_size()
+        deadline = time.monotonic() + get_export_timeout()
+        after = FIRST_EXPORT_KEY
+
+        async with acquire(self.pool) as conn:
+            user_db_ids = await get_user_id_resolver().resolve(conn, [unique_id])
+            if unique_id not in user_db_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"User not found: {unique_id}"
+                )
+            rows = await queries.fetch(conn, "export_user_interactions", user_db_ids[unique_id], *after, chunk_size)
+
+        while True:
+            yield "".join(row['line'] + "\n" for row in rows).encode()
+            if len(rows) < chunk_size:
+                return
+            if time.monotonic() > deadline:
+                logger.warning(f"Export of the interactions of {unique_id} cut short after {get_export_timeout()}s")
+                return
+
+            after = (rows[-1]['created_at'], rows[-1]['id'])
+            async with acquire(self.pool) as conn:
+                rows = await queries.fetch(conn, "export_user_interactions", user_db_ids[unique_id], *after, chunk_size)
+
+    @staticmethod
+    def _serialize(row: asyncpg.Record) -> dict:
+        return {
+            "id": row['id'],
+            "who": row['who'],
+            "where": row['where'],
+            "when": row['when'],
+            "why": row['why'],
+            "how": row['how'],
+            "target_user_id": row['target_user_id'],
+            "created_at": row['created_at'].isoformat(),
+        }
@@ -1,101 +1,409 @@
+import asyncio
 import logging
+import math
+import os
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Awaitable, Callable
 import asyncpg
 from fastapi import HTTPException, status
+from database import queries
+from database.pool import acquire
+from services.ExtractionCache import get_extraction_cache, make_cache_key
+from services.ExtractionScheduler import RateLimitedError, get_extraction_scheduler
+from services.Metrics import REGISTRY
+from services.SingleFlight import SingleFlight
+from services.UserIdResolver import get_user_id_resolver
 from services.dtos.UpdateInteractionPayload import UpdateInteractionPayload
+from services.dtos.CreateInteractionsBatchPayload import CreateInteractionsBatchPayload
 from services.UserService import UserService
-from graphs.extract_interaction_with_a_person_card import extract_interaction_with_a_person_card_graph
+from graphs.extract_interaction_with_a_person_card import get_checkpointed_extraction_graph, get_extraction_graph
+from graphs.extraction_checkpoints import get_extraction_checkpoints, make_thread_id
+from graphs.extraction_guard import CircuitOpenError, get_extraction_guard
+from graphs.input_chunker import InputTooLongError, get_input_chunker
+from graphs.tracing import get_extraction_tracing
 from models.InteractionWithAPersonCard import InteractionWithAPersonCard
-from opik.integrations.langchain import OpikTracer
 
 logger = logging.getLogger(__name__)
 
+INTERACTION_RECORDED = "Interaction recorded successfully"
+
+
+def get_batch_concurrency() -> int:
+    """
+    Returns how many extractions a single batch may run at once.
+    """
+    return max(1, int(os.getenv("INTERACTIONS_BATCH_CONCURRENCY", "4")))
+
+
+@lru_cache(maxsize=1)
+def get_extraction_flights() -> SingleFlight[tuple[InteractionWithAPersonCard, str]]:
+    """
+    Returns the process-wide single-flight of extractions, keyed on (sub, cache key): a user's duplicate
+    requests in flight at the same time (e.g. client retries) share one extraction.
+    Keys are per user so that a user is never answered with another user's rate limit.
+    """
+    flights = SingleFlight()
+    REGISTRY.counter(
+        "extraction_single_flight_joined_total", "Extractions that joined an identical extraction in flight",
+        lambda: [((), flights.joined)],
+    )
+    return flights
+
+
 class InteractionService:
+    """
+    Records interactions in three phases so that no pool connection is held during the LLM call:
+    1. resolve: short connection to map unique IDs to user IDs and look up the extraction cache
+    2. extract: run the extraction graph with no connection held (skipped on a cache hit, shared with
+       identical extractions of the same user in flight)
+    3. persist: short transactional connection to store the card
+    """
+
     def __init__(self, pool: asyncpg.Pool):
         self.pool = pool
 
-    async def create_interaction(self, payload: UpdateInteractionPayload) -> str:
+    @staticmethod
+    def validate_input_size(input: str) -> None:
+        """
+        Rejects an input over EXTRACTION_MAX_INPUT_TOKENS up front, before any database or extraction work.
+        """
+        try:
+            get_input_chunker().check(input)
+        except InputTooLongError as e:
+            raise HTTPException(
+                # Starlette renamed the constant of 413 between versions
+                status_code=413,
+                detail=str(e)
+            )
+
+    async def create_interaction(
+        self,
+        payload: UpdateInteractionPayload,
+        on_persist: Callable[[asyncpg.Connection], Awaitable[None]] | None = None,
+    ) -> str:
+        """
+        Records an interaction. `on_persist` is awaited in the transaction storing it (e.g. to complete its
+        job), and rolls it back if it raises.
+        """
         if not self.pool:
              raise HTTPException(
-                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE, 
+                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                  detail="Database not available"
              )
 
-        # 1. Validate requester
+        # 1. Validate requester and input size
         UserService.validate_authorization(payload.sub, payload.user_id, "Unauthorized: Requester must be the user recording the interaction")
+        self.validate_input_size(payload.input)
 
-        async with self.pool.acquire() as conn:
-            # 2. Get User IDs (integers) from Unique IDs (strings)
-            # We can do this in one query or two. Two is clearer for error reporting.
-            
-            # Get User (Recorder)
-            user_row = await conn.fetchrow(
-                "SELECT id FROM users WHERE unique_id = $1", 
-                payload.user_id
-            )
-            if not user_row:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"User not found: {payload.user_id}"
-                )
-            user_db_id = user_row['id']
+        # 2. Resolve phase
+        cache_key = make_cache_key(payload.input)
+        user_db_id, target_user_db_id, interaction_card = await self._resolve(payload, cache_key)
 
-            # Get Target User
-            target_user_row = await conn.fetchrow(
-                "SELECT id FROM users WHERE unique_id = $1", 
-                payload.target_user_id
+        # 3. Extraction phase (no connection held)
+        fresh_cards = {}
+        checkpoint_threads = []
+        if interaction_card is None:
+            interaction_card, extracted_by = await get_extraction_flights().run(
+                (payload.sub, cache_key), lambda: self._extract_scheduled(payload.input, payload.sub, cache_key)
             )
-            if not target_user_row:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Target user not found: {payload.target_user_id}"
-                )
-            target_user_db_id = target_user_row['id']
+            if extracted_by == "llm":
+                fresh_cards[cache_key] = (payload.input, interaction_card)
+            checkpoint_threads.append(make_thread_id(payload.sub, cache_key))
+
+        # 4. Persist phase
+        await self._persist_interactions(
+            [(interaction_card, user_db_id, target_user_db_id)],
+            fresh_cards=fresh_cards,
+            checkpoint_threads=checkpoint_threads,
+            on_persist=on_persist,
+        )
+
+        return INTERACTION_RECORDED
 
-            # 3. Process with Graph
-            tracer = OpikTracer(graph=extract_interaction_with_a_person_card_graph.get_graph(xray=True))
-            inputs = {"input": payload.input}
-            
+    async def create_interactions_batch(self, payload: CreateInteractionsBatchPayload) -> list[dict]:
+        """
+        Records several interactions with the same three phases as `create_interaction`, batched:
+        one query resolves every referenced user, extractions run concurrently under a limit,
+        and all cards are inserted in a single transaction.
+        Returns one result per item, in order, each carrying either a `msg` or an `error`.
+        """
+        if not self.pool:
+             raise HTTPException(
+                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                 detail="Database not available"
+             )
+
+        items = payload.items
+        results: list[dict | None] = [None] * len(items)
+
+        def fail(index: int, e: HTTPException) -> None:
+            results[index] = {"index": index, "status": e.status_code, "error": e.detail}
+
+        # 1. Validate requesters and input sizes
+        pending = []
+        for index, item in enumerate(items):
             try:
-                result = await extract_interaction_with_a_person_card_graph.ainvoke(
-                    inputs,
-                    config={"callbacks": [tracer]}
+                UserService.validate_authorization(item.sub, item.user_id, "Unauthorized: Requester must be the user recording the interaction")
+                self.validate_input_size(item.input)
+            except HTTPException as e:
+                fail(index, e)
+                continue
+            pending.append(index)
+
+        if not pending:
+            return results
+
+        # 2. Resolve phase: at most one query for every referenced user, one for the cached cards
+        cache_keys = {index: make_cache_key(items[index].input) for index in pending}
+        unique_ids = {
+            unique_id
+            for index in pending
+            for unique_id in (items[index].user_id, items[index].target_user_id)
+        }
+
+        async with acquire(self.pool) as conn:
+            user_db_ids = await get_user_id_resolver().resolve(conn, unique_ids)
+            cards = await get_extraction_cache().get_many(conn, list(set(cache_keys.values())))
+
+        resolved = []
+        for index in pending:
+            item = items[index]
+            if item.user_id not in user_db_ids:
+                fail(index, HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User not found: {item.user_id}"))
+            elif item.target_user_id not in user_db_ids:
+                fail(index, HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Target user not found: {item.target_user_id}"))
+            else:
+                resolved.append(index)
+
+        # 3. Extraction phase: each distinct uncached input is extracted once, under the concurrency limit
+        inputs_to_extract = {}
+        subs = {}
+        for index in resolved:
+            if cache_keys[index] not in cards and cache_keys[index] not in inputs_to_extract:
+                inputs_to_extract[cache_keys[index]] = items[index].input
+                subs[cache_keys[index]] = items[index].sub
+        semaphore = asyncio.Semaphore(get_batch_concurrency())
+
+        async def extract(cache_key: str, input: str) -> tuple[InteractionWithAPersonCard, str]:
+            async with semaphore:
+                return await get_extraction_flights().run(
+                    (subs[cache_key], cache_key), lambda: self._extract_scheduled(input, subs[cache_key], cache_key)
                 )
-            except Exception as e:
-                logger.error(f"Error processing interaction graph: {e}")
-                raise HTTPException(
+
+        outcomes = await asyncio.gather(
+            *(extract(cache_key, input) for cache_key, input in inputs_to_extract.items()),
+            return_exceptions=True
+        )
+
+        fresh_cards = {}
+        checkpoint_threads = []
+        extraction_errors = {}
+        for (cache_key, input), outcome in zip(inputs_to_extract.items(), outcomes):
+            if isinstance(outcome, HTTPException):
+                extraction_errors[cache_key] = outcome
+            elif isinstance(outcome, BaseException):
+                logger.error(f"Error extracting batch item: {outcome}")
+                extraction_errors[cache_key] = HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="An unexpected error occurred while processing the request."
                 )
+            else:
+                interaction_card, extracted_by = outcome
+                cards[cache_key] = interaction_card
+                if extracted_by == "llm":
+                    fresh_cards[cache_key] = (input, interaction_card)
+                checkpoint_threads.append(make_thread_id(subs[cache_key], cache_key))
 
-            if "error" in result and result["error"]:
-                 logger.error(f"Graph extraction error: {result['error']}")
-                 raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="The interaction content could not be processed."
-                )
+        to_insert = []
+        for index in resolved:
+            if cache_keys[index] in extraction_errors:
+                fail(index, extraction_errors[cache_keys[index]])
+            else:
+                to_insert.append(index)
 
-            interaction_card: InteractionWithAPersonCard = result.get("interaction_card")
-            if not interaction_card:
-                logger.error("Graph did not return an interaction card")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="An unexpected error occurred."
+        # 4. Persist phase: one transaction for the whole batch
+        if to_insert:
+            try:
+                await self._persist_interactions(
+                    [
+                        (
+                            cards[cache_keys[index]],
+                            user_db_ids[items[index].user_id],
+                            user_db_ids[items[index].target_user_id],
+                        )
+                        for index in to_insert
+                    ],
+                    fresh_cards=fresh_cards,
+                    checkpoint_threads=checkpoint_threads,
                 )
+            except HTTPException as e:
+                for index in to_insert:
+                    fail(index, e)
+            else:
+                for index in to_insert:
+                    results[index] = {"index": index, "status": status.HTTP_200_OK, "msg": INTERACTION_RECORDED}
+
+        return results
+
+    async def _resolve(
+        self, payload: UpdateInteractionPayload, cache_key: str
+    ) -> tuple[int, int, InteractionWithAPersonCard | None]:
+        """
+        Gets User IDs (integers) from Unique IDs (strings), and a cached card for the input if any.
+        Both are served from memory when possible, in which case no connection is acquired at all.
+        """
+        resolver = get_user_id_resolver()
+        extraction_cache = get_extraction_cache()
+
+        user_db_ids, missing_unique_ids = resolver.lookup([payload.user_id, payload.target_user_id])
+        cached_card = extraction_cache.get_from_memory(cache_key)
+
+        if missing_unique_ids or cached_card is None:
+            async with acquire(self.pool) as conn:
+                if missing_unique_ids:
+                    user_db_ids.update(await resolver.fetch(conn, missing_unique_ids))
+                if cached_card is None:
+                    cached_card = await extraction_cache.get_from_db(conn, cache_key)
+
+        if payload.user_id not in user_db_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User not found: {payload.user_id}"
+            )
+        if payload.target_user_id not in user_db_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Target user not found: {payload.target_user_id}"
+            )
+
+        return user_db_ids[payload.user_id], user_db_ids[payload.target_user_id], cached_card
+
+    async def _extract_scheduled(self, input: str, sub: str, cache_key: str) -> tuple[InteractionWithAPersonCard, str]:
+        """
+        Runs `_extract_interaction_card` in the user's turn of the extraction scheduler, when it is enabled,
+        so that a single user cannot take up the whole extraction capacity.
+        """
+        thread_id = make_thread_id(sub, cache_key)
+        scheduler = get_extraction_scheduler()
+        if scheduler is None:
+            return await self._extract_interaction_card(input, thread_id)
+
+        try:
+            async with scheduler.slot(sub):
+                return await self._extract_interaction_card(input, thread_id)
+        except RateLimitedError as e:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many interactions are being processed for this user, retry later.",
+                headers={"Retry-After": str(math.ceil(e.retry_after_seconds))}
+            )
+
+    async def _extract_interaction_card(self, input: str, thread_id: str) -> tuple[InteractionWithAPersonCard, str]:
+        """
+        Runs the extraction graph. Must be called without holding a pool connection.
+        With EXTRACTION_CHECKPOINTS_ENABLED, the run is checkpointed on `thread_id`, and the run of a previous
+        attempt is resumed instead of extracting again.
+        Returns the card and what extracted it: "heuristic" or "llm". Only LLM cards are worth caching.
+        """
+        checkpoints = get_extraction_checkpoints()
+        guard = get_extraction_guard()
+        tracing = get_extraction_tracing()
+        tracer = tracing.start()
+        config = {"callbacks": [tracer] if tracer else []}
+
+        if checkpoints:
+            run = checkpoints.run(get_checkpointed_extraction_graph(self.pool), input, thread_id, config)
+        else:
+            run = get_extraction_graph().ainvoke({"input": input}, config=config)
+
+        started_at = datetime.now(timezone.utc)
+        started_perf = time.perf_counter()
+        try:
+            result = await guard.run_with_deadline(run)
+        except TimeoutError:
+            tracing.finish(tracer, input, started_at, time.perf_counter() - started_perf, error="Deadline exceeded")
+            logger.error(f"Interaction graph exceeded its {guard.deadline_seconds}s deadline")
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="The interaction could not be processed in time."
+            )
+        except CircuitOpenError as e:
+            tracing.finish(tracer, input, started_at, time.perf_counter() - started_perf, error=str(e))
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The interaction extraction is temporarily unavailable.",
+                headers={"Retry-After": str(math.ceil(e.retry_after_seconds))}
+            )
+        except Exception as e:
+            tracing.finish(tracer, input, started_at, time.perf_counter() - started_perf, error=str(e))
+            logger.error(f"Error processing interaction graph: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="An unexpected error occurred while processing the request."
+            )
+
+        tracing.finish(
+            tracer, input, started_at, time.perf_counter() - started_perf,
+            output=result, error=result.get("error")
+        )
+
+        if "error" in result and result["error"]:
+             logger.error(f"Graph extraction error: {result['error']}")
+             raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="The interaction content could not be processed."
+            )
+
+        interaction_card: InteractionWithAPersonCard = result.get("interaction_card")
+        if not interaction_card:
+            logger.error("Graph did not return an interaction card")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="An unexpected error occurred."
+            )
+
+        return interaction_card, result.get("extracted_by") or "llm"
+
+    async def _persist_interactions(
+        self,
+        rows: list[tuple[InteractionWithAPersonCard, int, int]],
+        fresh_cards: dict[str, tuple[str, InteractionWithAPersonCard]],
+        checkpoint_threads: list[str],
+        on_persist: Callable[[asyncpg.Connection], Awaitable[None]] | None = None,
+    ) -> None:
+        """
+        Saves (card, user ID, target user ID) rows and updates their pairs' relationships in a single short transaction,
+        which `on_persist` is awaited in last.
+        Freshly extracted (input, card) pairs are cached first, so a retry after a failed INSERT skips the LLM.
+        The checkpointed threads of the extractions are deleted once the rows are stored: only the runs of
+        failed requests are kept, to be resumed by their retry.
+        """
+        async with acquire(self.pool) as conn:
+            await get_extraction_cache().set_many(conn, fresh_cards)
 
-            # 4. Save to Database
             try:
-                await conn.execute("""
-                    INSERT INTO interactions (who, "where", "when", why, how, user_id, target_user_id)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7)
-                """, 
-                interaction_card.who,
-                interaction_card.where,
-                interaction_card.when,
-                interaction_card.why,
-                interaction_card.how,
-                user_db_id,
-                target_user_db_id
-                )
+                async with conn.transaction():
+                    await queries.executemany(conn, "insert_interaction", [
+                        (
+                            interaction_card.who,
+                            interaction_card.where,
+                            interaction_card.when,
+                            interaction_card.why,
+                            interaction_card.how,
+                            user_db_id,
+                            target_user_db_id,
+                        )
+                        for interaction_card, user_db_id, target_user_db_id in rows
+                    ])
+                    # Pairs are updated in a consistent order, so concurrent batches cannot deadlock
+                    await queries.executemany(conn, "upsert_relationship", [
+                        (user_db_id, target_user_db_id, interaction_card.where, interaction_card.why)
+                        for interaction_card, user_db_id, target_user_db_id in sorted(rows, key=lambda row: row[1:])
+                    ])
+                    if on_persist:
+                        await on_persist(conn)
             except Exception as e:
                 logger.error(f"Error saving interaction to DB: {e}")
                 raise HTTPException(
@@ -103,4 +411,11 @@ class InteractionService:
                     detail="An unexpected error occurred."
                 )
 
-            return "Interaction recorded successfully"
+            if checkpoint_threads and get_extraction_checkpoints():
+                # The interaction is stored: a thread left behind is purged later
+                try:
+                    await queries.executemany(
+                        conn, "delete_graph_checkpoint_thread", [(thread_id,) for thread_id in checkpoint_threads]
+                    )
+                except Exception as e:
+                    logger.warning(f"Error deleting extraction checkpoints: {e}")
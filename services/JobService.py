@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import uuid
+
+import asyncpg
+from fastapi import HTTPException, status
+
+from database import queries
+from database.pool import acquire
+from services.dtos.UpdateInteractionPayload import UpdateInteractionPayload
+from services.InteractionService import InteractionService
+from services.UserService import UserService
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND_CREATE_INTERACTION = "create_interaction"
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_SUCCEEDED = "succeeded"
+JOB_STATUS_FAILED = "failed"
+
+
+class JobAlreadySucceededError(Exception):
+    """
+    Raised when completing a job that another worker already completed.
+    """
+
+
+def get_job_visibility_timeout() -> float:
+    """
+    Returns how long (in seconds) a running job may go without completing before another worker reclaims it.
+    """
+    return float(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "300"))
+
+
+def get_job_max_attempts() -> int:
+    return int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+def get_job_retry_delay(attempts: int, retry_after_seconds: float | None = None) -> float:
+    """
+    Returns how long (in seconds) a job must wait before its next attempt: the Retry-After of its last
+    failure if it had one, else an exponential backoff from JOB_RETRY_BASE_DELAY_SECONDS, capped at
+    JOB_RETRY_MAX_DELAY_SECONDS.
+    """
+    if retry_after_seconds is not None:
+        return retry_after_seconds
+
+    base_delay = float(os.getenv("JOB_RETRY_BASE_DELAY_SECONDS", "2"))
+    max_delay = float(os.getenv("JOB_RETRY_MAX_DELAY_SECONDS", "60"))
+    return min(base_delay * 2 ** max(attempts - 1, 0), max_delay)
+
+
+class JobService:
+    """
+    A work queue on top of the `jobs` table.
+    Workers claim jobs with `SELECT ... FOR UPDATE SKIP LOCKED`, so any number of them can drain it concurrently.
+    Status literals in the claim query match the partial index created by `migrate_jobs_table`.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    async def enqueue_interaction(self, payload: UpdateInteractionPayload) -> str:
+        """
+        Queues an interaction for background processing and returns the job ID.
+        Authorization and input size are checked up front so that obviously invalid requests are rejected synchronously.
+        """
+        if not self.pool:
+             raise HTTPException(
+                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                 detail="Database not available"
+             )
+
+        UserService.validate_authorization(payload.sub, payload.user_id, "Unauthorized: Requester must be the user recording the interaction")
+        InteractionService.validate_input_size(payload.input)
+
+        async with acquire(self.pool) as conn:
+            job_id = await queries.fetchval(conn, "enqueue_job", JOB_KIND_CREATE_INTERACTION, payload.model_dump_json())
+
+        return str(job_id)
+
+    async def get_job(self, job_id: str) -> dict:
+        """
+        Returns the public view of a job. Raises HTTPException 404 if it does not exist.
+        """
+        if not self.pool:
+             raise HTTPException(
+                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                 detail="Database not available"
+             )
+
+        try:
+            job_uuid = uuid.UUID(job_id)
+        except ValueError:
+            job_uuid = None
+
+        row = None
+        if job_uuid:
+            async with acquire(self.pool) as conn:
+                row = await queries.fetchrow(conn, "get_job", job_uuid)
+
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Job not found: {job_id}"
+            )
+
+        return {
+            "id": str(row['id']),
+            "kind": row['kind'],
+            "status": row['status'],
+            "result": json.loads(row['result']) if row['result'] else None,
+            "error": row['error'],
+            "attempts": row['attempts'],
+            "run_after": row['run_after'].isoformat() if row['run_after'] and row['status'] == JOB_STATUS_QUEUED else None,
+            "created_at": row['created_at'].isoformat(),
+            "updated_at": row['updated_at'].isoformat(),
+        }
+
+    async def claim_next(self) -> asyncpg.Record | None:
+        """
+        Claims the oldest queued job, or a running job whose worker stopped responding.
+        Returns None when the queue is empty.
+        """
+        async with acquire(self.pool) as conn:
+            return await queries.fetchrow(conn, "claim_job", get_job_visibility_timeout())
+
+    async def complete(self, conn: asyncpg.Connection, job_id: uuid.UUID, result: dict) -> None:
+        """
+        Marks a job as succeeded on `conn`, in the transaction storing its outcome, so that a job is never
+        left to be retried once its outcome is stored.
+        Raises JobAlreadySucceededError if the job has already succeeded (e.g. reclaimed by another worker
+        after its visibility timeout), which rolls the transaction back instead of storing the outcome twice.
+        """
+        if await queries.execute(conn, "complete_job", job_id, JOB_STATUS_SUCCEEDED, json.dumps(result)) == "UPDATE 0":
+            raise JobAlreadySucceededError(f"Job {job_id} has already succeeded")
+
+    async def fail(
+        self,
+        job_id: uuid.UUID,
+        error: str,
+        result: dict | None = None,
+        retry: bool = False,
+        retry_delay_seconds: float = 0,
+    ) -> None:
+        """
+        Marks a job as failed, or puts it back in the queue if it should be retried, to be claimed again
+        after `retry_delay_seconds`. A job that has already succeeded is left as is.
+        """
+        async with acquire(self.pool) as conn:
+            await queries.execute(
+                conn, "fail_job", job_id, JOB_STATUS_QUEUED if retry else JOB_STATUS_FAILED,
+                json.dumps(result) if result else None, error, retry_delay_seconds if retry else 0,
+            )
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import logging
+import os
+
+import asyncpg
+from fastapi import HTTPException, status
+
+from services.dtos.UpdateInteractionPayload import UpdateInteractionPayload
+from services.InteractionService import INTERACTION_RECORDED, InteractionService
+from services.JobService import (
+    JOB_KIND_CREATE_INTERACTION,
+    JobService,
+    get_job_max_attempts,
+    get_job_retry_delay,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_job_worker_concurrency() -> int:
+    return max(1, int(os.getenv("JOB_WORKER_CONCURRENCY", "2")))
+
+
+def get_job_poll_interval() -> float:
+    return float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
+
+
+class JobWorker:
+    """
+    Drains the `jobs` table with a fixed number of concurrent consumers.
+    Runs either inside the API process (see `app.lifespan`) or on its own (see `worker.py`).
+    """
+
+    def __init__(self, pool: asyncpg.Pool, concurrency: int | None = None, poll_interval: float | None = None):
+        self.pool = pool
+        self.concurrency = concurrency or get_job_worker_concurrency()
+        self.poll_interval = get_job_poll_interval() if poll_interval is None else poll_interval
+        self.job_service = JobService(pool)
+        self._stopping = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._consume(), name=f"job-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        logger.info(f"Started {self.concurrency} job worker(s)")
+
+    async def stop(self, grace_period: float = 10.0) -> None:
+        """
+        Stops claiming new jobs and gives in-flight ones `grace_period` seconds to finish.
+        Jobs still running after that are cancelled and reclaimed once the visibility timeout expires.
+        """
+        self._stopping.set()
+        if self._tasks:
+            _, still_running = await asyncio.wait(self._tasks, timeout=grace_period)
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _consume(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = await self.job_service.claim_next()
+            except Exception as e:
+                logger.warning(f"Error claiming job: {e}")
+                job = None
+
+            if job is None:
+                await self._wait()
+                continue
+
+            try:
+                await self._process(job)
+            except Exception as e:
+                # Recording the outcome failed (e.g. the database is busy): the job is reclaimed once its
+                # visibility timeout expires, and this consumer carries on after a pause
+                logger.error(f"Error finishing job {job['id']}: {e}")
+                await self._wait()
+
+    async def _wait(self) -> None:
+        """
+        Waits for the poll interval, or until the worker is stopped.
+        """
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _process(self, job: asyncpg.Record) -> None:
+        job_id = job['id']
+
+        if job['attempts'] > get_job_max_attempts():
+            await self.job_service.fail(job_id, "Exceeded maximum attempts")
+            return
+
+        try:
+            if job['kind'] != JOB_KIND_CREATE_INTERACTION:
+                raise ValueError(f"Unknown job kind: {job['kind']}")
+
+            payload = UpdateInteractionPayload.model_validate(json.loads(job['payload']))
+            # The job is completed in the transaction storing the interaction: once stored, it is never retried
+            await InteractionService(self.pool).create_interaction(
+                payload,
+                on_persist=lambda conn: self.job_service.complete(
+                    conn, job_id, {"status": 200, "msg": INTERACTION_RECORDED}
+                ),
+            )
+
+        except HTTPException as e:
+            # Client errors are final, server errors and rate limiting are retried, after their Retry-After
+            # (rate limiting, open circuit) or a backoff
+            retryable = e.status_code >= 500 or e.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+            retry = retryable and job['attempts'] < get_job_max_attempts()
+            retry_after = (e.headers or {}).get("Retry-After")
+            await self.job_service.fail(
+                job_id, e.detail, {"status": e.status_code}, retry=retry,
+                retry_delay_seconds=get_job_retry_delay(job['attempts'], float(retry_after) if retry_after else None),
+            )
+
+        except Exception as e:
+            logger.error(f"Error processing job {job_id}: {e}")
+            retry = job['attempts'] < get_job_max_attempts()
+            await self.job_service.fail(
+                job_id, "An unexpected error occurred.", {"status": 500}, retry=retry,
+                retry_delay_seconds=get_job_retry_delay(job['attempts']),
+            )
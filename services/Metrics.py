@@ -0,0 +1,234 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# Seconds, from sub-millisecond queries to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: tuple[str, ...], labelvalues: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Prometheus histogram. Observing costs a bisect and two additions: the buckets are only made cumulative
+    when rendered.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def time(self, *labelvalues: str) -> "_Timer":
+        """
+        Observes the duration of the block, in seconds, whether it raises or not.
+        """
+        return _Timer(self, labelvalues)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labelvalues, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for upper_bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(upper_bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Timer:
+    """
+    Context manager of `Histogram.time`: a plain class costs about half of a @contextmanager generator.
+    """
+
+    __slots__ = ("histogram", "labelvalues", "started_at")
+
+    def __init__(self, histogram: Histogram, labelvalues: tuple[str, ...]):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self) -> None:
+        self.started_at = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started_at, *self.labelvalues)
+
+
+class Gauge:
+    """
+    Prometheus gauge whose values are read by `collect` when the metrics are rendered,
+    as (label values, value) pairs, so that nothing is tracked on the hot path.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Iterable[tuple[tuple[str, ...], float]]],
+        labelnames: Iterable[str] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labelvalues, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Gauge):
+    """
+    Prometheus counter read by `collect`, for counts that an object already keeps (e.g. for GET /stats).
+    """
+
+    type = "counter"
+
+
+class MetricsRegistry:
+    """
+    In-process registry, rendered in the Prometheus text format by GET /metrics. Values are per worker process.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Histogram | Gauge | Counter] = {}
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Iterable[tuple[tuple[str, ...], float]]],
+        labelnames: Iterable[str] = (),
+    ) -> Gauge:
+        """
+        Registers a gauge, replacing any previous one of the same name (e.g. bound to a previous pool).
+        """
+        gauge = Gauge(name, help, collect, labelnames)
+        self._metrics[name] = gauge
+        return gauge
+
+    def counter(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Iterable[tuple[tuple[str, ...], float]]],
+        labelnames: Iterable[str] = (),
+    ) -> Counter:
+        """
+        Registers a counter, replacing any previous one of the same name.
+        """
+        counter = Counter(name, help, collect, labelnames)
+        self._metrics[name] = counter
+        return counter
+
+    def _register(self, metric: Histogram) -> Histogram:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Hot-path metrics, observed where they happen (database/pool.py, database/queries.py, the extraction graph)
+# and rendered by GET /metrics
+POOL_ACQUIRE_SECONDS = REGISTRY.histogram(
+    "db_pool_acquire_seconds", "Time spent waiting for a database pool connection",
+)
+QUERY_SECONDS = REGISTRY.histogram(
+    "db_query_seconds", "Execution time of the named SQL statements of the query registry", ["query"],
+)
+GRAPH_NODE_SECONDS = REGISTRY.histogram(
+    "extraction_graph_node_seconds", "Execution time of each node of the extraction graph", ["node"],
+)
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    "extraction_llm_call_seconds", "Latency of extraction model calls, hedges included", ["kind", "outcome"],
+)
+CHECKPOINT_SECONDS = REGISTRY.histogram(
+    "extraction_checkpoint_seconds", "Latency of the extraction graph's checkpoint reads and writes", ["operation"],
+)
+EXTRACTION_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "extraction_scheduler_wait_seconds", "Time extractions waited for a slot of the extraction scheduler",
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests, per route template", ["method", "route", "status"],
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware observing the latency of every request, labelled by route template (e.g.
+    /users/{unique_id}/interactions) rather than path, so that the number of series stays bounded.
+    Streaming responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started_at,
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status_code),
+            )
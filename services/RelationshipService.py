@@ -0,0 +1,84 @@
+import logging
+
+import asyncpg
+from fastapi import HTTPException, status
+
+from database import queries
+from database.pool import acquire
+from services.InteractionHistoryService import FIRST_PAGE_KEY, decode_page_key, encode_cursor
+from services.UserIdResolver import get_user_id_resolver
+from services.UserService import UserService
+
+logger = logging.getLogger(__name__)
+
+
+class RelationshipService:
+    """
+    Read path of the people a user has met, most recently met first.
+    Reads the relationships summary table, which the interactions persist step keeps up to date,
+    so a page is an index range scan instead of an aggregation over the user's interactions.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    async def list_relationships(
+        self, unique_id: str, sub: str, limit: int, cursor: str | None
+    ) -> dict:
+        if not self.pool:
+             raise HTTPException(
+                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                 detail="Database not available"
+             )
+
+        UserService.validate_authorization(sub, unique_id, "Unauthorized: Requester can only read their own relationships")
+
+        after = decode_page_key(cursor) if cursor else FIRST_PAGE_KEY
+
+        async with acquire(self.pool) as conn:
+            user_db_ids = await get_user_id_resolver().resolve(conn, [unique_id])
+            if unique_id not in user_db_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"User not found: {unique_id}"
+                )
+
+            # One extra row tells whether there is a next page
+            rows = await queries.fetch(
+                conn, "list_user_relationships", user_db_ids[unique_id], *after, limit + 1
+            )
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['last_interaction_at'].isoformat(), rows[-1]['target_db_id'])
+
+        return {
+            "relationships": [
+                {
+                    "target_user_id": row['target_user_id'],
+                    "target_full_name": row['target_full_name'],
+                    "interaction_count": row['interaction_count'],
+                    "first_interaction_at": row['first_interaction_at'].isoformat(),
+                    "last_interaction_at": row['last_interaction_at'].isoformat(),
+                    "last_where": row['last_where'],
+                    "last_why": row['last_why'],
+                }
+                for row in rows
+            ],
+            "next_cursor": next_cursor,
+        }
+
+    async def backfill(self) -> int:
+        """
+        Recomputes every relationship from the interactions table, e.g. after the table was introduced.
+        New interactions are held off for the duration, so that none is counted twice or missed.
+        Returns the number of relationships written.
+        """
+        async with acquire(self.pool) as conn:
+            async with conn.transaction():
+                await queries.execute(conn, "lock_interactions_for_backfill")
+                result = await queries.execute(conn, "backfill_relationships")
+
+        # Command tag: "INSERT 0 <rows>"
+        return int(result.split()[-1])
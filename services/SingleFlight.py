@@ -0,0 +1,45 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent calls sharing a key into a single execution: the first caller starts it,
+    the others join it and get the same result (or exception).
+    The execution runs as a task, so a caller being cancelled (e.g. a client disconnecting) does not cancel
+    it for the callers that joined.
+    Not thread-safe: meant to be shared by coroutines of a single event loop.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.joined = 0
+
+    async def run(self, key: Hashable, make_call: Callable[[], Awaitable[T]]) -> T:
+        task = self._flights.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(make_call())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._land(key, done))
+        else:
+            self.joined += 1
+
+        return await asyncio.shield(task)
+
+    def _land(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Retrieve the exception even if every caller was cancelled, so it is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "joined": self.joined,
+        }
@@ -0,0 +1,80 @@
+import os
+from functools import lru_cache
+from typing import Iterable
+
+import asyncpg
+
+from database import queries
+from services.TTLCache import TTLCache
+
+
+class UserIdResolver:
+    """
+    Resolves users' unique IDs (strings) to their database IDs (integers).
+    Lookups for any number of users take a single query, and results are kept in a bounded LRU with TTL.
+    Writes to the users table must call `invalidate` (see UserService).
+    """
+
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+        self.db_lookups = 0
+
+    def lookup(self, unique_ids: Iterable[str]) -> tuple[dict[str, int], list[str]]:
+        """
+        Resolves from memory only. Returns the resolved IDs and the unique IDs still to fetch.
+        """
+        resolved = {}
+        missing = []
+        for unique_id in dict.fromkeys(unique_ids):
+            user_db_id = self.cache.get(unique_id)
+            if user_db_id is None:
+                missing.append(unique_id)
+            else:
+                resolved[unique_id] = user_db_id
+        return resolved, missing
+
+    async def fetch(self, conn: asyncpg.Connection, unique_ids: list[str]) -> dict[str, int]:
+        """
+        Resolves from the database in a single query and caches the results.
+        Unknown unique IDs are left out of the result and not cached.
+        """
+        if not unique_ids:
+            return {}
+
+        self.db_lookups += 1
+        rows = await queries.fetch(conn, "resolve_user_ids", unique_ids)
+
+        resolved = {}
+        for row in rows:
+            self.cache.set(row['unique_id'], row['id'])
+            resolved[row['unique_id']] = row['id']
+        return resolved
+
+    async def resolve(self, conn: asyncpg.Connection, unique_ids: Iterable[str]) -> dict[str, int]:
+        """
+        Resolves from memory, then from the database for the rest.
+        """
+        resolved, missing = self.lookup(unique_ids)
+        resolved.update(await self.fetch(conn, missing))
+        return resolved
+
+    def invalidate(self, *unique_ids: str | None) -> None:
+        for unique_id in unique_ids:
+            if unique_id is not None:
+                self.cache.delete(unique_id)
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "db_lookups": self.db_lookups}
+
+
+@lru_cache(maxsize=1)
+def get_user_id_resolver() -> UserIdResolver:
+    """
+    Returns the process-wide resolver, configured from the environment on first use.
+    """
+    return UserIdResolver(
+        TTLCache(
+            max_size=int(os.getenv("USER_ID_CACHE_MAX_ENTRIES", "10000")),
+            ttl_seconds=float(os.getenv("USER_ID_CACHE_TTL_SECONDS", "300")),
+        )
+    )
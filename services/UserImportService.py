@@ -0,0 +1,233 @@
+import codecs
+import csv
+import json
+import logging
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Literal
+
+import asyncpg
+from fastapi import HTTPException, status
+
+from database import queries
+from database.pool import acquire
+
+logger = logging.getLogger(__name__)
+
+IMPORT_COLUMNS = ["email", "full_name", "city", "unique_id"]
+
+# Keeps the report bounded no matter how many rows are rejected
+MAX_REPORTED_ERRORS = 1000
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """
+    Splits a stream of UTF-8 bytes into lines without ever holding more than one chunk in memory.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+class CsvLineFeed:
+    """
+    The lines a csv.reader reads from, handed over as they arrive. Records whether the reader asked for a line
+    it did not have yet, i.e. whether its last record was cut short.
+    """
+
+    def __init__(self):
+        self.lines: deque[str] = deque()
+        self.starved = False
+
+    def __iter__(self) -> "CsvLineFeed":
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            self.starved = True
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def iter_csv_records(lines: AsyncIterable[str]) -> AsyncIterator[tuple[int, list[str] | csv.Error]]:
+    """
+    Parses CSV lines with a single csv.reader, so that quoted fields spanning several lines (e.g. an address)
+    are read whole. Yields (number of the record's first line, its fields or the error parsing it), skipping
+    blank lines between records.
+    """
+    feed = CsvLineFeed()
+    reader = csv.reader(feed)
+    record_lines: list[str] = []
+    first_line_number = 0
+    line_number = 0
+
+    async for line in lines:
+        line_number += 1
+        if not record_lines:
+            if not line.strip():
+                continue
+            first_line_number = line_number
+        record_lines.append(line + "\n")
+
+        # A record cut short by the lines fed so far is read again once its next line has arrived
+        feed.lines.extend(record_lines)
+        feed.starved = False
+        try:
+            fields = next(reader)
+        except csv.Error as e:
+            record_lines = []
+            yield first_line_number, e
+            continue
+        if not feed.starved:
+            record_lines = []
+            yield first_line_number, fields
+
+    if record_lines:
+        yield first_line_number, csv.Error("unexpected end of data: unclosed quoted field")
+
+
+async def iter_jsonl_records(lines: AsyncIterable[str]) -> AsyncIterator[tuple[int, object | ValueError]]:
+    """
+    Parses JSONL lines. Yields (line number, its value or the error parsing it), skipping blank lines.
+    """
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+
+class UserImportService:
+    """
+    Bulk-imports users from CSV or JSONL in constant memory: rows are streamed with COPY into a temporary
+    staging table, checked for conflicts, and merged into `users` with one set-based upsert.
+    Merge semantics match POST /users: rows for an existing email only update it when the unique_id matches.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    async def import_users(
+        self, chunks: AsyncIterable[bytes], format: Literal["csv", "jsonl"]
+    ) -> dict:
+        if not self.pool:
+             raise HTTPException(
+                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                 detail="Database not available"
+             )
+
+        report = {"received": 0, "invalid": 0, "errors": []}
+        records = self._parse(iter_lines(chunks), format, report)
+
+        async with acquire(self.pool) as conn:
+            try:
+                async with conn.transaction():
+                    counts = await self._copy_and_merge(conn, records, report)
+            except asyncpg.UniqueViolationError:
+                # A concurrent write claimed one of the imported emails or unique IDs
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Users changed during the import, please retry"
+                )
+
+        report.update(counts)
+        return report
+
+    async def _copy_and_merge(
+        self, conn: asyncpg.Connection, records: AsyncIterator[tuple], report: dict
+    ) -> dict:
+        await queries.execute(conn, "create_users_import_table")
+
+        await conn.copy_records_to_table(
+            "users_import",
+            records=records,
+            columns=["line", *IMPORT_COLUMNS],
+        )
+        await queries.execute(conn, "analyze_users_import")
+
+        await queries.execute(conn, "flag_users_import_duplicates")
+        # Conflicts with existing users
+        await queries.execute(conn, "flag_users_import_email_conflicts")
+        await queries.execute(conn, "flag_users_import_unique_id_conflicts")
+
+        counts = await queries.fetchrow(conn, "merge_users_import")
+
+        remaining = MAX_REPORTED_ERRORS - len(report["errors"])
+        if remaining > 0:
+            conflict_rows = await queries.fetch(conn, "get_users_import_conflicts", remaining)
+            report["errors"].extend(
+                {"line": row['line'], "email": row['email'], "reason": row['conflict']}
+                for row in conflict_rows
+            )
+
+        return {
+            "created": counts['created'],
+            "updated": counts['updated'],
+            "unchanged": counts['merged'] - counts['created'] - counts['updated'],
+            "conflicts": counts['conflicts'],
+        }
+
+    async def _parse(
+        self, lines: AsyncIterator[str], format: Literal["csv", "jsonl"], report: dict
+    ) -> AsyncIterator[tuple]:
+        """
+        Yields (line, email, full_name, city, unique_id) tuples, recording invalid rows in the report.
+        A CSV row is numbered after its first line.
+        """
+        records = iter_csv_records(lines) if format == "csv" else iter_jsonl_records(lines)
+        header = None
+
+        async for line_number, record in records:
+            if format == "csv" and header is None:
+                if isinstance(record, csv.Error):
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"CSV header is unparseable: {record}"
+                    )
+                header = [field.strip() for field in record]
+                missing = [column for column in IMPORT_COLUMNS if column not in header]
+                if missing:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"CSV header is missing columns: {', '.join(missing)}"
+                    )
+                continue
+
+            report["received"] += 1
+            try:
+                if isinstance(record, (ValueError, csv.Error)):
+                    raise record
+                if format == "csv":
+                    row = dict(zip(header, record))
+                else:
+                    row = record
+                    if not isinstance(row, dict):
+                        raise ValueError("expected a JSON object")
+            except (ValueError, csv.Error) as e:
+                self._reject(report, line_number, None, f"unparseable row: {e}")
+                continue
+
+            values = [row.get(column) for column in IMPORT_COLUMNS]
+            if not all(isinstance(value, str) and value.strip() for value in values):
+                invalid = [column for column, value in zip(IMPORT_COLUMNS, values) if not (isinstance(value, str) and value.strip())]
+                self._reject(report, line_number, row.get("email"), f"missing or invalid fields: {', '.join(invalid)}")
+                continue
+
+            yield (line_number, *(value.strip() for value in values))
+
+    @staticmethod
+    def _reject(report: dict, line_number: int, email: str | None, reason: str) -> None:
+        report["invalid"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line_number, "email": email, "reason": reason})
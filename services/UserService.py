@@ -1,6 +1,9 @@
 import logging
 import asyncpg
 from fastapi import HTTPException, status
+from database import queries
+from database.pool import acquire
+from services.UserIdResolver import get_user_id_resolver
 from services.dtos.UpdateUserPayload import UpdateUserPayload
 
 logger = logging.getLogger(__name__)
@@ -31,42 +34,32 @@ class UserService:
                  detail="Database not available"
              )
         
-        async with self.pool.acquire() as conn:
-            # Check if user exists by email
-            existing_user = await conn.fetchrow("SELECT * FROM users WHERE email = $1", payload.email)
+        ERROR_PROCESSING_USER = "Error processing user"
 
-            ERROR_PROCESSING_USER = "Error processing user"
-            
-            if existing_user:
-                # User exists
-                db_unique_id = existing_user['unique_id']
-                
-                # DO NOT allow updates if the unique id present in the payload does not match the unique id present in DB
-                UserService.validate_authorization(payload.sub, db_unique_id, ERROR_PROCESSING_USER)
-                
-                # Update only the fields that have changed BUT NEVER UPDATE unique id
-                # We assume email is the key, so we don't update it.
-                if existing_user['full_name'] != payload.full_name or existing_user['city'] != payload.city:
-                    await conn.execute("""
-                        UPDATE users 
-                        SET full_name = $1, city = $2 
-                        WHERE email = $3
-                    """, payload.full_name, payload.city, payload.email)
-                    return "User updated"
-                else:
-                    return "User already up to date"
-                
-            else:
-                # If user does not exist create one (sub being the unique_id of the user)
-                try:
-                    await conn.execute("""
-                        INSERT INTO users (email, full_name, city, unique_id)
-                        VALUES ($1, $2, $3, $4)
-                    """, payload.email, payload.full_name, payload.city, payload.sub)
-                except asyncpg.UniqueViolationError:
-                     raise HTTPException(
-                         status_code=status.HTTP_401_UNAUTHORIZED,
-                         detail=ERROR_PROCESSING_USER
-                     )
-                
-                return "User payload processed successfully"
+        # One statement creates the user, updates it, or does nothing:
+        # - if no user has this email, create one (sub being the unique_id of the user)
+        # - if one does, DO NOT allow updates if the unique id present in the payload does not match the unique id present in DB
+        # - update only the fields that have changed BUT NEVER UPDATE unique id (we assume email is the key, so we don't update it either)
+        # `existing` reads the row as it was before the statement, to tell a no-op apart from an ownership mismatch.
+        async with acquire(self.pool) as conn:
+            try:
+                result = await queries.fetchrow(
+                    conn, "upsert_user", payload.email, payload.full_name, payload.city, payload.sub
+                )
+            except asyncpg.UniqueViolationError:
+                # Another user already owns this unique_id
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail=ERROR_PROCESSING_USER
+                )
+
+        if result['inserted'] is None:
+            # Nothing was written: either nothing changed, or the requester does not own this user
+            UserService.validate_authorization(payload.sub, result['existing_unique_id'], ERROR_PROCESSING_USER)
+            return "User already up to date"
+
+        get_user_id_resolver().invalidate(payload.sub)
+
+        if result['inserted']:
+            return "User payload processed successfully"
+        return "User updated"
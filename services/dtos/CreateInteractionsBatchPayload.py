@@ -0,0 +1,12 @@
+from typing import List
+from pydantic import BaseModel, Field
+from constants import MAX_INTERACTIONS_BATCH_SIZE
+from services.dtos.UpdateInteractionPayload import UpdateInteractionPayload
+
+class CreateInteractionsBatchPayload(BaseModel):
+    items: List[UpdateInteractionPayload] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_INTERACTIONS_BATCH_SIZE,
+        description="Interactions to record, each validated and processed independently"
+    )
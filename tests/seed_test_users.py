@@ -7,10 +7,17 @@ requiring a mobile app.
 """
 
 import asyncio
-import asyncpg
-import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
+# Make the project modules importable when run as `python tests/seed_test_users.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import queries
+from database.pool import create_pool
+from services.UserIdResolver import get_user_id_resolver
+
 load_dotenv()
 
 # Hardcoded test user IDs for consistent testing
@@ -36,31 +43,23 @@ TEST_USERS = [
 async def seed_test_users():
     """Seeds test users into the database."""
 
-    pool = await asyncpg.create_pool(
-        user=os.getenv("POSTGRES_USER", "postgres"),
-        password=os.getenv("POSTGRES_PASSWORD", "postgres"),
-        database=os.getenv("POSTGRES_DB", "app"),
-        host=os.getenv("POSTGRES_HOST", "localhost"),
-        port=os.getenv("POSTGRES_PORT", "5432"),
-    )
+    pool = await create_pool()
 
     try:
         async with pool.acquire() as conn:
-            for user in TEST_USERS:
-                # Check if user already exists
-                existing = await conn.fetchrow(
-                    "SELECT id, unique_id, email FROM users WHERE unique_id = $1",
-                    user["unique_id"]
-                )
+            # Check which users already exist, in a single query
+            resolver = get_user_id_resolver()
+            existing_ids = await resolver.resolve(conn, [user["unique_id"] for user in TEST_USERS])
 
-                if existing:
+            for user in TEST_USERS:
+                if user["unique_id"] in existing_ids:
                     print(f"✓ User already exists: {user['email']} (unique_id: {user['unique_id']})")
                 else:
                     # Insert new user
-                    await conn.execute("""
-                        INSERT INTO users (unique_id, email, full_name, city)
-                        VALUES ($1, $2, $3, $4)
-                    """, user["unique_id"], user["email"], user["full_name"], user["city"])
+                    await queries.execute(
+                        conn, "insert_user", user["unique_id"], user["email"], user["full_name"], user["city"]
+                    )
+                    resolver.invalidate(user["unique_id"])
                     print(f"✓ Created user: {user['email']} (unique_id: {user['unique_id']})")
 
             print("\n" + "="*60)
@@ -0,0 +1,304 @@
+"""
+Test script for the extraction guard (graphs/extraction_guard.py).
+
+This script checks the circuit breaker's state changes, which errors it
+counts, and which call wins when a slow call is hedged, with fake calls
+instead of Gemini. No API or database is needed.
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Allow running as `python tests/test_extraction_guard.py` from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.exceptions import OutputParserException
+from pydantic import ValidationError
+
+from graphs.extraction_guard import MIN_LATENCY_SAMPLES, CircuitBreaker, CircuitOpenError, ExtractionGuard
+from models.InteractionWithAPersonCard import InteractionWithAPersonCard
+
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT_SECONDS = 0.05
+
+
+def make_guard(hedge: bool = False, deadline_seconds: float | None = None) -> ExtractionGuard:
+    return ExtractionGuard(
+        deadline_seconds=deadline_seconds,
+        hedge_percentile=50 if hedge else None,
+        hedge_max_ratio=1.0,
+        breaker=CircuitBreaker(failure_threshold=FAILURE_THRESHOLD, reset_timeout_seconds=RESET_TIMEOUT_SECONDS),
+    )
+
+
+async def succeed(value="ok", delay: float = 0.0):
+    await asyncio.sleep(delay)
+    return value
+
+
+async def fail(error: Exception, delay: float = 0.0):
+    await asyncio.sleep(delay)
+    raise error
+
+
+def validation_error() -> ValidationError:
+    try:
+        InteractionWithAPersonCard.model_validate({})
+    except ValidationError as e:
+        return e
+    raise AssertionError("The card validated without a name")
+
+
+async def call_ignoring_errors(guard: ExtractionGuard, make_call) -> None:
+    try:
+        await guard.call(make_call)
+    except (Exception, CircuitOpenError):
+        pass
+
+
+def test_breaker_opens_after_consecutive_provider_failures():
+    """Test that consecutive provider errors open the circuit, and calls then fail fast."""
+    async def run():
+        guard = make_guard()
+        for _ in range(FAILURE_THRESHOLD):
+            await call_ignoring_errors(guard, lambda: fail(RuntimeError("provider down")))
+        assert guard.breaker.state == "open", guard.breaker.stats()
+
+        calls = []
+        try:
+            await guard.call(lambda: calls.append(1) or succeed())
+            raise AssertionError("The open circuit let a call through")
+        except CircuitOpenError as e:
+            assert e.retry_after_seconds >= 1.0
+        assert not calls and guard.breaker.rejected == 1
+
+    asyncio.run(run())
+
+
+def test_breaker_success_resets_the_count():
+    """Test that a success between failures keeps the circuit closed."""
+    async def run():
+        guard = make_guard()
+        for _ in range(FAILURE_THRESHOLD - 1):
+            await call_ignoring_errors(guard, lambda: fail(RuntimeError("provider down")))
+        await guard.call(succeed)
+        await call_ignoring_errors(guard, lambda: fail(RuntimeError("provider down")))
+        assert guard.breaker.state == "closed" and guard.breaker.consecutive_failures == 1, guard.breaker.stats()
+
+    asyncio.run(run())
+
+
+def test_breaker_half_open_probe():
+    """Test that after the reset timeout a single probe is let through, and its outcome closes or reopens the circuit."""
+    async def run():
+        guard = make_guard()
+        for _ in range(FAILURE_THRESHOLD):
+            await call_ignoring_errors(guard, lambda: fail(RuntimeError("provider down")))
+
+        # A failed probe opens the circuit again
+        time.sleep(RESET_TIMEOUT_SECONDS)
+        assert guard.breaker.state == "half_open"
+        await call_ignoring_errors(guard, lambda: fail(RuntimeError("still down")))
+        assert guard.breaker.state == "open" and guard.breaker.opened == 2, guard.breaker.stats()
+
+        # While the probe is in flight, other calls are rejected; its success closes the circuit
+        time.sleep(RESET_TIMEOUT_SECONDS)
+        probe = asyncio.ensure_future(guard.call(lambda: succeed(delay=0.01)))
+        await asyncio.sleep(0)
+        try:
+            await guard.call(succeed)
+            raise AssertionError("A second call was let through while half-open")
+        except CircuitOpenError:
+            pass
+        assert await probe == "ok"
+        assert guard.breaker.state == "closed" and guard.breaker.consecutive_failures == 0, guard.breaker.stats()
+
+    asyncio.run(run())
+
+
+def test_breaker_ignores_input_errors():
+    """Test that errors caused by the input (unparsable answers, refused prompts) do not open the circuit."""
+    class RefusedPromptError(Exception):
+        code = 400
+
+    async def run():
+        guard = make_guard()
+        errors = [
+            OutputParserException("not a card"),
+            validation_error(),
+            RefusedPromptError("invalid argument"),
+        ]
+        for error in errors * FAILURE_THRESHOLD:
+            await call_ignoring_errors(guard, lambda: fail(error))
+        assert guard.breaker.state == "closed" and guard.breaker.consecutive_failures == 0, guard.breaker.stats()
+        assert guard.failures == len(errors) * FAILURE_THRESHOLD
+
+    asyncio.run(run())
+
+
+def test_deadline_counts_one_failure_per_run():
+    """Test that a run cut short by the deadline counts as one breaker failure, however many calls it had in flight."""
+    async def run_chunks(guard: ExtractionGuard, chunks: int):
+        return await asyncio.gather(*(guard.call(lambda: succeed(delay=1.0)) for _ in range(chunks)))
+
+    async def run():
+        guard = make_guard(deadline_seconds=0.05)
+        try:
+            await guard.run_with_deadline(run_chunks(guard, 8))
+            raise AssertionError("The run finished despite its deadline")
+        except TimeoutError:
+            pass
+        assert guard.breaker.state == "closed" and guard.breaker.consecutive_failures == 1, guard.breaker.stats()
+        assert guard.deadline_exceeded == 1
+
+        # A run that had not reached the model yet (e.g. waiting for its turn) does not count
+        try:
+            await guard.run_with_deadline(asyncio.sleep(1.0))
+        except TimeoutError:
+            pass
+        assert guard.breaker.consecutive_failures == 1 and guard.deadline_exceeded == 2, guard.breaker.stats()
+
+    asyncio.run(run())
+
+
+def test_deadline_fails_the_half_open_probe():
+    """Test that a half-open probe cut short by the deadline opens the circuit again, and one cancelled otherwise does not."""
+    async def run():
+        guard = ExtractionGuard(
+            deadline_seconds=0.05,
+            hedge_percentile=None,
+            hedge_max_ratio=1.0,
+            breaker=CircuitBreaker(failure_threshold=1, reset_timeout_seconds=RESET_TIMEOUT_SECONDS),
+        )
+        await call_ignoring_errors(guard, lambda: fail(RuntimeError("provider down")))
+        assert guard.breaker.state == "open"
+
+        time.sleep(RESET_TIMEOUT_SECONDS)
+        try:
+            await guard.run_with_deadline(guard.call(lambda: succeed(delay=1.0)))
+            raise AssertionError("The probe finished despite the deadline")
+        except TimeoutError:
+            pass
+        assert guard.breaker.state == "open" and guard.breaker.opened == 2, guard.breaker.stats()
+
+        # Cancelled before the deadline (e.g. the client went away): the next call probes instead
+        time.sleep(RESET_TIMEOUT_SECONDS)
+        run = asyncio.ensure_future(guard.run_with_deadline(guard.call(lambda: succeed(delay=1.0))))
+        await asyncio.sleep(0.01)
+        run.cancel()
+        try:
+            await run
+        except asyncio.CancelledError:
+            pass
+        assert guard.breaker.state == "half_open" and guard.breaker.opened == 2, guard.breaker.stats()
+        assert await guard.call(succeed) == "ok"
+        assert guard.breaker.state == "closed", guard.breaker.stats()
+
+    asyncio.run(run())
+
+
+def test_fast_call_is_not_hedged():
+    """Test that a call faster than the hedging delay is not hedged."""
+    async def run():
+        guard = make_guard(hedge=True)
+        guard._latencies.extend([0.05] * MIN_LATENCY_SAMPLES)
+        guard.calls = MIN_LATENCY_SAMPLES
+
+        assert await guard.call(lambda: succeed("primary", delay=0.001)) == "primary"
+        assert guard.hedges_sent == 0
+
+    asyncio.run(run())
+
+
+def test_hedge_wins_over_slow_call():
+    """Test that a slow call is hedged, and the hedge's answer is returned when it comes first."""
+    async def run():
+        guard = make_guard(hedge=True)
+        guard._latencies.extend([0.01] * MIN_LATENCY_SAMPLES)
+        guard.calls = MIN_LATENCY_SAMPLES
+
+        answers = iter([("primary", 0.5), ("hedge", 0.0)])
+        started_at = time.perf_counter()
+        assert await guard.call(lambda: succeed(*next(answers))) == "hedge"
+        assert time.perf_counter() - started_at < 0.4
+        assert guard.hedges_sent == 1 and guard.hedges_won == 1
+
+    asyncio.run(run())
+
+
+def test_primary_wins_over_slow_hedge():
+    """Test that a hedged call returns the primary's answer when it comes first."""
+    async def run():
+        guard = make_guard(hedge=True)
+        guard._latencies.extend([0.01] * MIN_LATENCY_SAMPLES)
+        guard.calls = MIN_LATENCY_SAMPLES
+
+        answers = iter([("primary", 0.03), ("hedge", 0.5)])
+        assert await guard.call(lambda: succeed(*next(answers))) == "primary"
+        assert guard.hedges_sent == 1 and guard.hedges_won == 0
+
+    asyncio.run(run())
+
+
+def test_hedged_call_fails_only_when_both_fail():
+    """Test that a failed attempt is covered by the other, and the call fails once both have failed."""
+    async def run():
+        guard = make_guard(hedge=True)
+        guard._latencies.extend([0.01] * MIN_LATENCY_SAMPLES)
+        guard.calls = MIN_LATENCY_SAMPLES
+
+        attempts = iter([fail(RuntimeError("primary down"), delay=0.03), succeed("hedge", delay=0.05)])
+        assert await guard.call(lambda: next(attempts)) == "hedge"
+
+        attempts = iter([fail(RuntimeError("primary down"), delay=0.03), fail(RuntimeError("hedge down"), delay=0.05)])
+        try:
+            await guard.call(lambda: next(attempts))
+            raise AssertionError("The hedged call succeeded although both attempts failed")
+        except RuntimeError:
+            pass
+        assert guard.breaker.consecutive_failures == 1
+
+    asyncio.run(run())
+
+
+TESTS = [
+    test_breaker_opens_after_consecutive_provider_failures,
+    test_breaker_success_resets_the_count,
+    test_breaker_half_open_probe,
+    test_breaker_ignores_input_errors,
+    test_deadline_counts_one_failure_per_run,
+    test_deadline_fails_the_half_open_probe,
+    test_fast_call_is_not_hedged,
+    test_hedge_wins_over_slow_call,
+    test_primary_wins_over_slow_hedge,
+    test_hedged_call_fails_only_when_both_fail,
+]
+
+
+def main():
+    """Main test runner."""
+    print("\n" + "="*60)
+    print("Extraction Guard Test")
+    print("="*60 + "\n")
+
+    failures = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"✗ {test.__doc__}\n  {e}")
+
+    print("\n" + "="*60)
+    print("Test completed!" if not failures else f"{failures} test(s) failed")
+    print("="*60 + "\n")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
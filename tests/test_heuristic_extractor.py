@@ -0,0 +1,146 @@
+"""
+Test script for the heuristic extractor (graphs/heuristic_extractor.py).
+
+This script runs example inputs through the heuristic templates and checks
+the fields they extract, without the API, the database or Gemini. Inputs the
+heuristic must not be confident about are checked to fall back to the LLM.
+"""
+
+import sys
+from pathlib import Path
+
+# Allow running as `python tests/test_heuristic_extractor.py` from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from graphs.heuristic_extractor import get_heuristic_threshold, heuristic_extract
+
+# (input, expected fields): fields left out of the expectation must not be extracted
+EXAMPLES = [
+    (
+        "Met Anna at the gym on Monday to plan the run",
+        {"who": "Anna", "where": "the gym", "when": "on Monday", "why": "plan the run"},
+    ),
+    # The purpose stops at the time that follows it
+    (
+        "Met Anna at the gym to plan the run on Monday",
+        {"who": "Anna", "where": "the gym", "when": "on Monday", "why": "plan the run"},
+    ),
+    (
+        "Had coffee with Tom at the cafe about the budget yesterday",
+        {"who": "Tom", "where": "the cafe", "when": "yesterday", "why": "the budget"},
+    ),
+    # "in person" is a manner, not a place
+    (
+        "Met Sarah in person at the park yesterday to chat",
+        {"who": "Sarah", "where": "the park", "when": "yesterday", "why": "chat"},
+    ),
+    (
+        "Met Dr. Lee at the hospital this morning to review the results",
+        {"who": "Dr. Lee", "where": "the hospital", "when": "this morning", "why": "review the results"},
+    ),
+    (
+        "Caught up with John Smith at 5pm at the office",
+        {"who": "John Smith", "where": "the office", "when": "at 5pm"},
+    ),
+    # "at noon" is a time, not a place
+    (
+        "Met Anna at noon",
+        {"who": "Anna", "when": "at noon"},
+    ),
+]
+
+# (input, expected fields) of inputs that say more than their card: the card must not skip the LLM
+LOW_CONFIDENCE = [
+    # "for the first time" is no purpose
+    (
+        "Met Anna at the gym on Monday for the first time",
+        {"who": "Anna", "where": "the gym", "when": "on Monday"},
+    ),
+    # The purpose stops at the next clause, and "to be honest" is no purpose
+    (
+        "Met Anna at the gym on Monday to plan the run and to be honest it was weird",
+        {"who": "Anna", "where": "the gym", "when": "on Monday", "why": "plan the run"},
+    ),
+    (
+        "Met Anna at the cafe on Monday and we talked for hours",
+        {"who": "Anna", "where": "the cafe", "when": "on Monday"},
+    ),
+]
+
+# Inputs that no template may apply to
+NO_MATCHES = [
+    # The name does not fit the template, and must not be cut short
+    "Met Anna Smith Jones at the gym on Monday to plan the run",
+    "Met The team at noon",
+    "Saw My sister at the mall yesterday to shop",
+    "I didn't meet Anna at the gym on Monday",
+    "Met Anna at the gym. Then we went to lunch on Monday to talk",
+    "Went for a run in the park",
+]
+
+
+def test_examples():
+    """Test that each example's fields are extracted exactly."""
+    for input, expected in EXAMPLES:
+        extraction = heuristic_extract(input)
+        assert extraction.card is not None, f"No template applied to {input!r}"
+
+        extracted = extraction.card.model_dump(include={"who", "where", "when", "why"}, exclude_none=True)
+        assert extracted == expected, f"{input!r}: expected {expected}, got {extracted}"
+
+
+def test_full_examples_skip_the_llm():
+    """Test that examples with every field are confident enough to skip the LLM."""
+    threshold = get_heuristic_threshold()
+    for input, expected in EXAMPLES:
+        if len(expected) == 4:
+            confidence = heuristic_extract(input).confidence
+            assert confidence >= threshold, f"{input!r}: confidence {confidence} below {threshold}"
+
+
+def test_low_confidence():
+    """Test that inputs with words left out of every field are extracted but fall back to the LLM."""
+    threshold = get_heuristic_threshold()
+    for input, expected in LOW_CONFIDENCE:
+        extraction = heuristic_extract(input)
+        assert extraction.card is not None, f"No template applied to {input!r}"
+
+        extracted = extraction.card.model_dump(include={"who", "where", "when", "why"}, exclude_none=True)
+        assert extracted == expected, f"{input!r}: expected {expected}, got {extracted}"
+        assert extraction.confidence < threshold, f"{input!r}: confidence {extraction.confidence} reaches {threshold}"
+
+
+def test_no_matches():
+    """Test that inputs outside the templates fall back to the LLM."""
+    for input in NO_MATCHES:
+        extraction = heuristic_extract(input)
+        assert extraction.card is None and extraction.confidence == 0.0, (
+            f"{input!r}: expected no match, got {extraction.card} ({extraction.confidence})"
+        )
+
+
+def main():
+    """Main test runner."""
+    print("\n" + "="*60)
+    print("Heuristic Extractor Test")
+    print("="*60 + "\n")
+
+    failures = 0
+    for test in [test_examples, test_full_examples_skip_the_llm, test_low_confidence, test_no_matches]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"✗ {test.__doc__}\n  {e}")
+
+    print("\n" + "="*60)
+    print("Test completed!" if not failures else f"{failures} test(s) failed")
+    print("="*60 + "\n")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Test script for the input chunker (graphs/input_chunker.py).
+
+This script splits example texts, punctuated or not, and checks that chunks
+fit their size, lose no words, and start with the end of the previous chunk,
+without the API, the database or Gemini.
+"""
+
+import sys
+from pathlib import Path
+
+# Allow running as `python tests/test_input_chunker.py` from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from graphs.input_chunker import split_into_chunks
+
+CHUNK_CHARS = 400
+OVERLAP_CHARS = 100
+
+
+def word_ranges(text: str, chunks: list[str]) -> list[tuple[int, int]]:
+    """
+    Returns the range of the text's words each chunk holds, checking that it holds them in order.
+    The text's words must be distinct.
+    """
+    words = text.split()
+    ranges = []
+    for index, chunk in enumerate(chunks):
+        chunk_words = chunk.split()
+        start = words.index(chunk_words[0])
+        assert chunk_words == words[start:start + len(chunk_words)], f"Chunk {index} does not follow the text"
+        ranges.append((start, start + len(chunk_words)))
+    return ranges
+
+
+def check_chunks(text: str, chunks: list[str]) -> None:
+    """Checks that chunks fit, overlap the previous one by at most OVERLAP_CHARS, and lose no word."""
+    assert len(chunks) > 1, f"Expected several chunks, got {len(chunks)}"
+    for index, chunk in enumerate(chunks):
+        assert len(chunk) <= CHUNK_CHARS, f"Chunk {index} is {len(chunk)} characters long"
+
+    words = text.split()
+    ranges = word_ranges(text, chunks)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(words), f"Words lost at the edges: {ranges}"
+    for index in range(1, len(chunks)):
+        (previous_start, previous_end), (start, end) = ranges[index - 1], ranges[index]
+        assert previous_start < start < previous_end, f"Chunk {index} does not overlap the previous one: {ranges}"
+        overlap = " ".join(words[start:previous_end])
+        assert len(overlap) < OVERLAP_CHARS, f"Chunk {index} overlaps by {len(overlap)} characters"
+
+
+def test_short_text_is_one_chunk():
+    """Test that a text shorter than a chunk is kept whole, whitespace normalized."""
+    assert split_into_chunks("Met Anna.  At the gym\non Monday.", CHUNK_CHARS, OVERLAP_CHARS) == [
+        "Met Anna. At the gym on Monday."
+    ]
+
+
+def test_unpunctuated_text_overlaps():
+    """Test that an unpunctuated text (e.g. a transcript) is cut between words, each chunk starting with the last words of the previous one."""
+    text = " ".join(f"w{i}" for i in range(1000))
+    check_chunks(text, split_into_chunks(text, CHUNK_CHARS, OVERLAP_CHARS))
+
+
+def test_long_sentences_overlap():
+    """Test that sentences longer than the overlap are overlapped by their last words."""
+    text = " ".join(
+        " ".join(f"s{sentence}w{i}" for i in range(40)) + "." for sentence in range(10)
+    )
+    check_chunks(text, split_into_chunks(text, CHUNK_CHARS, OVERLAP_CHARS))
+
+
+def test_punctuated_text_is_cut_between_sentences():
+    """Test that a punctuated text is cut between sentences, and overlapped by whole sentences."""
+    text = " ".join(" ".join(f"s{sentence}w{i}" for i in range(8)) + "." for sentence in range(40))
+    chunks = split_into_chunks(text, CHUNK_CHARS, OVERLAP_CHARS)
+    check_chunks(text, chunks)
+    for index, chunk in enumerate(chunks):
+        words = chunk.split()
+        assert words[0].endswith("w0") and words[-1].endswith("w7."), f"Chunk {index} is cut mid-sentence: {chunk!r}"
+
+
+def test_overlap_is_capped_at_half_a_chunk():
+    """Test that an overlap larger than a chunk still makes progress through the text."""
+    text = " ".join(f"w{i}" for i in range(300))
+    chunks = split_into_chunks(text, 100, 1000)
+    ranges = word_ranges(text, chunks)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert all(previous[0] < current[0] for previous, current in zip(ranges, ranges[1:])), ranges
+    assert ranges[-1][1] == 300, ranges
+
+
+TESTS = [
+    test_short_text_is_one_chunk,
+    test_unpunctuated_text_overlaps,
+    test_long_sentences_overlap,
+    test_punctuated_text_is_cut_between_sentences,
+    test_overlap_is_capped_at_half_a_chunk,
+]
+
+
+def main():
+    """Main test runner."""
+    print("\n" + "="*60)
+    print("Input Chunker Test")
+    print("="*60 + "\n")
+
+    failures = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"✗ {test.__doc__}\n  {e}")
+
+    print("\n" + "="*60)
+    print("Test completed!" if not failures else f"{failures} test(s) failed")
+    print("="*60 + "\n")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Test script for the asynchronous mode of the /interactions endpoint.
+
+This script queues an interaction with `?mode=async` using the seeded test
+users, then polls /jobs/{job_id} until a worker (in-process or worker.py)
+has processed it against the local Postgres database.
+"""
+
+import asyncio
+import httpx
+import sys
+
+# Hardcoded test user IDs (must match seed_test_users.py)
+TEST_USER_1_ID = "test-user-1-uuid"
+TEST_USER_2_ID = "test-user-2-uuid"
+
+# API base URL (change if running on different host/port)
+API_BASE_URL = "http://localhost:8000"
+
+# How long to wait for the job to complete
+POLL_INTERVAL_SECONDS = 1.0
+POLL_TIMEOUT_SECONDS = 120.0
+
+
+async def test_async_interaction():
+    """Test queueing an interaction and polling its job until completion."""
+
+    payload = {
+        "input": "I met Test User Two at the library this afternoon. We reviewed the slides for the demo day and split the remaining work.",
+        "user_id": TEST_USER_1_ID,
+        "target_user_id": TEST_USER_2_ID,
+        "sub": TEST_USER_1_ID  # Must match user_id for authorization
+    }
+
+    print("Testing /interactions?mode=async endpoint")
+    print("="*60)
+
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        try:
+            response = await client.post(
+                f"{API_BASE_URL}/interactions",
+                params={"mode": "async"},
+                json=payload
+            )
+        except httpx.ConnectError:
+            print("\n✗ Connection Error!")
+            print(f"Could not connect to {API_BASE_URL}")
+            print("Make sure the API is running with: uv run uvicorn app:app --reload")
+            sys.exit(1)
+
+        print(f"\nResponse Status: {response.status_code}")
+        if response.status_code != 202:
+            print(f"\n✗ Expected 202, got: {response.text}")
+            sys.exit(1)
+
+        job_id = response.json()["data"]["job_id"]
+        print(f"✓ Job queued: {job_id}")
+        print(f"\nPolling /jobs/{job_id}...")
+
+        elapsed = 0.0
+        while elapsed < POLL_TIMEOUT_SECONDS:
+            job = (await client.get(f"{API_BASE_URL}/jobs/{job_id}")).json()["data"]
+            print(f"  status: {job['status']} (attempts: {job['attempts']})")
+
+            if job["status"] == "succeeded":
+                print(f"\n✓ Success!")
+                print(f"Result: {job['result']}")
+                return
+            if job["status"] == "failed":
+                print(f"\n✗ Job failed!")
+                print(f"Error: {job['error']} ({job['result']})")
+                sys.exit(1)
+
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+            elapsed += POLL_INTERVAL_SECONDS
+
+        print(f"\n✗ Job did not complete within {POLL_TIMEOUT_SECONDS}s")
+        print("Make sure a worker is running (JOB_WORKERS_IN_PROCESS=true, or: uv run python worker.py)")
+        sys.exit(1)
+
+
+async def test_unknown_job():
+    """Test that polling an unknown job returns a 404."""
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        response = await client.get(f"{API_BASE_URL}/jobs/00000000-0000-0000-0000-000000000000")
+        if response.status_code == 404:
+            print("✓ Unknown job returns 404")
+        else:
+            print(f"✗ Unknown job returned {response.status_code}: {response.text}")
+            sys.exit(1)
+
+
+async def main():
+    """Main test runner."""
+    print("\n" + "="*60)
+    print("Async Interaction Jobs Test")
+    print("="*60 + "\n")
+
+    await test_unknown_job()
+    print()
+    await test_async_interaction()
+
+    print("\n" + "="*60)
+    print("Test completed!")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Test script for parsing bulk user imports (services/UserImportService.py).
+
+This script streams CSV and JSONL files through the import parser, split
+into small chunks as an upload would be, and checks the rows it yields and
+the rows it rejects. No API or database is needed.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Allow running as `python tests/test_user_import.py` from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.UserImportService import UserImportService, iter_lines
+
+HEADER = "email,full_name,city,unique_id\n"
+
+
+def parse(text: str, format: str = "csv", chunk_size: int = 7) -> tuple[list[tuple], dict]:
+    """Parses `text` sent in chunks of `chunk_size` bytes, returning the yielded rows and the report."""
+    async def chunks():
+        data = text.encode("utf-8")
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    async def run():
+        report = {"received": 0, "invalid": 0, "errors": []}
+        rows = [row async for row in UserImportService(None)._parse(iter_lines(chunks()), format, report)]
+        return rows, report
+
+    return asyncio.run(run())
+
+
+def test_rows():
+    """Test that rows are parsed and numbered after their line, blank lines and CRLF included."""
+    rows, report = parse(HEADER + "anna@example.com,Anna,Lisbon,u1\r\n\r\nbob@example.com, Bob ,Paris,u2\n")
+    assert rows == [
+        (2, "anna@example.com", "Anna", "Lisbon", "u1"),
+        (4, "bob@example.com", "Bob", "Paris", "u2"),
+    ], rows
+    assert report["received"] == 2 and report["invalid"] == 0, report
+
+
+def test_quoted_newlines():
+    """Test that quoted fields spanning several lines are read whole, and rows after them keep their line numbers."""
+    text = (
+        HEADER
+        + 'anna@example.com,"Anna\nMaria",Lisbon,u1\n'
+        + 'bob@example.com,Bob,"12 Main St\n\nApt 4, ""Blue"" door",u2\n'
+        + "chloe@example.com,Chloé,Paris,u3\n"
+    )
+    for chunk_size in (1, 7, len(text)):
+        rows, report = parse(text, chunk_size=chunk_size)
+        assert rows == [
+            (2, "anna@example.com", "Anna\nMaria", "Lisbon", "u1"),
+            (4, "bob@example.com", "Bob", '12 Main St\n\nApt 4, "Blue" door', "u2"),
+            (7, "chloe@example.com", "Chloé", "Paris", "u3"),
+        ], rows
+        assert report["invalid"] == 0, report
+
+
+def test_invalid_rows():
+    """Test that rows with missing fields or an unclosed quote are rejected and reported."""
+    rows, report = parse(HEADER + "anna@example.com,Anna,,u1\nbob@example.com,O\"Brien,Paris,u2\nchloe@example.com,\"Chloé,Paris,u3\n")
+    assert rows == [(3, "bob@example.com", 'O"Brien', "Paris", "u2")], rows
+    assert report["received"] == 3 and report["invalid"] == 2, report
+    assert [error["line"] for error in report["errors"]] == [2, 4], report
+
+
+def test_jsonl():
+    """Test that JSONL rows are parsed one per line."""
+    text = (
+        '{"email": "anna@example.com", "full_name": "Anna", "city": "Lisbon", "unique_id": "u1"}\n'
+        "\n"
+        "not json\n"
+        '["anna@example.com"]\n'
+    )
+    rows, report = parse(text, format="jsonl")
+    assert rows == [(1, "anna@example.com", "Anna", "Lisbon", "u1")], rows
+    assert [error["line"] for error in report["errors"]] == [3, 4], report
+
+
+TESTS = [
+    test_rows,
+    test_quoted_newlines,
+    test_invalid_rows,
+    test_jsonl,
+]
+
+
+def main():
+    """Main test runner."""
+    print("\n" + "="*60)
+    print("User Import Test")
+    print("="*60 + "\n")
+
+    failures = 0
+    for test in TESTS:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"✗ {test.__doc__}\n  {e}")
+
+    print("\n" + "="*60)
+    print("Test completed!" if not failures else f"{failures} test(s) failed")
+    print("="*60 + "\n")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
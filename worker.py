@@ -0,0 +1,56 @@
+"""
+Standalone jobs worker.
+
+Drains the `jobs` table outside of the API process, so that the API can be run
+with JOB_WORKERS_IN_PROCESS=false and scaled independently from the workers.
+
+Usage:
+    uv run python worker.py
+"""
+
+import asyncio
+import logging
+import os
+import signal
+
+from dotenv import load_dotenv
+
+from database.migrations import run_migrations
+from database.pool import create_pool
+from graphs.extract_interaction_with_a_person_card import warm_up
+from services.JobWorker import JobWorker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+
+async def main():
+    pool = await create_pool()
+
+    try:
+        await run_migrations(pool)
+        await pool.expire_connections()
+
+        if os.getenv("EXTRACTION_WARMUP_ON_STARTUP", "false").lower() == "true":
+            await asyncio.to_thread(warm_up)
+
+        worker = JobWorker(pool)
+        worker.start()
+
+        stop_requested = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_requested.set)
+
+        await stop_requested.wait()
+        logger.info("Stopping job worker...")
+        await worker.stop()
+
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())